@@ -0,0 +1,114 @@
+import os
+import time
+import threading
+import logging
+from typing import Optional, Dict, Any, List
+
+logger = logging.getLogger("cache")
+
+# Number of snapshots kept in memory (4 hours at one snapshot every 5 seconds)
+SNAPSHOT_CACHE_SIZE = int(os.getenv("SNAPSHOT_CACHE_SIZE", "2880"))
+
+class SnapshotRing:
+    """
+    Fixed-capacity, array-backed ring buffer of the most recent snapshots.
+
+    Every worker appends each snapshot the collector publishes; read endpoints ask for a
+    window and fall back to MongoDB only when the ring cannot answer it.
+    """
+    def __init__(self, capacity: int = SNAPSHOT_CACHE_SIZE):
+        self.capacity = max(1, capacity)
+        self._items: List[Optional[Dict[str, Any]]] = [None] * self.capacity
+        self._head = 0  # Index of the next write
+        self._size = 0
+        # True while the ring holds every snapshot that exists, not just the newest ones
+        self._complete = False
+        self._lock = threading.Lock()
+        # Bumped on every change, so derived caches know when to recompute
+        self.version = 0
+        # Wall-clock time of the last change
+        self.updated_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, snapshot: Dict[str, Any]) -> None:
+        """
+        Add a snapshot, overwriting the oldest one when the ring is full.
+
+        Args:
+            snapshot: The snapshot document as stored in MongoDB
+        """
+        item = dict(snapshot)
+        if "_id" in item:
+            item["_id"] = str(item["_id"])
+
+        with self._lock:
+            if self._size == self.capacity:
+                self._complete = False
+            else:
+                self._size += 1
+            self._items[self._head] = item
+            self._head = (self._head + 1) % self.capacity
+            self.version += 1
+            self.updated_at = time.time()
+
+    def seed(self, docs: List[Dict[str, Any]]) -> None:
+        """
+        Replace the ring's contents with snapshots loaded from storage.
+
+        Args:
+            docs: Up to `capacity` of the newest stored snapshots, newest first
+        """
+        with self._lock:
+            self._items = [None] * self.capacity
+            self._head = 0
+            self._size = 0
+        for doc in reversed(docs[:self.capacity]):
+            self.append(doc)
+        with self._lock:
+            # Fewer documents than capacity means we hold everything that is stored
+            self._complete = len(docs) < self.capacity
+        logger.info(f"✅ Seeded snapshot cache with {len(self)} snapshots")
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """
+        Returns:
+            Optional[Dict[str, Any]]: A copy of the newest snapshot, or None if empty
+        """
+        with self._lock:
+            if self._size == 0:
+                return None
+            return dict(self._items[(self._head - 1) % self.capacity])
+
+    def window(self, limit: int, since: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get up to `limit` of the newest snapshots, newest first.
+
+        Args:
+            limit: The maximum number of snapshots to return
+            since: Only include snapshots with a timestamp at or after this ISO string
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: Copies of the snapshots, or None if the
+            requested window reaches past what the ring holds
+        """
+        if limit <= 0:
+            return []
+
+        with self._lock:
+            result = []
+            reached_cutoff = False
+            for offset in range(1, min(limit, self._size) + 1):
+                item = self._items[(self._head - offset) % self.capacity]
+                if since is not None and item.get("timestamp", "") < since:
+                    reached_cutoff = True
+                    break
+                result.append(dict(item))
+
+            if len(result) == limit or reached_cutoff or self._complete:
+                return result
+            return None
+
+# Shared cache filled by the collector
+snapshot_cache = SnapshotRing()
@@ -1,10 +1,21 @@
 from dotenv import load_dotenv
-from pymongo import MongoClient
-from typing import Optional, Dict, Any, List
+from pymongo import MongoClient, AsyncMongoClient, UpdateOne, ReplaceOne, ASCENDING, DESCENDING
+from pymongo.errors import ConnectionFailure
+from bson.binary import Binary
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+from array import array
+from typing import Optional, Dict, Any, List, Set, Tuple, AsyncIterator
 import os
 import sys
+import math
+import asyncio
+import zlib
 import logging
 
+from .networks import NETWORKS, NETWORK_NAMES
+from .metrics import timed_query
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("db")
@@ -17,10 +28,21 @@ load_dotenv()
 mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 mongo_db = os.getenv("MONGO_DB", "gas_tracker")
 mongo_collection = os.getenv("MONGO_COLLECTION", "gas_data")
+mongo_bucket_collection = os.getenv("MONGO_BUCKET_COLLECTION", "gas_buckets")
+mongo_rollup_collection = os.getenv("MONGO_ROLLUP_COLLECTION", "gas_rollups")
+
+# Connections kept open per pool; 0 opens them on demand instead of at startup
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+
+# "mongo" (default) or "memory" to run without a database (see memstore.py)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo").lower()
 
-# Global MongoDB client and collection
+# Global MongoDB clients and collections
 client: Optional[MongoClient] = None
+async_client: Optional[AsyncMongoClient] = None
 gas_collection = None
+gas_buckets = None
+gas_rollups = None
 
 def get_mongo_client() -> MongoClient:
     """
@@ -32,17 +54,14 @@ def get_mongo_client() -> MongoClient:
     global client
     if client is None:
         try:
-            # Connect to MongoDB with a timeout and connection pooling
+            # Connections are opened in the background on first use, so this never blocks
             client = MongoClient(
                 mongo_uri, 
                 serverSelectionTimeoutMS=5000,
                 maxPoolSize=50,
-                minPoolSize=10
+                minPoolSize=MONGO_MIN_POOL_SIZE
             )
-            
-            # Test the connection
-            client.server_info()
-            logger.info(f"✅ Connected to MongoDB: {mongo_uri}")
+            logger.info(f"✅ Created MongoDB client: {mongo_uri}")
         except Exception as e:
             logger.error(f"❌ MongoDB connection error: {e}")
             # Don't raise the exception, just return None
@@ -66,91 +85,1261 @@ def get_gas_collection():
             
             if mongo_client is None:
                 logger.error("❌ MongoDB collection error: Could not get MongoDB client")
-                # return MockCollection()
             
             # Get the database and collection
             db = mongo_client[mongo_db]
             gas_collection = db[mongo_collection]
-            
-            # Test the collection
-            gas_collection.find_one()
             logger.info(f"✅ Connected to MongoDB collection: {mongo_collection}")
             
             
         except Exception as e:
             logger.error(f"❌ MongoDB collection error: {e}")
-            # return MockCollection()
-            
-        cleanup_old_data()
     
     return gas_collection
 
-class MockCollection:
+# === Columnar bucket storage ===
+#
+# Samples are stored in one document per network per hour:
+#
+#   {
+#       "_id": "btc:1713348000",
+#       "network": "btc",
+#       "start": 1713348000,         # epoch seconds, inclusive
+#       "end": 1713351600,           # epoch seconds, exclusive
+#       "count": 720,
+#       "min_ts": 1713348002, "max_ts": 1713351597,
+#       "packed": true,
+#       "ts": <offsets from start>, "high": [...], "medium": [...], "low": [...]
+#   }
+#
+# The bucket for the current hour holds plain arrays so samples can be $push-ed.
+# Once the hour is over the bucket is sealed: each array is packed into a
+# zlib-compressed little-endian binary (uint16 offsets, float64 fees).
+
+BUCKET_SECONDS = 3600
+# Storage keys of the registered networks (see networks.py)
+NETWORK_KEYS = tuple(NETWORKS)
+FEE_TIERS = ("high", "medium", "low")
+
+# array typecodes for the packed columns
+_COLUMN_TYPES = {"ts": "H", "high": "d", "medium": "d", "low": "d"}
+
+# (epoch seconds, high, medium, low)
+Sample = Tuple[int, Optional[float], Optional[float], Optional[float]]
+
+def get_bucket_collection():
     """
-    A mock collection for when MongoDB is not available.
+    Get the bucketed gas collection from MongoDB.
+
+    Returns:
+        Collection: The MongoDB collection holding per-network hourly buckets
     """
-    def __init__(self):
-        self.data = []
-    
-    def insert_one(self, document):
+    global gas_buckets
+
+    if gas_buckets is None:
+        try:
+            mongo_client = get_mongo_client()
+            if mongo_client is None:
+                logger.error("❌ MongoDB bucket collection error: Could not get MongoDB client")
+
+            gas_buckets = mongo_client[mongo_db][mongo_bucket_collection]
+            logger.info(f"✅ Connected to MongoDB collection: {mongo_bucket_collection}")
+        except Exception as e:
+            logger.error(f"❌ MongoDB bucket collection error: {e}")
+
+    return gas_buckets
+
+def get_rollup_collection():
+    """
+    Get the rollup collection from MongoDB.
+
+    Returns:
+        Collection: The MongoDB collection holding 1m/1h/1d aggregates
+    """
+    global gas_rollups
+
+    if gas_rollups is None:
+        try:
+            mongo_client = get_mongo_client()
+            if mongo_client is None:
+                logger.error("❌ MongoDB rollup collection error: Could not get MongoDB client")
+
+            gas_rollups = mongo_client[mongo_db][mongo_rollup_collection]
+            logger.info(f"✅ Connected to MongoDB collection: {mongo_rollup_collection}")
+        except Exception as e:
+            logger.error(f"❌ MongoDB rollup collection error: {e}")
+
+    return gas_rollups
+
+def to_epoch(timestamp: str) -> int:
+    """
+    Convert an ISO timestamp to epoch seconds. Naive timestamps are treated as UTC.
+    """
+    parsed = datetime.fromisoformat(timestamp)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+def to_iso(epoch: int) -> str:
+    """
+    Convert epoch seconds to the naive UTC ISO format used by the API.
+    """
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None).isoformat()
+
+def bucket_start(epoch: int) -> int:
+    return epoch - epoch % BUCKET_SECONDS
+
+def bucket_id(network: str, start: int) -> str:
+    return f"{network}:{start}"
+
+def _pack(typecode: str, values: List[Any]) -> Binary:
+    column = array(typecode, values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return Binary(zlib.compress(column.tobytes()))
+
+def _unpack(typecode: str, data: bytes) -> List[Any]:
+    column = array(typecode)
+    column.frombytes(zlib.decompress(data))
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column.tolist()
+
+def decode_bucket(doc: Dict[str, Any]) -> List[Sample]:
+    """
+    Decode a bucket document, packed or not, into samples in time order.
+
+    Args:
+        doc: A bucket document
+
+    Returns:
+        List[Sample]: (epoch, high, medium, low) tuples, oldest first
+    """
+    if doc.get("packed"):
+        columns = {name: _unpack(code, doc[name]) for name, code in _COLUMN_TYPES.items()}
+        # Missing values are packed as NaN
+        for tier in FEE_TIERS:
+            columns[tier] = [None if value != value else value for value in columns[tier]]
+    else:
+        columns = {name: doc.get(name, []) for name in _COLUMN_TYPES}
+
+    start = doc["start"]
+    samples = [
+        (start + offset, high, medium, low)
+        for offset, high, medium, low in zip(columns["ts"], columns["high"], columns["medium"], columns["low"])
+    ]
+    # Unpacked buckets are in insertion order, which can differ from time order after a migration
+    if not doc.get("packed"):
+        samples.sort(key=lambda sample: sample[0])
+    return samples
+
+def _append_ops(network: str, samples: List[Sample]) -> List[UpdateOne]:
+    """
+    Build the updates that append the given samples to their buckets: one
+    upsert creating each touched bucket, then one push per sample guarded on
+    its epoch, so a sample that is already stored is skipped. Run them as an
+    ordered bulk write.
+    """
+    starts = sorted({bucket_start(sample[0]) for sample in samples})
+    ops = [
+        UpdateOne(
+            {"_id": bucket_id(network, start)},
+            {"$setOnInsert": {
+                "network": network, "start": start, "end": start + BUCKET_SECONDS, "packed": False,
+                "count": 0, "ts": [], "high": [], "medium": [], "low": [],
+            }},
+            upsert=True
+        )
+        for start in starts
+    ]
+    for epoch, high, medium, low in samples:
+        start = bucket_start(epoch)
+        ops.append(UpdateOne(
+            {"_id": bucket_id(network, start), "ts": {"$ne": epoch - start}},
+            {
+                "$push": {"ts": epoch - start, "high": high, "medium": medium, "low": low},
+                "$inc": {"count": 1},
+                "$min": {"min_ts": epoch},
+                "$max": {"max_ts": epoch},
+            }
+        ))
+    return ops
+
+def bucket_offsets(doc: Dict[str, Any]) -> List[int]:
+    """
+    Sample offsets of a bucket document, packed or not.
+    """
+    if doc.get("packed"):
+        return _unpack(_COLUMN_TYPES["ts"], doc["ts"])
+    return doc.get("ts", [])
+
+def snapshot_samples(entry: Dict[str, Any]) -> Dict[str, Sample]:
+    """
+    Split a flat snapshot into one sample per network it has data for.
+
+    Args:
+        entry: A flat snapshot with a timestamp and <network>_high/medium/low fields
+
+    Returns:
+        Dict[str, Sample]: Samples keyed by network
+    """
+    epoch = to_epoch(entry["timestamp"])
+    samples = {}
+    for network in NETWORK_KEYS:
+        if f"{network}_high" not in entry:
+            continue
+        samples[network] = (
+            epoch,
+            entry.get(f"{network}_high"),
+            entry.get(f"{network}_medium"),
+            entry.get(f"{network}_low"),
+        )
+    return samples
+
+def store_snapshot(entry: Dict[str, Any]) -> None:
+    """
+    Append a flat snapshot to the per-network hourly buckets and refresh the
+    rollups it falls in.
+
+    Args:
+        entry: A flat snapshot as produced by the collector
+    """
+    store_snapshots([entry])
+
+def store_snapshots(entries: List[Dict[str, Any]]) -> None:
+    """
+    Store a batch of flat snapshots. Writing the same snapshots again (a
+    replayed spill file, a retry after a partial failure) changes nothing.
+    Snapshots older than the raw retention window are dropped, since their
+    buckets are no longer there to rebuild the rollups from.
+
+    Args:
+        entries: Flat snapshots as produced by the collector
+    """
+    cutoff = raw_cutoff(int(datetime.now(timezone.utc).timestamp()))
+    by_network: Dict[str, List[Sample]] = {}
+    expired = 0
+    for entry in entries:
+        for network, sample in snapshot_samples(entry).items():
+            if sample[0] < cutoff:
+                expired += 1
+                continue
+            by_network.setdefault(network, []).append(sample)
+
+    if expired:
+        logger.warning(f"⚠️ Dropped {expired} sample(s) older than the raw retention window")
+    store_samples(by_network)
+
+def store_samples(by_network: Dict[str, List[Sample]]) -> None:
+    """
+    Append samples to their hourly buckets and fold them into the rollups,
+    skipping epochs that are already stored. One read of the touched buckets'
+    offsets and one bulk write per collection. Buckets of earlier hours that
+    were already sealed are reopened and get sealed again by the next hourly job.
+
+    Args:
+        by_network: Samples keyed by network
+    """
+    current = bucket_start(int(datetime.now(timezone.utc).timestamp()))
+    ids = {
+        bucket_id(network, bucket_start(sample[0]))
+        for network, samples in by_network.items()
+        for sample in samples
+    }
+    if not ids:
+        return
+
+    late = [_id for _id in ids if int(_id.rsplit(":", 1)[1]) < current]
+    if late:
+        reopen_buckets(late)
+    buckets = get_bucket_collection()
+
+    # Only samples that aren't stored yet are written and counted
+    stored: Dict[str, Set[int]] = {}
+    for doc in buckets.find({"_id": {"$in": list(ids)}}, {"network": 1, "start": 1, "packed": 1, "ts": 1}):
+        stored.setdefault(doc["network"], set()).update(doc["start"] + offset for offset in bucket_offsets(doc))
+    ops = []
+    rollup_ops = []
+    for network, samples in by_network.items():
+        seen = stored.setdefault(network, set())
+        fresh = []
+        for sample in samples:
+            if sample[0] not in seen:
+                seen.add(sample[0])
+                fresh.append(sample)
+        if fresh:
+            ops.extend(_append_ops(network, fresh))
+            rollup_ops.extend(_rollup_ops(network, fresh))
+    if not ops:
+        return
+
+    buckets.bulk_write(ops)
+    get_rollup_collection().bulk_write(rollup_ops)
+
+def reopen_buckets(ids: List[str]) -> int:
+    """
+    Turn sealed buckets back into appendable arrays so late samples can be pushed.
+
+    Args:
+        ids: Bucket ids that are about to receive samples
+
+    Returns:
+        int: The number of buckets reopened
+    """
+    buckets = get_bucket_collection()
+    reopened = 0
+    for doc in buckets.find({"_id": {"$in": ids}, "packed": True}):
+        samples = decode_bucket(doc)
+        columns = list(zip(*samples)) if samples else [[], [], [], []]
+        update: Dict[str, Any] = {"packed": False, "ts": [epoch - doc["start"] for epoch in columns[0]]}
+        for tier, values in zip(FEE_TIERS, columns[1:]):
+            update[tier] = list(values)
+        buckets.update_one({"_id": doc["_id"], "packed": True}, {"$set": update})
+        reopened += 1
+
+    if reopened:
+        logger.info(f"📂 Reopened {reopened} sealed bucket(s) for late samples")
+    return reopened
+
+def seal_buckets(before: int) -> int:
+    """
+    Pack every open bucket that ends at or before the given epoch, and
+    rebuild the rollups of its hour from the final samples.
+
+    Args:
+        before: Epoch seconds; buckets ending after this stay open
+
+    Returns:
+        int: The number of buckets sealed
+    """
+    buckets = get_bucket_collection()
+    sealed = 0
+    stored: Dict[str, List[Sample]] = {}
+    for doc in buckets.find({"packed": False, "end": {"$lte": before}}):
+        samples = decode_bucket(doc)
+        stored.setdefault(doc["network"], []).extend(samples)
+        update = {"packed": True, "count": len(samples)}
+        columns = list(zip(*samples)) if samples else [[], [], [], []]
+        update["ts"] = _pack("H", [epoch - doc["start"] for epoch in columns[0]])
+        for tier, values in zip(FEE_TIERS, columns[1:]):
+            update[tier] = _pack("d", [float("nan") if value is None else value for value in values])
+        buckets.update_one({"_id": doc["_id"], "packed": False}, {"$set": update})
+        sealed += 1
+
+    if stored:
+        refresh_rollups(stored, {network: [sample[0] for sample in samples] for network, samples in stored.items()})
+    if sealed:
+        logger.info(f"📦 Sealed {sealed} bucket(s)")
+    return sealed
+
+def series_query(network: str, start: Optional[int] = None, end: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Build the bucket filter for a time range. Buckets have a fixed length, so
+    both bounds are expressed on `start` and the (network, start) index serves it.
+    """
+    query: Dict[str, Any] = {"network": network}
+    bounds: Dict[str, int] = {}
+    if start is not None:
+        bounds["$gt"] = start - BUCKET_SECONDS
+    if end is not None:
+        bounds["$lt"] = end
+    if bounds:
+        query["start"] = bounds
+    return query
+
+def bucket_samples(
+    doc: Dict[str, Any],
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    newest_first: bool = True
+) -> List[Sample]:
+    """
+    Decode one bucket and keep the samples in [start, end), in the requested order.
+    """
+    samples = decode_bucket(doc)
+    if newest_first:
+        samples.reverse()
+    return [
+        sample for sample in samples
+        if (start is None or sample[0] >= start) and (end is None or sample[0] < end)
+    ]
+
+def merge_snapshots(series: Dict[str, List[Sample]], limit: int) -> List[Dict[str, Any]]:
+    """
+    Join per-network samples on their timestamp into flat snapshots, newest first.
+    """
+    snapshots: Dict[int, Dict[str, Any]] = {}
+    for network, samples in series.items():
+        for epoch, high, medium, low in samples:
+            snapshot = snapshots.setdefault(epoch, {"timestamp": to_iso(epoch)})
+            snapshot[f"{network}_high"] = high
+            snapshot[f"{network}_medium"] = medium
+            snapshot[f"{network}_low"] = low
+
+    return [snapshots[epoch] for epoch in sorted(snapshots, reverse=True)[:limit]]
+
+# === Retention tiers and rollups ===
+#
+# Raw samples are kept for RAW_RETENTION seconds. Every stored sample is also
+# summarized in 1-minute, 1-hour and 1-day rollups, one document per network,
+# level and period. A write folds its new samples into the periods it touches
+# with $inc/$min/$max; samples already stored are skipped first, so a replayed
+# write counts nothing twice. Sealing an hour rebuilds its periods from the
+# stored samples (1m, 1h) or the 1h rollups (1d), which repairs any that a
+# failed write left behind:
+#
+#   {
+#       "_id": "btc:1h:1713348000",
+#       "network": "btc", "level": "1h", "t": 1713348000,
+#       "high": {"min": 3, "max": 9, "sum": 4210, "count": 720, "last": 5},
+#       "medium": {...}, "low": {...},
+#       "last_ts": 1713351597
+#   }
+#
+# Reads pick the coarsest level that still has data for the range and is at
+# least as fine as the requested resolution.
+
+SAMPLE_SECONDS = 5  # Collector interval, the resolution of raw samples
+RAW_RETENTION = 24 * 3600
+
+# level -> (period in seconds, retention in seconds or None to keep forever)
+ROLLUP_LEVELS = {
+    "1m": (60, 7 * 86400),
+    "1h": (3600, 400 * 86400),
+    "1d": (86400, None),
+}
+
+# Levels whose periods fit in one bucket are rebuilt from the raw samples;
+# coarser levels are rebuilt from the coarsest of those
+BUCKET_LEVELS = tuple(level for level, (period, _) in ROLLUP_LEVELS.items() if period <= BUCKET_SECONDS)
+BASE_LEVEL = BUCKET_LEVELS[-1]
+
+def rollup_id(network: str, level: str, t: int) -> str:
+    return f"{network}:{level}:{t}"
+
+def raw_cutoff(now: int) -> int:
+    """
+    The oldest epoch whose bucket is still within the raw retention window.
+    """
+    return bucket_start(now - RAW_RETENTION)
+
+def retention_cutoff(level: str, now: int) -> Optional[int]:
+    """
+    The oldest epoch a tier still holds once retention has run: raw data is
+    dropped a whole bucket at a time, rollups once their period has fully
+    left the window.
+
+    Args:
+        level: "raw" or one of ROLLUP_LEVELS
+        now: Current epoch
+
+    Returns:
+        Optional[int]: The cutoff, or None for a tier kept forever
+    """
+    if level == "raw":
+        return raw_cutoff(now)
+    period, retention = ROLLUP_LEVELS[level]
+    return None if retention is None else now - retention - period
+
+def rollup_doc(network: str, level: str, t: int, samples: List[Sample]) -> Dict[str, Any]:
+    """
+    Build the rollup document of one period from all of its samples, in time order.
+    """
+    doc: Dict[str, Any] = {"network": network, "level": level, "t": t, "last_ts": samples[-1][0]}
+    for index, tier in enumerate(FEE_TIERS, start=1):
+        values = [sample[index] for sample in samples if sample[index] is not None]
+        if values:
+            doc[tier] = {"min": min(values), "max": max(values), "sum": sum(values), "count": len(values), "last": values[-1]}
+    return doc
+
+def merge_rollups(network: str, level: str, t: int, docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Build the rollup document of one period from the finer rollups inside it, in time order.
+    """
+    merged: Dict[str, Any] = {"network": network, "level": level, "t": t, "last_ts": max(doc["last_ts"] for doc in docs)}
+    for tier in FEE_TIERS:
+        stats = [doc[tier] for doc in docs if doc.get(tier)]
+        if stats:
+            merged[tier] = {
+                "min": min(s["min"] for s in stats),
+                "max": max(s["max"] for s in stats),
+                "sum": sum(s["sum"] for s in stats),
+                "count": sum(s["count"] for s in stats),
+                "last": stats[-1]["last"],
+            }
+    return merged
+
+def bucket_rollups(network: str, samples: List[Sample], epochs: List[int]) -> List[Dict[str, Any]]:
+    """
+    Rebuild the BUCKET_LEVELS rollups of every period containing one of `epochs`.
+
+    Args:
+        network: Short network name
+        samples: Every stored sample of those periods, in time order
+        epochs: Epochs that were just written
+
+    Returns:
+        List[Dict[str, Any]]: Rollup documents, without _id
+    """
+    docs = []
+    for level in BUCKET_LEVELS:
+        period = ROLLUP_LEVELS[level][0]
+        touched = {epoch - epoch % period for epoch in epochs}
+        grouped: Dict[int, List[Sample]] = {}
+        for sample in samples:
+            t = sample[0] - sample[0] % period
+            if t in touched:
+                grouped.setdefault(t, []).append(sample)
+        docs.extend(rollup_doc(network, level, t, period_samples) for t, period_samples in grouped.items())
+    return docs
+
+def _rollup_ops(network: str, samples: List[Sample]) -> List[UpdateOne]:
+    """
+    Build the updates that fold new samples into every rollup level: sums and
+    counts through $inc, extremes through $min/$max, then each tier's last
+    value from the newest sample, guarded so an older write never overwrites it.
+    Run them as an ordered bulk write.
+    """
+    ops = []
+    for level, (period, _) in ROLLUP_LEVELS.items():
+        periods: Dict[int, List[Sample]] = {}
+        for sample in samples:
+            periods.setdefault(sample[0] - sample[0] % period, []).append(sample)
+        for t, period_samples in periods.items():
+            _id = rollup_id(network, level, t)
+            inc: Dict[str, Any] = {}
+            low: Dict[str, Any] = {}
+            high: Dict[str, Any] = {}
+            last: Dict[str, Any] = {"last_ts": max(sample[0] for sample in period_samples)}
+            for index, tier in enumerate(FEE_TIERS, start=1):
+                values = [(sample[0], sample[index]) for sample in period_samples if sample[index] is not None]
+                if not values:
+                    continue
+                fees = [value for _, value in values]
+                inc[f"{tier}.sum"] = sum(fees)
+                inc[f"{tier}.count"] = len(fees)
+                low[f"{tier}.min"] = min(fees)
+                high[f"{tier}.max"] = max(fees)
+                last[f"{tier}.last"] = max(values, key=lambda value: value[0])[1]
+            update: Dict[str, Any] = {"$setOnInsert": {"network": network, "level": level, "t": t}}
+            if inc:
+                update.update({"$inc": inc, "$min": low, "$max": high})
+            ops.append(UpdateOne({"_id": _id}, update, upsert=True))
+            ops.append(UpdateOne(
+                {"_id": _id, "$or": [{"last_ts": {"$exists": False}}, {"last_ts": {"$lt": last["last_ts"]}}]},
+                {"$set": last}
+            ))
+    return ops
+
+def refresh_rollups(stored: Dict[str, List[Sample]], written: Dict[str, List[int]]) -> None:
+    """
+    Rebuild every rollup period the written epochs fall in and replace the
+    stored documents. Used when an hour is sealed, so its rollups match its
+    samples exactly whatever happened to the incremental updates.
+
+    Args:
+        stored: All samples of the buckets that were written to, keyed by network, in time order
+        written: Epochs that were just written, keyed by network
+    """
+    fresh = {
+        rollup_id(doc["network"], doc["level"], doc["t"]): doc
+        for network, epochs in written.items()
+        for doc in bucket_rollups(network, stored.get(network, []), epochs)
+    }
+
+    # Coarser periods merge the base level's documents, with the fresh ones in place of the stored ones
+    rollups = get_rollup_collection()
+    for level, (period, _) in ROLLUP_LEVELS.items():
+        if level in BUCKET_LEVELS:
+            continue
+        for network, epochs in written.items():
+            for t in {epoch - epoch % period for epoch in epochs}:
+                docs = {
+                    doc["_id"]: doc
+                    for doc in rollups.find({"network": network, "level": BASE_LEVEL, "t": {"$gte": t, "$lt": t + period}})
+                }
+                docs.update((_id, doc) for _id, doc in fresh.items()
+                            if doc["network"] == network and doc["level"] == BASE_LEVEL and t <= doc["t"] < t + period)
+                parts = sorted(docs.values(), key=lambda doc: doc["t"])
+                fresh[rollup_id(network, level, t)] = merge_rollups(network, level, t, parts)
+
+    if fresh:
+        rollups.bulk_write([ReplaceOne({"_id": _id}, doc, upsert=True) for _id, doc in fresh.items()], ordered=False)
+
+def rollup_point(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a rollup document into min/max/mean/last per fee tier.
+    """
+    point: Dict[str, Any] = {"t": doc["t"]}
+    for tier in FEE_TIERS:
+        stats = doc.get(tier)
+        if not stats or not stats.get("count"):
+            point[tier] = None
+            continue
+        point[tier] = {
+            "min": stats["min"],
+            "max": stats["max"],
+            "mean": stats["sum"] / stats["count"],
+            "last": stats["last"],
+        }
+    return point
+
+def rollup_query(network: str, level: str, start: Optional[int] = None, end: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Build the rollup filter for periods starting in [start, end).
+    """
+    query: Dict[str, Any] = {"network": network, "level": level}
+    bounds: Dict[str, int] = {}
+    if start is not None:
+        bounds["$gte"] = start
+    if end is not None:
+        bounds["$lt"] = end
+    if bounds:
+        query["t"] = bounds
+    return query
+
+def point_sample(point: Dict[str, Any]) -> Sample:
+    """
+    Reduce a rollup point to a sample carrying the mean of each tier.
+    """
+    return (point["t"],) + tuple(point[tier]["mean"] if point[tier] else None for tier in FEE_TIERS)
+
+def select_level(start: int, resolution: Optional[int] = None, now: Optional[int] = None) -> str:
+    """
+    Pick the tier to answer a query reaching back to `start`.
+
+    Args:
+        start: Oldest epoch the query needs
+        resolution: Coarsest acceptable spacing between points in seconds, if any
+        now: Current epoch, for testing
+
+    Returns:
+        str: "raw" or one of ROLLUP_LEVELS
+    """
+    now = now if now is not None else int(datetime.now(timezone.utc).timestamp())
+    levels = [("raw", SAMPLE_SECONDS)] + [(level, period) for level, (period, _) in ROLLUP_LEVELS.items()]
+
+    # Finest first; a level qualifies if the data apply_retention keeps still reaches back far enough
+    covering = []
+    for level, period in levels:
+        cutoff = retention_cutoff(level, now)
+        if cutoff is None or cutoff <= start:
+            covering.append((level, period))
+    if resolution is not None:
+        fitting = [level for level, period in covering if period <= resolution]
+        if fitting:
+            return fitting[-1]
+    return covering[0][0] if covering else levels[-1][0]
+
+# Upper bound on points returned per series by GasRepository.aggregate_history
+MAX_POINTS = 500
+
+def _mean_sample(t: int, sums: List[float], counts: List[int]) -> Sample:
+    return (t,) + tuple(total / count if count else None for total, count in zip(sums, counts))
+
+def aggregate_plan(start: int, end: int, resolution: Optional[int] = None, now: Optional[int] = None) -> Tuple[int, str]:
+    """
+    Widen the resolution so at most MAX_POINTS points come back and pick the tier for it.
+
+    Returns:
+        Tuple[int, str]: The effective resolution and the tier to read
+    """
+    resolution = max(resolution or 0, SAMPLE_SECONDS, math.ceil((end - start) / MAX_POINTS))
+    return resolution, select_level(start, resolution, now)
+
+class SampleBins:
+    """
+    Accumulates raw samples into per-tier means over fixed-width time bins.
+    """
+    def __init__(self, resolution: int):
+        self.resolution = resolution
+        self._bins: Dict[int, Tuple[List[float], List[int]]] = {}
+
+    def add(self, sample: Sample) -> None:
+        sums, counts = self._bins.setdefault(sample[0] - sample[0] % self.resolution, ([0.0] * 3, [0] * 3))
+        for index, value in enumerate(sample[1:]):
+            if value is not None:
+                sums[index] += value
+                counts[index] += 1
+
+    def points(self) -> List[Sample]:
+        # Newest first, at most MAX_POINTS
+        return [_mean_sample(t, *self._bins[t]) for t in sorted(self._bins, reverse=True)[:MAX_POINTS]]
+
+def aggregate_pipeline(network: str, level: str, start: int, end: int, resolution: int) -> List[Dict[str, Any]]:
+    """
+    Build the pipeline that sums a rollup tier into bins of `resolution` seconds, newest first.
+    """
+    group: Dict[str, Any] = {"_id": {"$subtract": ["$t", {"$mod": ["$t", resolution]}]}}
+    for tier in FEE_TIERS:
+        group[f"{tier}_sum"] = {"$sum": f"${tier}.sum"}
+        group[f"{tier}_count"] = {"$sum": f"${tier}.count"}
+    return [
+        {"$match": {"network": network, "level": level, "t": {"$gte": start - start % resolution, "$lt": end}}},
+        {"$group": group},
+        {"$sort": {"_id": -1}},
+        {"$limit": MAX_POINTS},
+    ]
+
+def aggregate_point(doc: Dict[str, Any]) -> Sample:
+    return _mean_sample(
+        int(doc["_id"]),
+        [doc[f"{tier}_sum"] for tier in FEE_TIERS],
+        [doc[f"{tier}_count"] for tier in FEE_TIERS]
+    )
+
+def apply_retention(now: Optional[int] = None) -> Dict[str, int]:
+    """
+    Delete raw buckets and rollups that fell out of their retention window.
+
+    Args:
+        now: Current epoch, for testing
+
+    Returns:
+        Dict[str, int]: Deleted document counts per tier
+    """
+    now = now if now is not None else int(datetime.now(timezone.utc).timestamp())
+    deleted = {}
+
+    result = get_bucket_collection().delete_many({"end": {"$lte": now - RAW_RETENTION}})
+    deleted["raw"] = result.deleted_count
+
+    rollups = get_rollup_collection()
+    for level in ROLLUP_LEVELS:
+        cutoff = retention_cutoff(level, now)
+        if cutoff is None:
+            continue
+        result = rollups.delete_many({"level": level, "t": {"$lt": cutoff}})
+        deleted[level] = result.deleted_count
+
+    if any(deleted.values()):
+        logger.info(f"🧹 Retention removed {deleted}")
+    return deleted
+
+# === Export ===
+
+# Columns of exported rows per tier
+EXPORT_RAW_FIELDS = ["timestamp", "network", "high", "medium", "low"]
+EXPORT_ROLLUP_FIELDS = ["timestamp", "network"] + [
+    f"{tier}_{stat}" for tier in FEE_TIERS for stat in ("min", "max", "mean", "last")
+]
+
+# Documents fetched per round trip: (rollups, raw buckets of up to 720 samples each)
+EXPORT_BATCH_SIZES = (1000, 16)
+
+def export_query(networks: List[str], level: str, start: int, end: int) -> Tuple[str, Dict[str, Any]]:
+    """
+    Returns:
+        Tuple: The time field and the filter for an export range, on the
+        bucket collection for raw exports and the rollup collection otherwise
+    """
+    if level == "raw":
+        return "start", {
+            "network": {"$in": networks},
+            "start": {"$gte": bucket_start(start), "$lt": end},
+        }
+    return "t", {
+        "network": {"$in": networks},
+        "level": level,
+        "t": {"$gte": start, "$lt": end},
+    }
+
+class ExportPlanner:
+    """
+    Walks time keys and counts in order and finds where an export page ends.
+    Pages never split a time key, so the boundary is a stable keyset position.
+    """
+    def __init__(self, level: str, page_size: int):
+        self.level = level
+        self.page_size = page_size
+        self.rows = 0
+        self.current = None
+
+    def next_start(self, doc: Dict[str, Any], time_field: str) -> Optional[int]:
         """
-        Insert a document into the mock collection.
-        
+        Returns:
+            Optional[int]: The document's time key if the page ends before it, else None
+        """
+        if doc[time_field] != self.current:
+            if self.rows >= self.page_size:
+                return doc[time_field]
+            self.current = doc[time_field]
+        self.rows += doc.get("count", 1) if self.level == "raw" else 1
+        return None
+
+def export_rows(doc: Dict[str, Any], level: str, start: int, end: int) -> List[Dict[str, Any]]:
+    """
+    Convert one bucket or rollup document into export rows within [start, end).
+    """
+    if level == "raw":
+        return [
+            {"timestamp": to_iso(epoch), "network": doc["network"], "high": high, "medium": medium, "low": low}
+            for epoch, high, medium, low in decode_bucket(doc)
+            if start <= epoch < end
+        ]
+
+    point = rollup_point(doc)
+    row = {"timestamp": to_iso(point["t"]), "network": doc["network"]}
+    for tier in FEE_TIERS:
+        for stat in ("min", "max", "mean", "last"):
+            row[f"{tier}_{stat}"] = point[tier][stat] if point[tier] else None
+    return [row]
+
+# The legacy collector stamped documents with datetime.now(), the local time of
+# the host it ran on. IANA zone name of that host, e.g. "Europe/Berlin"; empty
+# assumes it ran in the same time zone as the process doing the migration.
+LEGACY_TIMEZONE = os.getenv("LEGACY_TIMEZONE", "")
+
+def legacy_timestamp(timestamp: str) -> str:
+    """
+    Convert a legacy document's local timestamp to the naive UTC format used everywhere else.
+    Timestamps that carry an offset are converted as they are.
+    """
+    parsed = datetime.fromisoformat(timestamp)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=ZoneInfo(LEGACY_TIMEZONE)) if LEGACY_TIMEZONE else parsed.astimezone()
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+
+def migrate_flat_documents(batch_size: int = 5000) -> int:
+    """
+    Move flat snapshot documents from the legacy collection into hourly buckets,
+    converting their local timestamps to UTC (see LEGACY_TIMEZONE). Migrated
+    documents are deleted, so running this again is a no-op. Documents that
+    can't be read are logged and left in place for inspection.
+
+    Args:
+        batch_size: Number of flat documents converted per round trip
+
+    Returns:
+        int: The number of documents migrated
+    """
+    legacy = get_gas_collection()
+    buckets = get_bucket_collection()
+    rollups = get_rollup_collection()
+    if legacy is None or buckets is None or rollups is None:
+        return 0
+
+    migrated = 0
+    skipped: List[Any] = []
+    while True:
+        docs = list(legacy.find({"_id": {"$nin": skipped}}).sort("timestamp", 1).limit(batch_size))
+        if not docs:
+            break
+
+        per_network: Dict[str, List[Sample]] = {network: [] for network in NETWORK_KEYS}
+        converted = []
+        for doc in docs:
+            try:
+                samples = snapshot_samples({**doc, "timestamp": legacy_timestamp(doc["timestamp"])})
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"⚠️ Skipping unreadable document {doc.get('_id')}: {e}")
+                skipped.append(doc["_id"])
+                continue
+            for network, sample in samples.items():
+                per_network[network].append(sample)
+            converted.append(doc["_id"])
+
+        store_samples(per_network)
+
+        # Only what was stored; skipped documents stay in the legacy collection
+        if converted:
+            legacy.delete_many({"_id": {"$in": converted}})
+        migrated += len(converted)
+
+    if migrated:
+        # Everything before the current hour is complete, pack it
+        seal_buckets(bucket_start(int(datetime.now(timezone.utc).timestamp())))
+        logger.info(f"🚚 Migrated {migrated} flat documents into buckets")
+    if skipped:
+        logger.warning(f"⚠️ Left {len(skipped)} unreadable document(s) in {mongo_collection}")
+    return migrated
+
+# === Indexes and query planning ===
+
+# name -> (collection getter, keys)
+INDEXES = {
+    "network_start": (get_bucket_collection, [("network", ASCENDING), ("start", DESCENDING)]),
+    "packed_end": (get_bucket_collection, [("packed", ASCENDING), ("end", ASCENDING)]),
+    "network_level_t": (get_rollup_collection, [("network", ASCENDING), ("level", ASCENDING), ("t", DESCENDING)]),
+    "level_t": (get_rollup_collection, [("level", ASCENDING), ("t", ASCENDING)]),
+    "start_network": (get_bucket_collection, [("start", ASCENDING), ("network", ASCENDING)]),
+    "timestamp": (get_gas_collection, [("timestamp", DESCENDING)]),
+}
+
+def ensure_indexes() -> None:
+    """
+    Create the indexes used by the hot read and maintenance paths. Safe to call on every startup.
+    """
+    for name, (get_collection, keys) in INDEXES.items():
+        collection = get_collection()
+        if collection is None:
+            continue
+        try:
+            collection.create_index(keys, name=name)
+        except ConnectionFailure:
+            # The remaining indexes would each wait out the same server selection timeout
+            raise
+        except Exception as e:
+            logger.error(f"❌ Could not create index {name}: {e}")
+    logger.info(f"✅ Ensured {len(INDEXES)} indexes")
+
+def hot_queries() -> Dict[str, Any]:
+    """
+    The query shapes issued on hot paths, as unexecuted cursors.
+
+    Returns:
+        Dict[str, Any]: Cursors keyed by a short description
+    """
+    buckets = get_bucket_collection()
+    now = int(datetime.now(timezone.utc).timestamp())
+    day_ago = now - 24 * BUCKET_SECONDS
+    return {
+        # read_series with only a limit: /latest, /history, predictions
+        "latest_series": buckets.find(series_query("btc")).sort("start", -1),
+        # read_series over a range: /history/{network} and its 30 day window
+        "range_series": buckets.find(series_query("btc", day_ago, now)).sort("start", -1),
+        # seal_buckets
+        "open_buckets": buckets.find({"packed": False, "end": {"$lte": now}}),
+        # plan_export_page over all networks
+        "export_plan": buckets.find(
+            {"network": {"$in": list(NETWORK_KEYS)}, "start": {"$gte": day_ago, "$lt": now}},
+            {"_id": 0, "start": 1, "count": 1}
+        ).sort("start", 1),
+        # read_rollups for a 30 day chart
+        "rollup_range": get_rollup_collection().find(
+            {"network": "btc", "level": "1h", "t": {"$gte": now - 30 * 86400, "$lt": now}}
+        ).sort("t", -1),
+        # migrate_flat_documents
+        "legacy_scan": get_gas_collection().find().sort("timestamp", 1),
+    }
+
+def _plan_stages(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    stages = [plan]
+    for child in plan.get("inputStages", []) + ([plan["inputStage"]] if "inputStage" in plan else []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+def explain_hot_queries() -> List[Dict[str, Any]]:
+    """
+    Run explain on every hot query and report how it is answered.
+
+    Returns:
+        List[Dict[str, Any]]: One report per query with the plan's stages, the
+        index used, and whether it is index-covered or needs an in-memory sort
+    """
+    reports = []
+    for name, cursor in hot_queries().items():
+        try:
+            winning = cursor.explain()["queryPlanner"]["winningPlan"]
+            # Slot-based engine plans nest the classic plan under queryPlan
+            stages = _plan_stages(winning.get("queryPlan", winning))
+        except Exception as e:
+            reports.append({"query": name, "error": str(e)})
+            continue
+
+        stage_names = [stage.get("stage") for stage in stages]
+        indexes = [stage["indexName"] for stage in stages if "indexName" in stage]
+        reports.append({
+            "query": name,
+            "stages": stage_names,
+            "index": indexes[0] if indexes else None,
+            "covered": bool(indexes) and "FETCH" not in stage_names and "COLLSCAN" not in stage_names,
+            "collection_scan": "COLLSCAN" in stage_names,
+            "in_memory_sort": "SORT" in stage_names,
+        })
+    return reports
+
+# === Async repository ===
+#
+# Read endpoints and predictions run on the event loop and query through
+# GasRepository, which uses the async driver instead of a threadpool. It is the
+# only read path; the synchronous functions above write and maintain storage
+# for the collector, the scheduled jobs and the CLI.
+
+def get_async_mongo_client() -> AsyncMongoClient:
+    """
+    Get or create the async MongoDB client. It connects lazily on first use,
+    on the running event loop.
+
+    Returns:
+        AsyncMongoClient: A configured async MongoDB client
+    """
+    global async_client
+    if async_client is None:
+        async_client = AsyncMongoClient(
+            mongo_uri,
+            serverSelectionTimeoutMS=5000,
+            maxPoolSize=100
+        )
+    return async_client
+
+async def close_async_mongo_client() -> None:
+    global async_client
+    if async_client is not None:
+        await async_client.close()
+        async_client = None
+
+class GasRepository:
+    """
+    Async, typed queries over the bucket and rollup collections.
+
+    The blocking write and maintenance methods (store_snapshots, seal_buckets,
+    apply_retention) are called from worker threads. memstore.MemoryRepository
+    implements the same interface without a database.
+    """
+    def __init__(self, buckets=None, rollups=None):
+        # Collections are resolved on first use unless given (e.g. for tests)
+        self._buckets = buckets
+        self._rollups = rollups
+
+    @property
+    def buckets(self):
+        if self._buckets is not None:
+            return self._buckets
+        return get_async_mongo_client()[mongo_db][mongo_bucket_collection]
+
+    @property
+    def rollups(self):
+        if self._rollups is not None:
+            return self._rollups
+        return get_async_mongo_client()[mongo_db][mongo_rollup_collection]
+
+    @timed_query
+    async def iter_series(
+        self,
+        network: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        newest_first: bool = True
+    ) -> AsyncIterator[Sample]:
+        """
+        Iterate over a network's samples in [start, end), reading one bucket at a time.
+
         Args:
-            document: The document to insert
-            
+            network: Short network name (btc, eth, sol)
+            start: Inclusive lower bound in epoch seconds
+            end: Exclusive upper bound in epoch seconds
+            newest_first: Iteration order
+
+        Yields:
+            Sample: (epoch, high, medium, low) tuples
+        """
+        cursor = self.buckets.find(series_query(network, start, end)).sort("start", -1 if newest_first else 1)
+        async for doc in cursor:
+            for sample in bucket_samples(doc, start, end, newest_first):
+                yield sample
+
+    @timed_query
+    async def read_series(
+        self,
+        network: str,
+        limit: Optional[int] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None
+    ) -> List[Sample]:
+        """
+        Read the newest samples of a network, newest first.
+
+        Args:
+            network: Short network name (btc, eth, sol)
+            limit: The maximum number of samples to return
+            start: Inclusive lower bound in epoch seconds
+            end: Exclusive upper bound in epoch seconds
+
         Returns:
-            InsertOneResult: A mock result
+            List[Sample]: (epoch, high, medium, low) tuples
         """
-        self.data.append(document)
-        return type('InsertOneResult', (), {'inserted_id': 'mock_id'})()
-    
-    def find_one(self, filter=None, sort=None):
+        samples: List[Sample] = []
+        if limit is not None and limit <= 0:
+            return samples
+        async for sample in self.iter_series(network, start, end):
+            samples.append(sample)
+            if limit is not None and len(samples) >= limit:
+                break
+        return samples
+
+    @timed_query
+    async def read_snapshots(self, limit: int, start: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Rebuild the newest flat snapshots from the per-network buckets, newest first.
+        """
+        results = await asyncio.gather(*(self.read_series(network, limit=limit, start=start) for network in NETWORK_KEYS))
+        return merge_snapshots(dict(zip(NETWORK_KEYS, results)), limit)
+
+    @timed_query
+    async def read_rollups(
+        self,
+        network: str,
+        level: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Find one document in the mock collection.
-        
+        Read rollup points of one level whose period starts in [start, end), newest first.
+
         Args:
-            filter: The filter to apply
-            sort: The sort to apply
-            
+            network: Short network name (btc, eth, sol)
+            level: One of ROLLUP_LEVELS
+            start: Inclusive lower bound in epoch seconds
+            end: Exclusive upper bound in epoch seconds
+            limit: The maximum number of points to return
+
         Returns:
-            dict: The document or None
+            List[Dict[str, Any]]: Points as returned by rollup_point
         """
-        if not self.data:
-            return None
-        return self.data[-1]
-    
-    def find(self, filter=None, sort=None, limit=None):
+        cursor = self.rollups.find(rollup_query(network, level, start, end)).sort("t", -1)
+        if limit:
+            cursor = cursor.limit(limit)
+        return [rollup_point(doc) async for doc in cursor]
+
+    @timed_query
+    async def read_history(
+        self,
+        network: str,
+        start: int,
+        end: Optional[int] = None,
+        resolution: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> Tuple[str, List[Sample]]:
+        """
+        Read a network's history from the tier that best fits the range and resolution.
+
+        Returns:
+            Tuple[str, List[Sample]]: The level used and its samples, newest first
         """
-        Find documents in the mock collection.
-        
+        level = select_level(start, resolution)
+        if level == "raw":
+            return level, await self.read_series(network, limit=limit, start=start, end=end)
+        return level, [point_sample(point) for point in await self.read_rollups(network, level, start, end, limit)]
+
+    @timed_query
+    async def aggregate_history(
+        self,
+        network: str,
+        start: int,
+        end: int,
+        resolution: Optional[int] = None
+    ) -> Tuple[str, int, List[Sample]]:
+        """
+        Bucket a network's history over [start, end) into evenly spaced means.
+
+        Returns:
+            Tuple[str, int, List[Sample]]: The tier used, the effective resolution and the points, newest first
+        """
+        resolution, level = aggregate_plan(start, end, resolution)
+
+        if level == "raw":
+            bins = SampleBins(resolution)
+            async for sample in self.iter_series(network, start, end):
+                bins.add(sample)
+            return level, resolution, bins.points()
+
+        return level, resolution, await self.aggregate_rollups(network, level, start, end, resolution)
+
+    @timed_query
+    async def aggregate_rollups(self, network: str, level: str, start: int, end: int, resolution: int) -> List[Sample]:
+        """
+        Sum a rollup tier into bins of `resolution` seconds, newest first.
+        """
+        cursor = await self.rollups.aggregate(aggregate_pipeline(network, level, start, end, resolution))
+        return [aggregate_point(doc) async for doc in cursor]
+
+    @timed_query
+    async def plan_export_page(self, networks: List[str], level: str, start: int, end: int, page_size: int) -> Optional[int]:
+        """
+        Find where an export page starting at `start` should end, reading only
+        time keys and counts. Pages never split a time key, so the boundary is a
+        stable keyset position.
+
         Args:
-            filter: The filter to apply
-            sort: The sort to apply
-            limit: The limit to apply
-            
+            networks: Short network names to export
+            level: "raw" or one of ROLLUP_LEVELS
+            start: Inclusive lower bound in epoch seconds
+            end: Exclusive upper bound in epoch seconds
+            page_size: Approximate maximum number of rows per page
+
         Returns:
-            list: The documents
+            Optional[int]: The start of the next page, or None if this page reaches `end`
         """
-        return self.data
-    
-def cleanup_old_data():
-    """
-    Remove data from MongoDB that isn't from the current day.
-    """
-    try:
-        global gas_collection
-        
-        # Calculate the start of the current day in UTC
-        from datetime import datetime, timedelta
-        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # Delete documents older than today
-        result = gas_collection.delete_many({"timestamp": {"$lt": today.isoformat()}})
-        logger.info(f"🧹 Cleaned up {result.deleted_count} old documents")
-        
-    except Exception as e:
-        logger.error(f"❌ Cleanup error: {e}")
-
-# Initialize the gas collection
-gas_collection = get_gas_collection()
+        time_field, query = export_query(networks, level, start, end)
+        collection = self.buckets if level == "raw" else self.rollups
+
+        planner = ExportPlanner(level, page_size)
+        async for doc in collection.find(query, {"_id": 0, time_field: 1, "count": 1}).sort(time_field, 1):
+            next_start = planner.next_start(doc, time_field)
+            if next_start is not None:
+                return next_start
+        return None
+
+    @timed_query
+    async def iter_export_rows(self, networks: List[str], level: str, start: int, end: int) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream export rows in [start, end), oldest first, holding one batch of documents at a time.
+
+        Yields:
+            Dict[str, Any]: Rows with EXPORT_RAW_FIELDS or EXPORT_ROLLUP_FIELDS
+        """
+        time_field, query = export_query(networks, level, start, end)
+        collection = self.buckets if level == "raw" else self.rollups
+
+        cursor = collection.find(query).sort([(time_field, 1), ("network", 1)])
+        async for doc in cursor.batch_size(EXPORT_BATCH_SIZES[level == "raw"]):
+            for row in export_rows(doc, level, start, end):
+                yield row
+
+    # === Writes and maintenance (blocking) ===
+
+    def prepare(self) -> None:
+        """
+        Create indexes and move legacy flat documents into buckets.
+        """
+        ensure_indexes()
+        migrate_flat_documents()
+
+    def store_snapshots(self, entries: List[Dict[str, Any]]) -> None:
+        store_snapshots(entries)
+
+    def seal_buckets(self, before: int) -> int:
+        return seal_buckets(before)
+
+    def apply_retention(self, now: Optional[int] = None) -> Dict[str, int]:
+        return apply_retention(now)
+
+    def checkpoint(self) -> None:
+        # MongoDB is durable on its own
+        pass
+
+
+# Global repository used by the API, the collector and the scheduled jobs.
+# Neither backend touches the database or disk until prepared or first queried.
+if STORAGE_BACKEND == "memory":
+    from .memstore import MemoryRepository
+    gas_repository = MemoryRepository()
+else:
+    gas_repository = GasRepository()
+
+def get_repository() -> GasRepository:
+    """
+    FastAPI dependency providing the storage backend to the read endpoints.
+    Override it through app.dependency_overrides to serve from another repository.
+    """
+    return gas_repository
+
+
+if __name__ == "__main__":
+    # python -m CoinGas.backend.db [indexes|explain|migrate]
+    import json
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "explain"
+    if command == "indexes":
+        ensure_indexes()
+    elif command == "explain":
+        ensure_indexes()
+        print(json.dumps(explain_hot_queries(), indent=2))
+    elif command == "migrate":
+        ensure_indexes()
+        print(f"Migrated {migrate_flat_documents()} documents")
+    else:
+        print(f"Unknown command: {command}")
+        sys.exit(1)
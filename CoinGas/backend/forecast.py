@@ -0,0 +1,184 @@
+import logging
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from .db import NETWORK_KEYS, FEE_TIERS, Sample, gas_repository, to_epoch, to_iso
+from .networks import get_network
+
+# NumPy is imported where it's used, so loading the app doesn't pay for it
+# before the first forecast (see startup.py)
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger("forecast")
+
+# Days of hourly history the model is fitted on, enough for weekly seasonality
+FORECAST_HISTORY_DAYS = 28
+
+# Smoothing factor for the deseasonalized level
+SMOOTHING_ALPHA = 0.3
+
+HOUR = 3600
+DAY = 86400
+
+# short network -> (hour the forecast was computed from, forecast)
+_precomputed: Dict[str, Tuple[int, List[Dict[str, Any]]]] = {}
+
+def current_hour() -> int:
+    now = to_epoch(datetime.utcnow().isoformat())
+    return now - now % HOUR
+
+async def load_hourly_history_async(network: str, end: int) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Load hourly means of the FORECAST_HISTORY_DAYS days before `end` from the storage repository.
+
+    Args:
+        network: Short network name (btc, eth, sol)
+        end: Exclusive upper bound in epoch seconds
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Epoch times of shape (n,) and fees of
+        shape (n, 3) with NaN for missing values, oldest first
+    """
+    _, samples = await gas_repository.read_history(network, end - FORECAST_HISTORY_DAYS * DAY, end, resolution=HOUR)
+    return history_arrays(samples)
+
+def history_arrays(samples: List[Sample]) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Convert newest-first samples into oldest-first time and fee arrays.
+    """
+    import numpy as np
+    samples = samples[::-1]
+    times = np.array([sample[0] for sample in samples], dtype=np.int64)
+    values = np.array(
+        [[np.nan if value is None else value for value in sample[1:]] for sample in samples],
+        dtype=np.float64
+    ).reshape(-1, len(FEE_TIERS))
+    return times, values
+
+def _seasonal_profile(index: "np.ndarray", size: int, values: "np.ndarray", valid: "np.ndarray", overall: "np.ndarray") -> "np.ndarray":
+    """
+    Mean of each season (hour of day, day of week) relative to the overall mean, per tier.
+    Seasons without data get a factor of 1.
+    """
+    import numpy as np
+    sums = np.zeros((size, values.shape[1]))
+    counts = np.zeros((size, values.shape[1]))
+    np.add.at(sums, index, values)
+    np.add.at(counts, index, valid)
+    means = np.divide(sums, counts, out=np.tile(overall, (size, 1)), where=counts > 0)
+    return np.divide(means, overall, out=np.ones_like(means), where=overall > 0)
+
+def seasonal_forecast(times: "np.ndarray", values: "np.ndarray", targets: "np.ndarray") -> "np.ndarray":
+    """
+    Forecast fees at the target times with a multiplicative hour-of-day and
+    day-of-week decomposition and an exponentially smoothed level.
+
+    Args:
+        times: Epoch times of the history, shape (n,)
+        values: Fees of the history, shape (n, tiers), NaN where missing
+        targets: Epoch times to forecast, shape (m,)
+
+    Returns:
+        np.ndarray: Forecast fees of shape (m, tiers), sorted high to low per row
+    """
+    import numpy as np
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    overall = filled.sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+
+    # 1970-01-01 was a Thursday; shift so Monday is 0
+    hour_of_day = (times // HOUR) % 24
+    day_of_week = (times // DAY + 3) % 7
+    hod_factor = _seasonal_profile(hour_of_day, 24, filled, valid, overall)
+    dow_factor = _seasonal_profile(day_of_week, 7, filled, valid, overall)
+
+    # Exponentially weighted level of the deseasonalized series, newest weighs most
+    season = hod_factor[hour_of_day] * dow_factor[day_of_week]
+    deseasonalized = np.divide(filled, season, out=np.zeros_like(filled), where=season > 0)
+    age = np.arange(len(times))[::-1]
+    weights = (SMOOTHING_ALPHA * (1 - SMOOTHING_ALPHA) ** age)[:, None] * valid
+    level = np.divide(
+        (weights * deseasonalized).sum(axis=0),
+        weights.sum(axis=0),
+        out=overall.copy(),
+        where=weights.sum(axis=0) > 0
+    )
+
+    target_hod = (targets // HOUR) % 24
+    target_dow = (targets // DAY + 3) % 7
+    forecast = level * hod_factor[target_hod] * dow_factor[target_dow]
+    return np.sort(forecast, axis=1)[:, ::-1]
+
+async def compute_forecast_async(network: str, hour: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Forecast tomorrow's 24 hourly fees for a network.
+
+    Args:
+        network: Short network name (btc, eth, sol)
+        hour: Start of the current hour, for testing
+
+    Returns:
+        List[Dict[str, Any]]: Entries shaped like the Gemini predictions, or [] without history
+    """
+    hour = hour if hour is not None else current_hour()
+    times, values = await load_hourly_history_async(network, hour)
+    return forecast_from_history(network, hour, times, values)
+
+def forecast_from_history(network: str, hour: int, times: "np.ndarray", values: "np.ndarray") -> List[Dict[str, Any]]:
+    """
+    Fit the seasonal model on hourly history and format the next day's forecast.
+    """
+    import numpy as np
+    if len(times) == 0:
+        logger.warning(f"No hourly history to forecast {network}")
+        return []
+
+    tomorrow = hour - hour % DAY + DAY
+    targets = tomorrow + np.arange(24, dtype=np.int64) * HOUR
+    forecast = seasonal_forecast(times, values, targets)
+
+    prediction = []
+    for target, (high, medium, low) in zip(targets.tolist(), forecast.tolist()):
+        timestamp = to_iso(target)
+        prediction.append({"timestamp": timestamp, "date": timestamp, "high": high, "medium": medium, "low": low})
+    return prediction
+
+async def precompute_forecasts() -> None:
+    """
+    Recompute the forecast for every network. Called once the hourly rollups
+    have moved on, so serving a local prediction is a dictionary lookup.
+    """
+    hour = current_hour()
+    for network in NETWORK_KEYS:
+        try:
+            _precomputed[network] = (hour, await compute_forecast_async(network, hour))
+        except Exception as e:
+            logger.error(f"❌ Forecast for {network} failed: {e}")
+    logger.info(f"🔮 Precomputed forecasts for {len(NETWORK_KEYS)} networks")
+
+async def forecast_tomorrow_async(network: str) -> List[Dict[str, Any]]:
+    """
+    Get tomorrow's forecast for a network. Only touches storage when the
+    forecast isn't precomputed for this hour.
+
+    Args:
+        network: Full network name (bitcoin, ethereum, solana)
+
+    Returns:
+        List[Dict[str, Any]]: 24 hourly predictions with high, medium, low values, or [] for an unknown network
+    """
+    # Only registered networks are cached, so client input can't grow the cache
+    resolved = get_network(network)
+    if resolved is None:
+        logger.warning(f"⚠️ Unknown network to forecast: {network}")
+        return []
+
+    hour = current_hour()
+    cached = _precomputed.get(resolved.key)
+    if cached and cached[0] == hour:
+        return cached[1]
+
+    prediction = await compute_forecast_async(resolved.key, hour)
+    _precomputed[resolved.key] = (hour, prediction)
+    return prediction
@@ -1,9 +1,20 @@
-from typing import Dict, Any, List
-from fastapi import APIRouter, HTTPException
+from typing import Dict, Any, List, Optional, AsyncIterator
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from datetime import datetime, timedelta
+import base64
+import csv
+import io
+import json
 import logging
+import re
 
-from .db import gas_collection
+from .db import NETWORK_NAMES, ROLLUP_LEVELS, EXPORT_RAW_FIELDS, EXPORT_ROLLUP_FIELDS, GasRepository, get_repository, to_epoch, to_iso
+from .cache import snapshot_cache
+from .httpcache import response_cache
+from .networks import get_network
+from .models import HISTORY_POINT_LIST_ADAPTER, SNAPSHOT_LIST_ADAPTER, HistoryPoint, Snapshot
+from .serialization import dumps_text
 
 # Configure logging
 logger = logging.getLogger("historical")
@@ -15,45 +26,233 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-@router.get("/{network}")
-def get_network_history(network: str, limit: int = 100) -> List[Dict[str, Any]]:
+# Suffixes accepted in the `resolution` query parameter
+RESOLUTION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def parse_resolution(value: str) -> int:
+    """
+    Parse a resolution such as "30s", "15m", "1h", "1d" or a plain number of seconds.
+
+    Returns:
+        int: The resolution in seconds
+    """
+    match = re.fullmatch(r"(\d+)([smhd]?)", value.strip().lower())
+    if not match or int(match.group(1)) <= 0:
+        raise HTTPException(status_code=400, detail=f"Invalid resolution: {value}. Use e.g. 30s, 15m, 1h or 1d")
+    return int(match.group(1)) * RESOLUTION_UNITS.get(match.group(2) or "s")
+
+async def get_network_range(
+    repository: GasRepository,
+    network: str,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    resolution: Optional[str]
+) -> List[Dict[str, Any]]:
+    """
+    Get evenly spaced, server-side aggregated history for a time range.
+    Defaults to the last 24 hours ending now.
+    """
+    end_epoch = to_epoch(end.isoformat()) if end else to_epoch(datetime.utcnow().isoformat())
+    start_epoch = to_epoch(start.isoformat()) if start else end_epoch - 86400
+    if start_epoch >= end_epoch:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    requested = parse_resolution(resolution) if resolution else None
+    try:
+        level, step, points = await repository.aggregate_history(NETWORK_NAMES[network], start_epoch, end_epoch, requested)
+    except Exception as e:
+        logger.error(f"Error aggregating historical data for {network}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error retrieving historical data: {str(e)}")
+
+    logger.info(f"Aggregated {len(points)} points for {network} from {level} at {step}s resolution")
+    return [
+        {"date": to_iso(t), "high": high, "medium": medium, "low": low}
+        for t, high, medium, low in points
+    ]
+
+# Rows serialized per chunk written to the response
+EXPORT_CHUNK_ROWS = 1000
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(token: str) -> Dict[str, Any]:
+    """
+    Decode a continuation token, checking its networks and level again since
+    the client can hand back anything.
+
+    Raises:
+        HTTPException: 400 for a malformed or tampered cursor
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        networks = [get_network(str(key)) for key in state["n"]]
+        if not networks or None in networks:
+            raise ValueError("unknown network")
+        level = str(state["l"])
+        if level != "raw" and level not in ROLLUP_LEVELS:
+            raise ValueError("unknown level")
+        return {"n": [network.key for network in networks], "l": level, "s": int(state["s"]), "e": int(state["e"])}
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def serialize_rows(rows: AsyncIterator[Dict[str, Any]], fmt: str, fields: List[str]) -> AsyncIterator[str]:
+    """
+    Serialize rows as NDJSON or CSV in chunks of EXPORT_CHUNK_ROWS.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, lineterminator="\n") if fmt == "csv" else None
+    if writer:
+        writer.writeheader()
+
+    count = 0
+    async for row in rows:
+        if writer:
+            writer.writerow(row)
+        else:
+            buffer.write(dumps_text(row))
+            buffer.write("\n")
+        count += 1
+        if count % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@router.get("/export")
+async def export_history(
+    network: Optional[str] = None,
+    level: str = "raw",
+    fmt: str = Query("ndjson", alias="format"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    page_size: int = Query(50000, ge=1, le=500000),
+    cursor: Optional[str] = None,
+    repository: GasRepository = Depends(get_repository)
+) -> StreamingResponse:
+    """
+    Stream historical data as NDJSON or CSV, oldest first, straight from the database cursor.
+
+    Pages are cut on timestamp boundaries (keyset pagination). When more data
+    is left, the `X-Next-Cursor` response header carries an opaque token; pass
+    it back as `cursor` (together with `format` and `page_size` if needed) to
+    read the next page.
+
+    Args:
+        network: The network to export (default: all networks)
+        level: "raw" samples or a rollup level (1m, 1h, 1d)
+        fmt: "ndjson" or "csv"
+        start: Start of the range (ISO 8601, default: everything)
+        end: End of the range (ISO 8601, default: now)
+        page_size: Approximate maximum number of rows in this page
+        cursor: Continuation token from a previous page
+
+    Returns:
+        StreamingResponse: The exported rows
+    """
+    if fmt not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+
+    if cursor:
+        state = decode_cursor(cursor)
+    else:
+        if network is not None and network not in NETWORK_NAMES:
+            raise HTTPException(status_code=400, detail=f"Invalid network. Must be one of: {', '.join(NETWORK_NAMES.keys())}")
+        if level != "raw" and level not in ROLLUP_LEVELS:
+            raise HTTPException(status_code=400, detail=f"Invalid level. Must be raw or one of: {', '.join(ROLLUP_LEVELS.keys())}")
+        state = {
+            "n": [NETWORK_NAMES[network]] if network else list(NETWORK_NAMES.values()),
+            "l": level,
+            "s": to_epoch(start.isoformat()) if start else 0,
+            "e": to_epoch(end.isoformat()) if end else to_epoch(datetime.utcnow().isoformat()),
+        }
+
+    try:
+        next_start = await repository.plan_export_page(state["n"], state["l"], state["s"], state["e"], page_size)
+    except Exception as e:
+        logger.error(f"Error planning export: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error exporting historical data: {str(e)}")
+
+    page_end = next_start if next_start is not None else state["e"]
+    rows = repository.iter_export_rows(state["n"], state["l"], state["s"], page_end)
+    fields = EXPORT_RAW_FIELDS if state["l"] == "raw" else EXPORT_ROLLUP_FIELDS
+
+    headers = {}
+    if next_start is not None:
+        headers["X-Next-Cursor"] = encode_cursor({**state, "s": next_start})
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(serialize_rows(rows, fmt, fields), media_type=media_type, headers=headers)
+
+@router.get("/{network}", response_model=List[HistoryPoint])
+async def get_network_history(
+    request: Request,
+    network: str,
+    limit: int = 100,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = None,
+    repository: GasRepository = Depends(get_repository)
+) -> Response:
     """
     Get historical gas fee data for a specific network.
+
+    Without a range this returns the newest raw entries. With `start`, `end` or
+    `resolution` the range is bucketed on the server into at most MAX_POINTS
+    points, read from the coarsest tier that fits. Responses are cached until
+    the next snapshot and support conditional requests.
     
     Args:
         network: The network to get history for (bitcoin, ethereum, or solana)
         limit: The maximum number of entries to return (default: 100)
+        start: Start of the range (ISO 8601, default: 24 hours before end)
+        end: End of the range (ISO 8601, default: now)
+        resolution: Spacing between points, e.g. 15m or 1h (default: fit the range)
         
     Returns:
-        List[Dict[str, Any]]: A list of historical gas fee data for the specified network
+        Response: A JSON list of historical gas fee data for the specified network
     """
-    # Map network names to their fee fields
-    fee_fields = {
-        "bitcoin": ("btc_high", "btc_medium", "btc_low"),
-        "ethereum": ("eth_high", "eth_medium", "eth_low"),
-        "solana": ("sol_high", "sol_medium", "sol_low")
-    }
-    
-    if network not in fee_fields:
-        raise HTTPException(status_code=400, detail=f"Invalid network. Must be one of: {', '.join(fee_fields.keys())}")
+    return await response_cache.respond(request, lambda: network_history(repository, network, limit, start, end, resolution), HISTORY_POINT_LIST_ADAPTER)
+
+async def network_history(
+    repository: GasRepository,
+    network: str,
+    limit: int,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    resolution: Optional[str]
+) -> List[Dict[str, Any]]:
+    if network not in NETWORK_NAMES:
+        raise HTTPException(status_code=400, detail=f"Invalid network. Must be one of: {', '.join(NETWORK_NAMES.keys())}")
     
-    high_field, medium_field, low_field = fee_fields[network]
+    if start is not None or end is not None or resolution is not None:
+        return await get_network_range(repository, network, start, end, resolution)
+
+    # Fee fields of this network in the flat snapshots
+    short = NETWORK_NAMES[network]
+    high_field, medium_field, low_field = f"{short}_high", f"{short}_medium", f"{short}_low"
     
     # Get historical data from MongoDB
     try:
         # Get data from the last 30 days
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
         
-        history = list(gas_collection.find(
-            {"timestamp": {"$gte": thirty_days_ago.isoformat()}},
-            {
-                "timestamp": 1,
-                high_field: 1,
-                medium_field: 1,
-                low_field: 1,
-                "_id": 0
-            }
-        ).sort("timestamp", -1).limit(limit))
+        # Serve from the in-memory cache when the window fits, otherwise from the buckets
+        history = snapshot_cache.window(limit, since=thirty_days_ago.isoformat())
+        if history is None:
+            since = to_epoch(thirty_days_ago.isoformat())
+            samples = await repository.read_series(short, limit=limit, start=since)
+            if len(samples) < limit:
+                # Raw samples only cover the last day, continue further back from the rollups
+                oldest = samples[-1][0] if samples else to_epoch(datetime.utcnow().isoformat())
+                _, older = await repository.read_history(short, since, oldest, limit=limit - len(samples))
+                samples.extend(older)
+            history = [
+                {"timestamp": to_iso(epoch), high_field: high, medium_field: medium, low_field: low}
+                for epoch, high, medium, low in samples
+            ]
         
         logger.info(f"Retrieved {len(history)} historical records for {network}")
         
@@ -62,9 +261,9 @@ def get_network_history(network: str, limit: int = 100) -> List[Dict[str, Any]]:
         for doc in history:
             formatted_history.append({
                 "date": doc["timestamp"],
-                "high": doc[high_field],
-                "medium": doc[medium_field],
-                "low": doc[low_field]
+                "high": doc.get(high_field),
+                "medium": doc.get(medium_field),
+                "low": doc.get(low_field)
             })
         
         return formatted_history
@@ -73,21 +272,24 @@ def get_network_history(network: str, limit: int = 100) -> List[Dict[str, Any]]:
         logger.error(f"Error retrieving historical data for {network}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error retrieving historical data: {str(e)}")
 
-@router.get("/")
-def get_all_history(limit: int = 100) -> List[Dict[str, Any]]:
+@router.get("/", response_model=List[Snapshot])
+async def get_all_history(request: Request, limit: int = 100, repository: GasRepository = Depends(get_repository)) -> Response:
     """
-    Get historical gas fee data for all networks.
+    Get historical gas fee data for all networks, cached until the next snapshot.
     
     Args:
         limit: The maximum number of entries to return (default: 100)
         
     Returns:
-        List[Dict[str, Any]]: A list of historical gas fee data
+        Response: A JSON list of historical gas fee data
     """
+    return await response_cache.respond(request, lambda: all_history(repository, limit), SNAPSHOT_LIST_ADAPTER)
+
+async def all_history(repository: GasRepository, limit: int) -> List[Dict[str, Any]]:
     try:
-        history = list(gas_collection.find().sort("timestamp", -1).limit(limit))
-        for doc in history:
-            doc["_id"] = str(doc["_id"])
+        history = snapshot_cache.window(limit)
+        if history is None:
+            history = await repository.read_snapshots(limit)
         
         logger.info(f"Retrieved {len(history)} historical records")
         return history
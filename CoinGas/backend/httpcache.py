@@ -0,0 +1,132 @@
+import time
+import hashlib
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from .cache import snapshot_cache
+from .serialization import dumps
+from .scheduler.jobs import COLLECT_INTERVAL
+
+# Serialized responses kept per worker
+RESPONSE_CACHE_SIZE = 256
+
+class CachedResponse:
+    """
+    A serialized response body and its validators, valid for one snapshot version.
+    """
+    __slots__ = ("version", "body", "etag", "last_modified")
+
+    def __init__(self, version: int, body: bytes, last_modified: Optional[float]):
+        self.version = version
+        self.body = body
+        # Strong validator: a digest of the exact bytes served
+        self.etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        self.last_modified = last_modified
+
+class ResponseCache:
+    """
+    Caches JSON responses keyed by route and query parameters.
+
+    Entries are tied to the snapshot cache's version, so every new snapshot
+    invalidates them all at once. Responses carry a strong ETag, Last-Modified
+    and a Cache-Control max-age that runs out at the next expected collector
+    tick; conditional requests that still match get a 304 without a body.
+    """
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Tuple[Tuple[str, str], ...]], CachedResponse]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def key(request: Request) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+        return request.url.path, tuple(sorted(request.query_params.multi_items()))
+
+    def max_age(self) -> int:
+        """
+        Seconds until the next snapshot is expected.
+        """
+        if snapshot_cache.updated_at is None:
+            return 0
+        elapsed = time.time() - snapshot_cache.updated_at
+        return max(0, int(COLLECT_INTERVAL - elapsed))
+
+    @staticmethod
+    def matches(request: Request, entry: CachedResponse) -> bool:
+        """
+        Evaluate If-None-Match, or If-Modified-Since when no ETag was sent.
+        """
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or entry.etag in tags or f"W/{entry.etag}" in tags
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and entry.last_modified is not None:
+            try:
+                return int(entry.last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def serialize(result: Any, adapter: Optional[TypeAdapter] = None) -> bytes:
+        """
+        Encode a result, through the route's response model when it has one.
+        Fields the result doesn't set are left out rather than filled with defaults.
+        """
+        if adapter is None:
+            return dumps(result)
+        return adapter.dump_json(adapter.validate_python(result), exclude_unset=True)
+
+    async def respond(self, request: Request, compute: Callable[[], Awaitable[Any]], adapter: Optional[TypeAdapter] = None) -> Response:
+        """
+        Serve a route from the cache, computing and serializing it on a miss.
+
+        Args:
+            request: The incoming request
+            compute: Coroutine function producing the JSON-serializable result
+            adapter: The route's response model, which validates and encodes the result
+
+        Returns:
+            Response: The cached body, or a 304 if the client's copy is current
+        """
+        key = self.key(request)
+        version = snapshot_cache.version
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == version:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+            result = await compute()
+            entry = CachedResponse(version, self.serialize(result, adapter), snapshot_cache.updated_at)
+            # Only keep it if no snapshot arrived while computing
+            if version == snapshot_cache.version:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        headers = {
+            "ETag": entry.etag,
+            "Cache-Control": f"public, max-age={self.max_age()}",
+        }
+        if entry.last_modified is not None:
+            headers["Last-Modified"] = formatdate(entry.last_modified, usegmt=True)
+
+        if self.matches(request, entry):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "not_modified": self.not_modified}
+
+# Shared cache for the polled read endpoints
+response_cache = ResponseCache()
@@ -17,31 +17,64 @@
 
 # === FastAPI WebSocket API for CoinGas ===
 
-from typing import Dict, Any, Union, List
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+# Imported first so the startup report covers importing everything below
+from .startup import startup_report
+
+from typing import Dict, Any, Union, List, Optional, AsyncIterator, Set
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from starlette.websockets import WebSocketState
 from datetime import datetime, timedelta
 # from pymongo.synchronous.cursor import Cursor
+import time
 import asyncio
 import logging
-import json
 
 # === Local modules ===
-from .db import gas_collection
-from .scheduler.collect import fetch_gas_fees as collector
+from .db import GasRepository, gas_repository, get_repository, close_async_mongo_client, to_epoch
+from .scheduler.collect import build_snapshot, close_http_client
 from .historical import router as historical_router
-from .prediction import predict_tomorrow
+from .cache import snapshot_cache
+from .httpcache import response_cache
+from .models import SNAPSHOT_ADAPTER, SNAPSHOT_LIST_ADAPTER, Message, SchedulerStats, Snapshot, StartupStats, StorageStats
+from .serialization import dumps_text, loads
+from .writer import snapshot_writer
+from .protocol import TIERS, ClientSession, Frame, frame_values
+from .networks import NETWORKS, NETWORK_NAMES, Network
+from .metrics import (
+    Gauge, MetricsMiddleware, registry, debug_sampled, snapshot_tick_duration,
+    broadcast_duration, ws_send_lag, ws_send_timeouts, prediction_duration
+)
+from .pubsub import PubSub, InProcessPubSub, create_pubsub
+from .scheduler.jobs import COLLECT_INTERVAL, job_stats, start_scheduler, stop_scheduler
+from .prediction import predict_tomorrow_async
+
+startup_report.record("import", startup_report.started)
 
 # === Logging setup ===
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("api")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Start the collector and its resources when the worker boots, and release them on shutdown.
+    """
+    await start_collector()
+    try:
+        yield
+    finally:
+        await stop_collector()
+
 # === FastAPI App ===
 app = FastAPI(
     title="CoinGas API",
     description="API for cryptocurrency gas fee information",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # === CORS ===
@@ -52,207 +85,413 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # === Active WebSocket connections ===
 active_connections: List[WebSocket] = []
 
+# Protocol state per connection (version, subscription, last values sent)
+client_sessions: Dict[WebSocket, ClientSession] = {}
+
+# === Shared collector state ===
+SEND_TIMEOUT = 2  # seconds a single client gets to accept a broadcast
+IDLE_TIMEOUT = 90  # seconds without any client message (the frontend pings every 30s)
+
+# Last broadcast payload, serialized once per tick and sent as-is to every version 1 client
+latest_payload: Optional[str] = None
+# Last snapshot as numeric values, rendered per version 2 client
+latest_frame: Optional[Frame] = None
+tick_seq = 0
+# perf_counter time of the last broadcast, for per-connection send lag
+broadcast_at = 0.0
+# Version 2 messages encoded for the current tick, shared between clients
+frame_cache: Dict[Any, Optional[str]] = {}
+# Notified once per tick; every connection's sender waits on it
+snapshot_ready = asyncio.Condition()
+subscriber_task: Optional[asyncio.Task] = None
+# Prepares storage and warms the hot cache after the worker is ready
+storage_task: Optional[asyncio.Task] = None
+
+# Snapshots go from the elected collector to every worker through pub/sub.
+# Without a shared backend every worker is its own collector.
+pubsub: PubSub = InProcessPubSub()
+
+# Read when /metrics is scraped
+registry.register(Gauge("coingas_ws_connections", "Open WebSocket connections", lambda: len(active_connections)))
+registry.register(Gauge("coingas_write_pending", "Snapshots waiting in the write-behind buffer",
+                        lambda: snapshot_writer.metrics()["pending"]))
+
+def build_payload(latest: Dict[str, Any]) -> str:
+    """
+    Format a collected snapshot for the frontend and serialize it once.
+
+    Args:
+        latest: The snapshot returned by the collector
+
+    Returns:
+        str: The JSON payload sent to every WebSocket client
+    """
+    timestamp = latest.get("timestamp", datetime.utcnow().isoformat())
+    payload = [format_network_data(network, latest, timestamp) for network in NETWORKS.values()]
+    return dumps_text(payload)
+
+def render_messages(websocket: WebSocket, payload: Optional[str], frame: Optional[Frame], cache: Dict[Any, Optional[str]]) -> List[str]:
+    """
+    Pick the messages one client gets for the current snapshot based on its protocol version.
+    """
+    session = client_sessions.get(websocket)
+    if session is None or session.version == 1:
+        return [payload] if payload is not None else []
+    if frame is None:
+        return []
+    return session.render(frame, asyncio.get_running_loop().time(), cache)
+
+async def send_messages(websocket: WebSocket, messages: List[str]) -> None:
+    for message in messages:
+        await websocket.send_text(message)
+
+async def broadcast(message: str, frame: Frame) -> None:
+    """
+    Publish a new snapshot and wake every connection's sender. Version 1 clients
+    share the same pre-serialized message; version 2 clients get deltas, and
+    identical deltas are encoded once per tick.
+    """
+    global latest_payload, latest_frame, tick_seq, frame_cache, broadcast_at
+    async with snapshot_ready:
+        latest_payload = message
+        latest_frame = frame
+        tick_seq = frame[0]
+        frame_cache = {}
+        broadcast_at = time.perf_counter()
+        snapshot_ready.notify_all()
+
+async def collect_snapshot() -> None:
+    """
+    Build, store and publish one snapshot. Scheduled every COLLECT_INTERVAL
+    seconds on the leader only, so upstream calls and Mongo writes happen once
+    per tick regardless of worker and client count.
+    """
+    with snapshot_tick_duration.time():
+        latest = await build_snapshot()
+        if latest is not None:
+            await pubsub.publish(latest)
+
+async def subscriber_loop() -> None:
+    """
+    Receive published snapshots, keep the hot cache current and fan them out
+    to this worker's WebSocket clients.
+    """
+    async for latest in pubsub.subscribe():
+        try:
+            with broadcast_duration.time():
+                snapshot_cache.append(latest)
+                frame = (
+                    tick_seq + 1, to_epoch(latest["timestamp"]), frame_values(latest),
+                    latest.get("stale", []), latest.get("eta", {}),
+                )
+                debug_sampled(logger, "broadcast", "📤 Broadcasting gas data to %d client(s)", len(active_connections))
+                await broadcast(build_payload(latest), frame)
+        except Exception as e:
+            logger.error(f"❌ Error broadcasting snapshot: {str(e)}")
+
+async def prepare_storage() -> None:
+    """
+    Prepare storage and warm the hot read cache, then start writing snapshots.
+    Runs in the background so a slow or unreachable database doesn't hold up
+    boot; until it finishes, reads are served from live ticks and storage queries.
+    """
+    try:
+        with startup_report.phase("storage"):
+            # Create indexes and migrate legacy documents, or load the in-memory store
+            await asyncio.to_thread(gas_repository.prepare)
+            if not isinstance(pubsub, InProcessPubSub):
+                await asyncio.to_thread(pubsub.ensure_indexes)
+        with startup_report.phase("warm_cache"):
+            docs = await gas_repository.read_snapshots(snapshot_cache.capacity)
+            # Keep the snapshots collected while storage was loading
+            newest = docs[0]["timestamp"] if docs else ""
+            live = [doc for doc in snapshot_cache.window(len(snapshot_cache)) or [] if doc["timestamp"] > newest]
+            snapshot_cache.seed(live + docs)
+    except Exception as e:
+        logger.error(f"❌ Could not prepare storage: {str(e)}")
+
+    # Started after loading, so an in-memory store is never written before it is loaded
+    snapshot_writer.start()
+    startup_report.mark_warm()
+
+async def start_collector() -> None:
+    global subscriber_task, storage_task, snapshot_ready, pubsub
+    # Bind the notification to the serving event loop
+    snapshot_ready = asyncio.Condition()
+
+    with startup_report.phase("pubsub"):
+        try:
+            pubsub = create_pubsub()
+        except Exception as e:
+            logger.error(f"❌ Could not set up pub/sub, collecting in this worker only: {str(e)}")
+            pubsub = InProcessPubSub()
+        subscriber_task = asyncio.create_task(subscriber_loop())
+
+    with startup_report.phase("scheduler"):
+        # Several workers only share snapshots through a shared backend; elect one collector among them
+        await start_scheduler(collect_snapshot, use_lease=not isinstance(pubsub, InProcessPubSub))
+    logger.info("🚀 Background collector started")
+
+    storage_task = asyncio.create_task(prepare_storage())
+    startup_report.mark_ready()
+
+async def stop_collector() -> None:
+    # Releases the leader lease so another worker takes over right away
+    await stop_scheduler()
+    if subscriber_task is not None:
+        subscriber_task.cancel()
+        try:
+            await subscriber_task
+        except asyncio.CancelledError:
+            pass
+    storage_ready = storage_task is not None and storage_task.done()
+    if storage_task is not None and not storage_ready:
+        storage_task.cancel()
+        try:
+            await storage_task
+        except asyncio.CancelledError:
+            pass
+    logger.info("🛑 Background collector stopped")
+    if storage_ready:
+        # Write (or spill) the snapshots still buffered
+        await snapshot_writer.close()
+        await asyncio.to_thread(gas_repository.checkpoint)
+    else:
+        # Storage never finished loading; keep the buffer on disk rather than overwrite the store
+        await snapshot_writer.spill_buffer()
+    await pubsub.close()
+    await close_http_client()
+    await close_async_mongo_client()
+
+async def send_prediction(websocket: WebSocket, network: str, backend: Optional[str] = None) -> None:
+    """
+    Predict tomorrow's fees for a network and send the result to one client.
+    """
+    try:
+        label = network if network in NETWORK_NAMES else "other"
+        with prediction_duration.time(label):
+            prediction = await predict_tomorrow_async(network, backend)
+        await websocket.send_text(dumps_text({
+            "action": "prediction",
+            "data": prediction
+        }))
+    except Exception as e:
+        logger.error(f"❌ Error sending prediction for {network}: {str(e)}")
+
+async def send_loop(websocket: WebSocket) -> None:
+    """
+    Push each new snapshot to one client. Sleeps on the shared notification
+    between ticks; a client that falls behind skips straight to the newest snapshot.
+    """
+    seen = 0
+    while True:
+        async with snapshot_ready:
+            await snapshot_ready.wait_for(lambda: tick_seq > seen)
+            seen = tick_seq
+            sent_at = broadcast_at
+            messages = render_messages(websocket, latest_payload, latest_frame, frame_cache)
+        if messages:
+            await asyncio.wait_for(send_messages(websocket, messages), timeout=SEND_TIMEOUT)
+            ws_send_lag.observe(time.perf_counter() - sent_at)
+
+async def receive_loop(websocket: WebSocket, session: ClientSession, predictions: Set[asyncio.Task]) -> None:
+    """
+    Handle heartbeat, prediction and subscription messages from one client.
+    Returns when the client disconnects or stays silent for IDLE_TIMEOUT.
+
+    Args:
+        websocket: The client connection
+        session: The client's protocol state
+        predictions: Running prediction tasks of this connection, cancelled when it closes
+    """
+    while True:
+        try:
+            data = await asyncio.wait_for(websocket.receive_text(), timeout=IDLE_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.info("⌛ Closing idle WebSocket")
+            return
+
+        if data == "ping":
+            await websocket.send_text("pong")
+            continue
+
+        # Handle prediction and subscription requests
+        try:
+            message = loads(data)
+        except ValueError:
+            continue
+        if not isinstance(message, dict):
+            continue
+
+        if message.get("action") == "predict":
+            network = message.get("network")
+            # Predict in the background so heartbeats keep flowing meanwhile
+            task = asyncio.create_task(send_prediction(websocket, network, message.get("backend")))
+            predictions.add(task)
+            task.add_done_callback(predictions.discard)
+        elif message.get("action") == "subscribe":
+            # Switch to protocol version 2 and resend a full snapshot
+            try:
+                session.subscribe(message.get("networks"), message.get("interval"))
+            except (TypeError, ValueError) as e:
+                await websocket.send_text(dumps_text({"v": 2, "type": "error", "message": str(e)}))
+                continue
+            await send_messages(websocket, render_messages(websocket, latest_payload, latest_frame, {}))
+
 @app.websocket("/ws/gas")
 async def websocket_endpoint(websocket: WebSocket):
     """
     WebSocket endpoint for real-time gas fee data.
-    Handles both heartbeat messages and gas fee updates.
+    Each connection runs a receive task for client messages and a send task
+    woken by the collector, so idle connections cost nothing between ticks.
+    See protocol.py for the versioned delta protocol.
     """
+    tasks: List[asyncio.Task] = []
+    predictions: Set[asyncio.Task] = set()
     try:
         await websocket.accept()
+        session = ClientSession(min_interval=COLLECT_INTERVAL)
+        if websocket.query_params.get("v") == "2":
+            session.subscribe()
+        client_sessions[websocket] = session
         active_connections.append(websocket)
         logger.info("✅ WebSocket connection established")
-        
-        # Initialize last update time
-        last_update = datetime.utcnow() - timedelta(seconds=5)
-        
-        while True:
-            try:
-                try:
-                    # Wait for either data to be available or a ping message
-                    data = await asyncio.wait_for(websocket.receive_text(), timeout=1.0)
-                    if data == "ping":
-                        await websocket.send_text("pong")
-                        continue
-                    
-                    # Handle prediction request
-                    try:
-                        logger.info(f"Trying to json interpret {data}")
-                        message = json.loads(data)
-                        if message.get("action") == "predict":
-                            network = message.get("network")
-                            # Call Gemini API to predict tomorrow's data
-                            prediction = predict_tomorrow(network)
-                            await websocket.send_json({
-                                "action": "prediction",
-                                "data": prediction
-                            })
-                            continue
-                    except json.JSONDecodeError:
-                        pass
-                
-                except asyncio.TimeoutError:
-                    # No message received, check if it's time to send an update
-                    pass
-                
-                # Check if it's time to send a gas fee update
-                now = datetime.utcnow()
-                if (now - last_update).total_seconds() >= 5:
-                    # Fetch and format the latest gas fee data
-                    latest = collector()
-                    logger.info(f"🧪 Latest gas data: {latest}")
-
-                    timestamp = latest.get("timestamp", now.isoformat())
-
-                    # Format data for each cryptocurrency
-                    btc = format_btc_data(latest, timestamp)
-                    eth = format_eth_data(latest, timestamp)
-                    sol = format_sol_data(latest, timestamp)
-
-                    # Send live gas data to frontend
-                    payload = [btc, eth, sol]
-                    logger.info(f"📤 Sending WebSocket payload")
-                    logger.debug(f"Payload details: {payload}")
-                    
-                    await websocket.send_json(payload)
-                    last_update = now
-                
-                # Small sleep to prevent tight loop
-                await asyncio.sleep(0.1)
-                
-            except WebSocketDisconnect:
+
+        # The sender starts with the most recent snapshot instead of waiting for the next tick
+        tasks = [
+            asyncio.create_task(receive_loop(websocket, session, predictions)),
+            asyncio.create_task(send_loop(websocket)),
+        ]
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if isinstance(error, WebSocketDisconnect):
                 logger.info("⚠️ Client disconnected")
-                break
-            except Exception as e:
-                logger.error(f"❌ Error in WebSocket loop: {str(e)}")
-                await asyncio.sleep(1)
-                continue
+            elif isinstance(error, asyncio.TimeoutError):
+                ws_send_timeouts.inc()
+                logger.warning("⚠️ Dropping WebSocket after slow send")
+            elif error is not None:
+                logger.error(f"❌ Error in WebSocket loop: {error!r}")
 
     except WebSocketDisconnect:
         logger.info("⚠️ Client disconnected during handshake")
     except Exception as e:
         logger.error(f"❌ WebSocket error during setup: {str(e)}")
     finally:
-        # Clean up resources
+        # Clean up resources, including predictions still waiting on a result
+        pending = [*tasks, *predictions]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        client_sessions.pop(websocket, None)
         if websocket in active_connections:
             active_connections.remove(websocket)
             logger.info("🧹 Removed connection from active connections")
-        try:
-            await websocket.close()
-            logger.info("🔌 WebSocket connection closed gracefully")
-        except Exception as e:
-            logger.error(f"❌ Error during WebSocket cleanup: {str(e)}")
-
-# === Formatters for each blockchain ===
+        if websocket.client_state == WebSocketState.CONNECTED:
+            try:
+                await websocket.close()
+                logger.info("🔌 WebSocket connection closed gracefully")
+            except Exception as e:
+                logger.error(f"❌ Error during WebSocket cleanup: {str(e)}")
 
-def format_btc_data(latest: Dict[str, Any], timestamp: str) -> Dict[str, Any]:
-    return {
-        "network": "bitcoin",
-        "symbol": "BTC",
-        "speeds": [
-            {"level": "high", "gasPrice": f"{latest.get('btc_high', 0)} sat/vB", "estimatedTime": "10-30 min"},
-            {"level": "medium", "gasPrice": f"{latest.get('btc_medium', 0)} sat/vB", "estimatedTime": "30-60 min"},
-            {"level": "low", "gasPrice": f"{latest.get('btc_low', 0)} sat/vB", "estimatedTime": "1+ hour"},
-        ],
-        "lastUpdated": timestamp
-    }
+# === Formatters ===
 
-def format_eth_data(latest: Dict[str, Any], timestamp: str) -> Dict[str, Any]:
-    return {
-        "network": "ethereum",
-        "symbol": "ETH",
-        "speeds": [
-            {"level": "high", "gasPrice": f"{latest.get('eth_high', 0):.2f} gwei", "estimatedTime": "<2 min"},
-            {"level": "medium", "gasPrice": f"{latest.get('eth_medium', 0):.2f} gwei", "estimatedTime": "2-5 min"},
-            {"level": "low", "gasPrice": f"{latest.get('eth_low', 0):.2f} gwei", "estimatedTime": "5+ min"},
-        ],
-        "lastUpdated": timestamp
-    }
+def format_eta(seconds: float) -> str:
+    """
+    Format an expected confirmation time, e.g. "~2 sec", "~30 min", "~2 hours".
+    """
+    if seconds < 1:
+        return "<1 sec"
+    if seconds < 60:
+        return f"~{round(seconds)} sec"
+    if seconds < 5400:
+        return f"~{round(seconds / 60)} min"
+    return f"~{round(seconds / 3600)} hours"
 
-def format_sol_data(latest: Dict[str, Any], timestamp: str) -> Dict[str, Any]:
+def format_network_data(network: Network, latest: Dict[str, Any], timestamp: str) -> Dict[str, Any]:
+    """
+    Format one network's fees from a flat snapshot for the frontend. Confirmation
+    times come from the snapshot's estimate when the source has one.
+    """
+    eta = latest.get("eta", {}).get(network.key)
     return {
-        "network": "solana",
-        "symbol": "SOL",
+        "network": network.name,
+        "symbol": network.symbol,
         "speeds": [
             {
-                "level": "high",
-                "gasPrice": f"{latest.get('sol_high', 0):.2e} SOL",
-                "estimatedTime": "~2 sec"
-            },
-            {
-                "level": "medium",
-                "gasPrice": f"{latest.get('sol_medium', 0):.2e} SOL",
-                "estimatedTime": "~5 sec"
-            },
-            {
-                "level": "low",
-                "gasPrice": f"{latest.get('sol_low', 0):.2e} SOL",
-                "estimatedTime": "~10 sec"
+                "level": tier,
+                "gasPrice": f"{format(latest.get(f'{network.key}_{tier}', 0), network.price_format)} {network.unit}",
+                "estimatedTime": format_eta(eta[i]) if eta else network.estimated_time[tier]
             }
+            for i, tier in enumerate(TIERS)
         ],
-        "lastUpdated": timestamp
+        "lastUpdated": timestamp,
+        "stale": network.key in latest.get("stale", [])
     }
 
 # === REST Endpoints ===
 
-@app.get("/")
+@app.get("/", response_model=Message)
 def read_root() -> Dict[str, str]:
     return {"message": "Gas Fee API is running"}
 
-@app.get("/latest")
-def get_latest_fees() -> Dict[str, Any]:
-    latest = gas_collection.find_one(sort=[("timestamp", -1)])
-    if not latest:
+@app.get("/latest", response_model=Snapshot)
+async def get_latest_fees(request: Request, repository: GasRepository = Depends(get_repository)) -> Response:
+    return await response_cache.respond(request, lambda: latest_fees(repository), SNAPSHOT_ADAPTER)
+
+async def latest_fees(repository: GasRepository) -> Dict[str, Any]:
+    latest = snapshot_cache.latest()
+    if latest:
+        return latest
+
+    stored = await repository.read_snapshots(1)
+    if not stored:
         raise HTTPException(status_code=404, detail="No gas data found")
-    latest["_id"] = str(latest["_id"])
-    return latest
-
-@app.get("/history")
-def get_fee_history(limit: int = 100) -> List[Dict[str, Any]]:
-    history = list(gas_collection.find().sort("timestamp", -1).limit(limit))
-    for doc in history:
-        doc["_id"] = str(doc["_id"])
-    return history
-
-@app.get("/history/{network}")
-def get_network_history(network: str, limit: int = 100) -> List[Dict[str, Any]]:
-    fee_fields = {
-        "bitcoin": ("btc_high", "btc_medium", "btc_low"),
-        "ethereum": ("eth_high", "eth_medium", "eth_low"),
-        "solana": ("sol_high", "sol_medium", "sol_low")
-    }
+    return stored[0]
+
+@app.get("/history", response_model=List[Snapshot])
+async def get_fee_history(request: Request, limit: int = 100, repository: GasRepository = Depends(get_repository)) -> Response:
+    return await response_cache.respond(request, lambda: fee_history(repository, limit), SNAPSHOT_LIST_ADAPTER)
 
-    if network not in fee_fields:
-        raise HTTPException(status_code=400, detail=f"Invalid network. Must be one of: {', '.join(fee_fields.keys())}")
-
-    high_field, medium_field, low_field = fee_fields[network]
-    
-    # logger.info(f"type(gas_collection) = {type(gas_collection)}")
-    # logger.info(f"type(gas_collection.find()) = {type(gas_collection.find())}")
-    
-    cursor:Cursor = gas_collection.find(
-        {},
-        {"timestamp": 1, high_field: 1, medium_field: 1, low_field: 1, "_id": 0}
-    )
-    
-    cursor = cursor.sort("timestamp", -1).limit(limit)
-
-    history = list(cursor)
-
-    formatted_history = []
-    for doc in history:
-        formatted_history.append({
-            "date": doc["timestamp"],
-            "high": doc[high_field],
-            "medium": doc[medium_field],
-            "low": doc[low_field]
-        })
-
-    return formatted_history
+async def fee_history(repository: GasRepository, limit: int) -> List[Dict[str, Any]]:
+    history = snapshot_cache.window(limit)
+    if history is not None:
+        return history
+
+    return await repository.read_snapshots(limit)
+
+@app.get("/scheduler", response_model=SchedulerStats)
+async def get_scheduler_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Run counts, durations and missed runs of this process's scheduled jobs.
+    """
+    return job_stats
+
+@app.get("/storage", response_model=StorageStats)
+async def get_storage_stats() -> Dict[str, Any]:
+    """
+    Backlog and counters of the write-behind snapshot buffer.
+    """
+    return snapshot_writer.metrics()
+
+@app.get("/startup", response_model=StartupStats)
+async def get_startup_stats() -> Dict[str, Any]:
+    """
+    How long this worker took to import, become ready and warm its storage.
+    """
+    return startup_report.summary()
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics() -> PlainTextResponse:
+    """
+    Prometheus text exposition of this worker's metrics.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # Include optional router
 app.include_router(historical_router)
@@ -0,0 +1,332 @@
+import os
+import json
+import logging
+import heapq
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator, Iterator
+
+from .db import (
+    GasRepository, Sample, NETWORK_KEYS, FEE_TIERS, ROLLUP_LEVELS, BUCKET_LEVELS, BASE_LEVEL, BUCKET_SECONDS, MAX_POINTS,
+    snapshot_samples, rollup_point, export_rows, bucket_rollups, merge_rollups, bucket_start, raw_cutoff,
+    retention_cutoff, _mean_sample, to_iso
+)
+from .metrics import timed_query
+
+logger = logging.getLogger("memstore")
+
+# Where the in-memory store is saved and restored from; unset keeps it memory-only
+MEMORY_SNAPSHOT_PATH = os.getenv("MEMORY_SNAPSHOT_PATH", "")
+
+# Entries copied per series at a time while exporting
+EXPORT_PAGE_SIZE = 1000
+
+class SortedSeries:
+    """
+    Parallel arrays kept sorted by epoch, with bisect range lookups.
+    Appending in time order (the collector's case) is O(1).
+    """
+    def __init__(self):
+        self.times: List[int] = []
+        self.rows: List[Any] = []
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def insert(self, t: int, row: Any) -> None:
+        """
+        Insert the entry for `t`, replacing the one already there.
+        """
+        if not self.times or t > self.times[-1]:
+            self.times.append(t)
+            self.rows.append(row)
+            return
+        index = bisect_left(self.times, t)
+        if index < len(self.times) and self.times[index] == t:
+            self.rows[index] = row
+            return
+        self.times.insert(index, t)
+        self.rows.insert(index, row)
+
+    def get(self, t: int) -> Optional[Any]:
+        index = bisect_left(self.times, t)
+        if index < len(self.times) and self.times[index] == t:
+            return self.rows[index]
+        return None
+
+    def span(self, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Returns:
+            Tuple[int, int]: The index range of entries in [start, end)
+        """
+        lo = 0 if start is None else bisect_left(self.times, start)
+        hi = len(self.times) if end is None else bisect_left(self.times, end)
+        return lo, max(lo, hi)
+
+    def trim(self, before: int) -> int:
+        """
+        Drop entries older than `before`.
+
+        Returns:
+            int: The number of entries dropped
+        """
+        index = bisect_left(self.times, before)
+        del self.times[:index]
+        del self.rows[:index]
+        return index
+
+class MemoryRepository(GasRepository):
+    """
+    Storage backend that keeps raw samples and rollups in process memory, for
+    benchmarks, CI and small deployments without MongoDB (STORAGE_BACKEND=memory).
+
+    Raw samples live in one SortedSeries per network; rollups in one per
+    network and level, holding documents shaped like those in gas_rollups so
+    the shared decoding helpers apply. Retention tiers match the MongoDB
+    backend. With MEMORY_SNAPSHOT_PATH set, the store is loaded on startup and
+    saved by the scheduler and on shutdown.
+    """
+    def __init__(self, snapshot_path: str = MEMORY_SNAPSHOT_PATH):
+        super().__init__()
+        self.snapshot_path = snapshot_path
+        self._lock = threading.Lock()
+        self._raw: Dict[str, SortedSeries] = {network: SortedSeries() for network in NETWORK_KEYS}
+        self._rollups: Dict[Tuple[str, str], SortedSeries] = {
+            (network, level): SortedSeries() for network in NETWORK_KEYS for level in ROLLUP_LEVELS
+        }
+
+    # === Writes and maintenance ===
+
+    def prepare(self) -> None:
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            self.load(self.snapshot_path)
+
+    def store_snapshots(self, entries: List[Dict[str, Any]]) -> None:
+        # Like the MongoDB backend, samples older than the raw retention window are dropped
+        cutoff = raw_cutoff(int(datetime.now(timezone.utc).timestamp()))
+        by_network: Dict[str, List[Sample]] = {}
+        for entry in entries:
+            for network, sample in snapshot_samples(entry).items():
+                if sample[0] >= cutoff:
+                    by_network.setdefault(network, []).append(sample)
+        self.store_samples(by_network)
+
+    def store_samples(self, by_network: Dict[str, List[Sample]]) -> None:
+        """
+        Store samples of any age and rebuild the rollups they fall in.
+        Idempotent like the MongoDB backend: a sample replaces the one at the
+        same epoch. Seeding history older than the raw window goes through
+        here, and apply_retention then drops the raw samples but keeps the rollups.
+
+        Args:
+            by_network: Samples keyed by network
+        """
+        with self._lock:
+            for network, samples in by_network.items():
+                if not samples:
+                    continue
+                for sample in samples:
+                    self._raw[network].insert(sample[0], sample[1:])
+                self._refresh_rollups(network, [sample[0] for sample in samples])
+
+    def _refresh_rollups(self, network: str, epochs: List[int]) -> None:
+        """
+        Rebuild every rollup period containing one of `epochs` from the stored
+        samples, which is what the incremental updates add up to in MongoDB.
+        """
+        start = bucket_start(min(epochs))
+        lo, hi = self._raw[network].span(start, bucket_start(max(epochs)) + BUCKET_SECONDS)
+        samples = [(t,) + tuple(row) for t, row in zip(self._raw[network].times[lo:hi], self._raw[network].rows[lo:hi])]
+        for doc in bucket_rollups(network, samples, epochs):
+            self._rollups[(network, doc["level"])].insert(doc["t"], doc)
+
+        for level, (period, _) in ROLLUP_LEVELS.items():
+            if level in BUCKET_LEVELS:
+                continue
+            base = self._rollups[(network, BASE_LEVEL)]
+            for t in {epoch - epoch % period for epoch in epochs}:
+                lo, hi = base.span(t, t + period)
+                self._rollups[(network, level)].insert(t, merge_rollups(network, level, t, base.rows[lo:hi]))
+
+    def seal_buckets(self, before: int) -> int:
+        # Nothing to pack in memory
+        return 0
+
+    def apply_retention(self, now: Optional[int] = None) -> Dict[str, int]:
+        now = now if now is not None else int(datetime.now(timezone.utc).timestamp())
+        # Same cutoffs as the MongoDB backend, so both keep the same periods
+        deleted = {"raw": 0}
+        with self._lock:
+            for series in self._raw.values():
+                deleted["raw"] += series.trim(retention_cutoff("raw", now))
+            for (_, level), series in self._rollups.items():
+                cutoff = retention_cutoff(level, now)
+                if cutoff is not None:
+                    deleted[level] = deleted.get(level, 0) + series.trim(cutoff)
+        return deleted
+
+    def checkpoint(self) -> None:
+        if self.snapshot_path:
+            self.save(self.snapshot_path)
+
+    def save(self, path: str) -> None:
+        """
+        Write the store to a JSON file, atomically replacing the previous one.
+        """
+        with self._lock:
+            # Serialize under the lock; rollup documents are updated in place
+            data = json.dumps({
+                "raw": {network: [[t, *row] for t, row in zip(series.times, series.rows)] for network, series in self._raw.items()},
+                "rollups": [doc for series in self._rollups.values() for doc in series.rows],
+            })
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        logger.info(f"💾 Saved in-memory store to {path}")
+
+    def load(self, path: str) -> None:
+        """
+        Replace the store's contents with a file written by save.
+        """
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        with self._lock:
+            for network, series in self._raw.items():
+                series.times, series.rows = [], []
+                for t, *row in state["raw"].get(network, []):
+                    series.insert(t, tuple(row))
+            for series in self._rollups.values():
+                series.times, series.rows = [], []
+            for doc in state["rollups"]:
+                self._rollups[(doc["network"], doc["level"])].insert(doc["t"], doc)
+        logger.info(f"✅ Loaded in-memory store from {path}")
+
+    # === Reads ===
+
+    def _raw_slice(self, network: str, start: Optional[int], end: Optional[int]) -> List[Sample]:
+        series = self._raw[network]
+        with self._lock:
+            lo, hi = series.span(start, end)
+            return [(t,) + tuple(row) for t, row in zip(series.times[lo:hi], series.rows[lo:hi])]
+
+    def _rollup_slice(self, network: str, level: str, start: Optional[int], end: Optional[int]) -> List[Dict[str, Any]]:
+        series = self._rollups[(network, level)]
+        with self._lock:
+            lo, hi = series.span(start, end)
+            return [dict(doc) for doc in series.rows[lo:hi]]
+
+    def _iter_pages(self, series: SortedSeries, network: str, start: int, end: int) -> Iterator[Tuple[int, str, Any]]:
+        """
+        Yield a series' (t, network, row) entries in [start, end) oldest first,
+        copying EXPORT_PAGE_SIZE at a time so an export never holds the lock or
+        a full copy of the range.
+        """
+        while True:
+            with self._lock:
+                lo, hi = series.span(start, end)
+                hi = min(hi, lo + EXPORT_PAGE_SIZE)
+                page = [(t, network, row) for t, row in zip(series.times[lo:hi], series.rows[lo:hi])]
+            yield from page
+            if len(page) < EXPORT_PAGE_SIZE:
+                return
+            start = page[-1][0] + 1
+
+    @timed_query
+    async def iter_series(
+        self,
+        network: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        newest_first: bool = True
+    ) -> AsyncIterator[Sample]:
+        samples = self._raw_slice(network, start, end)
+        if newest_first:
+            samples.reverse()
+        for sample in samples:
+            yield sample
+
+    @timed_query
+    async def read_series(
+        self,
+        network: str,
+        limit: Optional[int] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None
+    ) -> List[Sample]:
+        # Only copy the newest `limit` entries of the range
+        series = self._raw[network]
+        with self._lock:
+            lo, hi = series.span(start, end)
+            if limit is not None:
+                lo = max(lo, hi - max(0, limit))
+            samples = [(t,) + tuple(row) for t, row in zip(series.times[lo:hi], series.rows[lo:hi])]
+        samples.reverse()
+        return samples
+
+    @timed_query
+    async def read_rollups(
+        self,
+        network: str,
+        level: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        docs = self._rollup_slice(network, level, start, end)
+        docs.reverse()
+        if limit:
+            docs = docs[:limit]
+        return [rollup_point(doc) for doc in docs]
+
+    @timed_query
+    async def aggregate_rollups(self, network: str, level: str, start: int, end: int, resolution: int) -> List[Sample]:
+        bins: Dict[int, Tuple[List[float], List[int]]] = {}
+        for doc in self._rollup_slice(network, level, start - start % resolution, end):
+            sums, counts = bins.setdefault(doc["t"] - doc["t"] % resolution, ([0.0] * 3, [0] * 3))
+            for index, tier in enumerate(FEE_TIERS):
+                stats = doc.get(tier)
+                if stats:
+                    sums[index] += stats["sum"]
+                    counts[index] += stats["count"]
+        return [_mean_sample(t, *bins[t]) for t in sorted(bins, reverse=True)[:MAX_POINTS]]
+
+    def _export_times(self, networks: List[str], level: str, start: int, end: int, limit: int) -> List[int]:
+        """
+        The first `limit` timestamps of each network's series in [start, end),
+        merged in order. Timestamps are unique within a series, so with a limit
+        of page_size + 1 this holds the last timestamp of the page and the first
+        one after it.
+        """
+        times: List[int] = []
+        with self._lock:
+            for network in networks:
+                series = self._raw[network] if level == "raw" else self._rollups[(network, level)]
+                lo, hi = series.span(start, end)
+                times.extend(series.times[lo:min(hi, lo + limit)])
+        times.sort()
+        return times
+
+    @timed_query
+    async def plan_export_page(self, networks: List[str], level: str, start: int, end: int, page_size: int) -> Optional[int]:
+        times = self._export_times(networks, level, start, end, page_size + 1)
+        if len(times) <= page_size:
+            return None
+        # Never split a timestamp across pages
+        boundary = bisect_right(times, times[page_size - 1])
+        return times[boundary] if boundary < len(times) else None
+
+    @timed_query
+    async def iter_export_rows(self, networks: List[str], level: str, start: int, end: int) -> AsyncIterator[Dict[str, Any]]:
+        # Merge the networks' series page by page, ordered by (t, network) like the MongoDB export
+        if level != "raw":
+            pages = [self._iter_pages(self._rollups[(network, level)], network, start, end) for network in networks]
+            for _, _, doc in heapq.merge(*pages, key=lambda entry: entry[:2]):
+                for row in export_rows(dict(doc), level, start, end):
+                    yield row
+            return
+
+        pages = [self._iter_pages(self._raw[network], network, start, end) for network in networks]
+        for epoch, network, (high, medium, low) in heapq.merge(*pages, key=lambda entry: entry[:2]):
+            yield {"timestamp": to_iso(epoch), "network": network, "high": high, "medium": medium, "low": low}
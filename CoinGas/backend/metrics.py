@@ -0,0 +1,284 @@
+import os
+import time
+import bisect
+import inspect
+import logging
+import functools
+import threading
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# === Metrics ===
+#
+# A small in-process registry rendered in the Prometheus text format on
+# /metrics. Each worker exposes its own counters; scrape every worker (or sum
+# them in Prometheus) when running several.
+
+# Buckets in seconds, from sub-millisecond cache hits to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """
+    Base class for a metric family with a fixed set of label names.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Tuple[Any, ...]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(label) for label in labels)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Gauge(Metric):
+    """
+    A value that goes up and down. With `function`, the value is read when
+    /metrics is scraped instead of being maintained on the hot path.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation)
+        self.function = function
+        self._value = 0.0
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def samples(self) -> List[str]:
+        value = self.function() if self.function is not None else self._value
+        return [f"{self.name} {_format_value(value)}"]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (count per bucket plus +Inf, [sum])
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def time(self, *labels: Any) -> "Timer":
+        """
+        Context manager observing the duration of its block.
+        """
+        return Timer(self, labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Tuple[Any, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+registry = MetricsRegistry()
+
+# === Metric families ===
+
+fetch_duration = registry.register(Histogram(
+    "coingas_fetch_duration_seconds", "Upstream fee fetch latency", ("network",)))
+fetch_errors = registry.register(Counter(
+    "coingas_fetch_errors_total", "Failed or skipped upstream fee fetches", ("network", "reason")))
+snapshot_tick_duration = registry.register(Histogram(
+    "coingas_snapshot_tick_seconds", "Time to build and publish one snapshot"))
+broadcast_duration = registry.register(Histogram(
+    "coingas_broadcast_seconds", "Time to encode a snapshot and wake every connection's sender"))
+ws_send_lag = registry.register(Histogram(
+    "coingas_ws_send_lag_seconds", "Time from a snapshot broadcast until it was written to a connection"))
+ws_send_timeouts = registry.register(Counter(
+    "coingas_ws_send_timeouts_total", "Connections dropped after a slow send"))
+storage_query_duration = registry.register(Histogram(
+    "coingas_storage_query_seconds", "Storage read latency by API route and query", ("route", "query")))
+http_request_duration = registry.register(Histogram(
+    "coingas_http_request_seconds", "HTTP request latency by route and status", ("route", "status")))
+prediction_duration = registry.register(Histogram(
+    "coingas_prediction_seconds", "Prediction latency", ("network",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)))
+
+# === Route context ===
+
+# ASGI scope of the HTTP request being served; routing fills in scope["route"]
+_request_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_scope", default=None)
+
+def current_route() -> str:
+    """
+    The route template of the request being served (e.g. /history/{network}),
+    or "background" outside of a request.
+    """
+    scope = _request_scope.get()
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by route template and status,
+    and exposing the request's route to storage timings.
+    """
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        token = _request_scope.set(scope)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_request_duration.observe(time.perf_counter() - started, current_route(), status[0])
+            _request_scope.reset(token)
+
+def timed_query(func: Callable) -> Callable:
+    """
+    Decorate a repository read to record its latency under the current route.
+    Async generators are timed until they are exhausted or closed.
+    """
+    if inspect.isasyncgenfunction(func):
+        @functools.wraps(func)
+        async def generator(*args: Any, **kwargs: Any):
+            started = time.perf_counter()
+            try:
+                async for item in func(*args, **kwargs):
+                    yield item
+            finally:
+                storage_query_duration.observe(time.perf_counter() - started, current_route(), func.__name__)
+        return generator
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            storage_query_duration.observe(time.perf_counter() - started, current_route(), func.__name__)
+    return wrapper
+
+# === Sampled debug logging ===
+
+# Log one in this many occurrences of a hot-path debug message
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "20"))
+
+_sample_counts: Dict[str, int] = {}
+
+def debug_sampled(logger: logging.Logger, key: str, message: str, *args: Any) -> None:
+    """
+    Log a debug message from a hot path, only every LOG_SAMPLE_EVERY-th time.
+    Arguments are formatted lazily, so nothing is formatted unless DEBUG is on.
+
+    Args:
+        logger: The logger to write to
+        key: Identifies the message for sampling
+        message: %-style format string
+        args: Format arguments
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    count = _sample_counts.get(key, 0)
+    _sample_counts[key] = count + 1
+    if count % LOG_SAMPLE_EVERY == 0:
+        logger.debug(message, *args)
@@ -0,0 +1,82 @@
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+
+# === Response models ===
+#
+# Typed responses are serialized by pydantic-core instead of walking plain
+# dicts through jsonable_encoder, and document the API in /docs. Routes served
+# from the response cache return a prebuilt body, so FastAPI's response_model
+# never sees it; they encode through the adapters at the end of this module.
+
+class Snapshot(BaseModel):
+    """
+    One collected snapshot, as stored and cached. Networks whose source failed
+    are left out, or listed in `stale` when their last value was carried over.
+    `eta` holds expected confirmation seconds per tier for sources that
+    estimate them; like `stale`, it is only present on live snapshots.
+    Networks added through the registry appear as further <key>_<tier> fields.
+    """
+    model_config = ConfigDict(extra="allow")
+
+    timestamp: str
+    btc_high: Optional[float] = None
+    btc_medium: Optional[float] = None
+    btc_low: Optional[float] = None
+    eth_high: Optional[float] = None
+    eth_medium: Optional[float] = None
+    eth_low: Optional[float] = None
+    sol_high: Optional[float] = None
+    sol_medium: Optional[float] = None
+    sol_low: Optional[float] = None
+    stale: List[str] = []
+    eta: Dict[str, List[float]] = {}
+
+class HistoryPoint(BaseModel):
+    """
+    One point of a single network's history.
+    """
+    date: str
+    high: Optional[float] = None
+    medium: Optional[float] = None
+    low: Optional[float] = None
+
+class JobStats(BaseModel):
+    runs: int
+    failures: int
+    missed: int
+    skipped: int
+    last_run: Optional[str] = None
+    last_duration: Optional[float] = None
+    max_duration: float
+    total_duration: float
+
+class StorageStats(BaseModel):
+    written: int
+    batches: int
+    failures: int
+    spilled: int
+    replayed: int
+    dropped: int
+    max_pending_seen: int
+    last_flush_duration: Optional[float] = None
+    last_error: Optional[str] = None
+    pending: int
+    oldest_pending_age: float
+    spill_pending: bool
+
+class StartupStats(BaseModel):
+    ready_ms: Optional[float] = None
+    warm_ms: Optional[float] = None
+    phases_ms: Dict[str, float]
+
+class Message(BaseModel):
+    message: str
+
+# Responses of the scheduler stats endpoint, keyed by job id
+SchedulerStats = Dict[str, JobStats]
+
+# Body encoders for the cached routes, see httpcache.ResponseCache.respond
+SNAPSHOT_ADAPTER = TypeAdapter(Snapshot)
+SNAPSHOT_LIST_ADAPTER = TypeAdapter(List[Snapshot])
+HISTORY_POINT_LIST_ADAPTER = TypeAdapter(List[HistoryPoint])
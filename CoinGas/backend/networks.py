@@ -0,0 +1,134 @@
+import os
+import json
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger("networks")
+
+# === Network registry ===
+#
+# Every tracked chain is described once here. Storage, the collector, the
+# WebSocket payloads, the history endpoints and predictions all iterate the
+# registry, so adding a chain is a matter of configuration.
+#
+# Chains beyond the built-in ones are added from a JSON file named by
+# NETWORKS_CONFIG, a list of descriptors using the field names below.
+# An entry whose key already exists overrides it; "enabled": false removes it.
+#
+#   [
+#       {"key": "arb", "name": "arbitrum", "symbol": "ARB", "unit": "gwei",
+#        "source": "evm_rpc", "url": "https://arb1.arbitrum.io/rpc",
+#        "estimated_time": {"high": "<1 sec", "medium": "~1 sec", "low": "~2 sec"},
+#        "price_format": ".4f", "poll_interval": 10}
+#   ]
+#
+# Sources are implemented in scheduler/collect.py: mempool (recommended fees),
+# mempool_histogram (estimated from the mempool's fee histogram), etherscan,
+# solana_rpc, and evm_rpc (eth_feeHistory against any EVM JSON-RPC endpoint).
+# Sources with raw fee samples take their tier percentiles from
+# options["percentiles"], e.g. [95, 60, 20], or FEE_TIER_PERCENTILES
+# (see scheduler/estimate.py).
+#
+# The built-in eth network estimates from eth_feeHistory on ETH_RPC_URL. To
+# use Etherscan's gas oracle instead (fixed tiers, no confirmation estimate):
+#
+#   [{"key": "eth", "source": "etherscan",
+#     "url": "https://api.etherscan.io/api?module=gastracker&action=gasoracle",
+#     "options": {"api_key_env": "ETHERSCAN_API_KEY"}}]
+
+NETWORKS_CONFIG = os.getenv("NETWORKS_CONFIG", "")
+
+class Network(NamedTuple):
+    key: str  # storage key and snapshot field prefix, e.g. btc -> btc_high
+    name: str  # full name used by the API, e.g. bitcoin
+    symbol: str
+    unit: str
+    source: str  # fetcher implementation, see scheduler/collect.py
+    url: str
+    estimated_time: Dict[str, str]  # confirmation time label per fee tier, unless the source estimates one
+    price_format: str = ""  # format spec for displayed prices, e.g. ".2f"
+    poll_interval: Optional[float] = None  # seconds between fetches, defaults to COLLECT_INTERVAL
+    timeout: float = 3.0  # seconds a single fetch may take
+    options: Dict[str, Any] = {}  # source specific settings
+
+def fetch_timeout(key: str) -> float:
+    return float(os.getenv(f"{key.upper()}_FETCH_TIMEOUT", "3"))
+
+BUILTIN_NETWORKS = [
+    Network(
+        key="btc",
+        name="bitcoin",
+        symbol="BTC",
+        unit="sat/vB",
+        source="mempool_histogram",
+        url="https://mempool.space/api/mempool",
+        estimated_time={"high": "10-30 min", "medium": "30-60 min", "low": "1+ hour"},
+        timeout=fetch_timeout("btc"),
+        options={"window": 6, "block_vsize": 1_000_000, "block_time": 600, "min_fee": 1.0},
+    ),
+    Network(
+        key="eth",
+        name="ethereum",
+        symbol="ETH",
+        unit="gwei",
+        source="evm_rpc",
+        url=os.getenv("ETH_RPC_URL", "https://ethereum-rpc.publicnode.com"),
+        estimated_time={"high": "<2 min", "medium": "2-5 min", "low": "5+ min"},
+        price_format=".2f",
+        timeout=fetch_timeout("eth"),
+        options={"blocks": 20, "block_time": 12},
+    ),
+    Network(
+        key="sol",
+        name="solana",
+        symbol="SOL",
+        unit="SOL",
+        source="solana_rpc",
+        url=os.getenv("SOLANA_RPC_URL", "https://api.mainnet-beta.solana.com"),
+        estimated_time={"high": "~2 sec", "medium": "~5 sec", "low": "~10 sec"},
+        price_format=".2e",
+        timeout=fetch_timeout("sol"),
+    ),
+]
+
+def load_networks(path: str = NETWORKS_CONFIG) -> Dict[str, Network]:
+    """
+    Build the registry from the built-in networks and the optional config file.
+
+    Returns:
+        Dict[str, Network]: Networks by storage key, in registration order
+    """
+    networks = {network.key: network for network in BUILTIN_NETWORKS}
+    if not path:
+        return networks
+
+    with open(path, encoding="utf-8") as f:
+        entries: List[Dict[str, Any]] = json.load(f)
+    for entry in entries:
+        entry = dict(entry)
+        enabled = entry.pop("enabled", True)
+        key = entry["key"]
+        if not enabled:
+            networks.pop(key, None)
+            continue
+        if key in networks:
+            networks[key] = networks[key]._replace(**entry)
+        else:
+            entry.setdefault("timeout", fetch_timeout(key))
+            networks[key] = Network(**entry)
+    logger.info(f"✅ Loaded {len(networks)} network(s) from {path}")
+    return networks
+
+# Registered networks by storage key (btc, eth, sol, ...)
+NETWORKS = load_networks()
+
+# Full network name -> storage key
+NETWORK_NAMES = {network.name: network.key for network in NETWORKS.values()}
+
+def get_network(name: str) -> Optional[Network]:
+    """
+    Look up a network by full name or storage key, case-insensitively.
+    """
+    name = name.lower()
+    key = NETWORK_NAMES.get(name, name)
+    return NETWORKS.get(key)
@@ -1,10 +1,16 @@
-import google.generativeai as genai
+import asyncio
+import hashlib
 import logging
 import os
 import json
+import time
 from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 
-from .db import gas_collection
+from .db import BUCKET_SECONDS, gas_repository, to_epoch, to_iso
+from .networks import NETWORK_NAMES, get_network
+from .cache import snapshot_cache
+from .forecast import forecast_tomorrow_async
 
 # === Logging setup ===
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -12,10 +18,45 @@ logger = logging.getLogger("predictor")
 
 # Configure Gemini API with key from environment
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "YOUR_API_KEY_HERE")
-genai.configure(api_key=GEMINI_API_KEY)
+# Alternative API host, e.g. a local stub for benchmarks (http://127.0.0.1:9100)
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "")
+GEMINI_MODEL = "gemini-1.5-flash"
 
-# Set up the model
-model = genai.GenerativeModel('gemini-1.5-flash')
+# Created on the first Gemini prediction; importing the SDK alone takes about half a second
+_model = None
+
+def get_gemini_model():
+    """
+    Get or create the Gemini model, importing and configuring the SDK on first use.
+
+    Returns:
+        GenerativeModel: The configured Gemini model
+    """
+    global _model
+    if _model is None:
+        import google.generativeai as genai
+
+        if GEMINI_API_ENDPOINT:
+            genai.configure(api_key=GEMINI_API_KEY, transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+        else:
+            genai.configure(api_key=GEMINI_API_KEY)
+        _model = genai.GenerativeModel(GEMINI_MODEL)
+    return _model
+
+# Default prediction backend: "gemini" (remote LLM) or "local" (statistical forecast)
+PREDICTION_BACKEND = os.getenv("PREDICTION_BACKEND", "gemini").lower()
+
+# How long a prediction is reused for the same network and input data, in seconds
+PREDICTION_TTL = int(os.getenv("PREDICTION_TTL", "3600"))
+
+# Days of hourly history a prediction is based on
+PREDICTION_HISTORY_DAYS = 7
+
+# (network, input fingerprint) -> (expiry as monotonic time, prediction)
+_prediction_cache: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+
+# (network, input fingerprint) -> running prediction, shared by concurrent callers
+_in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
 
 def network_to_short(network: str) -> str:
     """
@@ -27,31 +68,75 @@ def network_to_short(network: str) -> str:
     Returns:
         str: Shortened name (btc, eth, sol)
     """
-    mapping = {
-        "bitcoin": "btc",
-        "ethereum": "eth", 
-        "solana": "sol"
-    }
-    return mapping.get(network.lower(), network)
+    return NETWORK_NAMES.get(network.lower(), network)
+
+
+async def load_prediction_input_async(network: str) -> List[Dict[str, Any]]:
+    """
+    Load the history a prediction is based on: hourly means of the last
+    PREDICTION_HISTORY_DAYS days, up to the last completed hour. The input only
+    changes once per hour, so predictions can be cached by its fingerprint.
+    Falls back to the newest raw samples while no hourly data exists yet.
+
+    Args:
+        network: The blockchain network (bitcoin, ethereum, solana)
+
+    Returns:
+        List[Dict[str, Any]]: Entries with a timestamp and <short>_high/medium/low fields, newest first,
+        or an empty list for an unknown network
+    """
+    resolved = get_network(network)
+    if resolved is None:
+        return []
+    mongoDbNetworkName:str = resolved.key
+    now = to_epoch(datetime.utcnow().isoformat())
+    hour_start = now - now % BUCKET_SECONDS
 
+    _, samples = await gas_repository.read_history(
+        mongoDbNetworkName,
+        hour_start - PREDICTION_HISTORY_DAYS * 86400,
+        hour_start,
+        resolution=BUCKET_SECONDS
+    )
+    if not samples:
+        history = snapshot_cache.window(100)
+        if history is not None:
+            return history
+        samples = await gas_repository.read_series(mongoDbNetworkName, limit=100)
 
-def predict_tomorrow(network:str):
+    return [
+        {
+            "timestamp": to_iso(epoch),
+            f"{mongoDbNetworkName}_high": high,
+            f"{mongoDbNetworkName}_medium": medium,
+            f"{mongoDbNetworkName}_low": low
+        }
+        for epoch, high, medium, low in samples
+    ]
+
+def history_fingerprint(network: str, history: List[Dict[str, Any]]) -> str:
+    """
+    Hash the fields of the history that feed a prediction for the network.
     """
-    Predict tomorrow's gas fees for a given network using historical data and Gemini AI.
+    short = network_to_short(network)
+    fields = ("timestamp", f"{short}_high", f"{short}_medium", f"{short}_low")
+    rows = [[entry.get(field) for field in fields] for entry in history]
+    return hashlib.sha1(json.dumps(rows, default=str).encode()).hexdigest()
+
+def predict_from_history(network: str, history: List[Dict[str, Any]]):
+    """
+    Predict tomorrow's gas fees for a given network from its history using Gemini AI.
+    This blocks for the whole Gemini round trip.
     
     Args:
         network: The blockchain network to predict for (bitcoin, ethereum, solana)
+        history: Entries as returned by load_prediction_input_async
     
     Returns:
-        dict: Predicted gas fees with high, medium, low values
+        list: 24 hourly predictions with high, medium, low values
     """
     
     mongoDbNetworkName:str = network_to_short(network)
-    # Get historical data
-    history = list(gas_collection.find(
-        {},
-        {"timestamp": 1, f"{mongoDbNetworkName}_high": 1, f"{mongoDbNetworkName}_medium": 1, f"{mongoDbNetworkName}_low": 1, "_id": 0}
-    ).sort("timestamp", -1).limit(100))
     
     if not history:
         logger.error(f"No historical data found for network: {network}")
@@ -81,7 +166,7 @@ def predict_tomorrow(network:str):
     
     try:
         # Get prediction from Gemini
-        response = model.generate_content(prompt)
+        response = get_gemini_model().generate_content(prompt)
         prediction = response.text
         
         # Parse the response (Gemini may return markdown with JSON)
@@ -104,4 +189,54 @@ def predict_tomorrow(network:str):
     
     except Exception as e:
         logger.error(f"Prediction failed: {str(e)}")
-        return []
\ No newline at end of file
+        return []
+
+async def predict_tomorrow_async(network: str, backend: Optional[str] = None):
+    """
+    Predict tomorrow's gas fees without blocking the event loop.
+
+    Local forecasts are precomputed every hour and served from memory.
+    Gemini results are cached per network and input fingerprint for
+    PREDICTION_TTL seconds, and concurrent requests for the same input share
+    one Gemini call.
+
+    Args:
+        network: The blockchain network to predict for (bitcoin, ethereum, solana)
+        backend: "gemini" or "local" (default: PREDICTION_BACKEND)
+
+    Returns:
+        list: 24 hourly predictions with high, medium, low values, or an empty list for an unknown network
+    """
+    # Every distinct name would be its own cache entry and its own Gemini call
+    resolved = get_network(network)
+    if resolved is None:
+        logger.warning(f"⚠️ Unknown network to predict: {network}")
+        return []
+    network = resolved.name
+
+    if (backend or PREDICTION_BACKEND).lower() == "local":
+        return await forecast_tomorrow_async(network)
+
+    history = await load_prediction_input_async(network)
+    key = (resolved.key, history_fingerprint(network, history))
+
+    cached = _prediction_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    future = _in_flight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(asyncio.to_thread(predict_from_history, network, history))
+        _in_flight[key] = future
+        future.add_done_callback(lambda _: _in_flight.pop(key, None))
+
+    # Shield so one client going away does not cancel the call for everyone else
+    prediction = await asyncio.shield(future)
+
+    # Failed predictions come back empty; don't keep those around
+    if prediction:
+        now = time.monotonic()
+        for stale_key in [k for k, (expiry, _) in _prediction_cache.items() if expiry <= now]:
+            del _prediction_cache[stale_key]
+        _prediction_cache[key] = (now + PREDICTION_TTL, prediction)
+    return prediction
\ No newline at end of file
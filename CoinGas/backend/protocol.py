@@ -0,0 +1,168 @@
+# === CoinGas WebSocket protocol ===
+#
+# Version 1 (default) pushes the full formatted payload for all networks every tick.
+#
+# Version 2 is opted into by connecting to /ws/gas?v=2 or by sending
+#   {"action": "subscribe", "networks": ["bitcoin", "solana"], "interval": 30}
+# "networks" and "interval" (seconds, at least one collector tick) are optional.
+# The server then sends, each message with "v": 2 and a "type":
+#
+#   meta      once per connection: symbol, unit, tier order and confirmation
+#             time labels for every network
+#   snapshot  on connect and on every (re)subscription: all values
+#             {"type": "snapshot", "seq": 12, "t": 1713348000, "d": {"btc": [5, 3, 1], ...},
+#              "stale": [], "eta": {"btc": [540, 1800, 4200], ...}}
+#   delta     afterwards, at most once per interval and only when something
+#             changed: the networks whose values changed since the last message,
+#             plus "stale" and "eta" in full when those changed
+#             {"type": "delta", "seq": 15, "t": 1713348015, "d": {"eth": [2.1, 1.9, 1.7]}}
+#
+# Values are always ordered like "tiers" in meta (high, medium, low). "eta" holds
+# expected confirmation seconds per tier for networks whose source estimates
+# them; the others fall back to the static labels in meta's "estimatedTime".
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .networks import NETWORKS
+from .serialization import dumps_text
+
+PROTOCOL_VERSION = 2
+TIERS = ["high", "medium", "low"]
+
+# Static per-network metadata, sent once per connection
+NETWORK_META = {
+    network.key: {
+        "network": network.name,
+        "symbol": network.symbol,
+        "unit": network.unit,
+        "estimatedTime": network.estimated_time,
+    }
+    for network in NETWORKS.values()
+}
+
+# Full network names accepted in subscriptions
+_NETWORK_KEYS = {meta["network"]: key for key, meta in NETWORK_META.items()}
+
+# (seq, epoch, values per network, stale networks, confirmation seconds per network)
+Frame = Tuple[int, int, Dict[str, List[Optional[float]]], List[str], Dict[str, List[float]]]
+
+def frame_values(latest: Dict[str, Any]) -> Dict[str, List[Optional[float]]]:
+    """
+    Extract the numeric fee values per network from a flat snapshot.
+    """
+    return {
+        network: [latest.get(f"{network}_{tier}") for tier in TIERS]
+        for network in NETWORK_META
+    }
+
+def encode(message: Dict[str, Any]) -> str:
+    return dumps_text(message)
+
+META_MESSAGE = encode({"v": PROTOCOL_VERSION, "type": "meta", "tiers": TIERS, "networks": NETWORK_META})
+
+def parse_networks(networks: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """
+    Normalize a subscription's networks to short keys; all networks when empty.
+
+    Raises:
+        ValueError: For an unknown network
+    """
+    if not networks:
+        return tuple(NETWORK_META)
+    keys = []
+    for network in networks:
+        key = _NETWORK_KEYS.get(network, network)
+        if key not in NETWORK_META:
+            raise ValueError(f"Unknown network: {network}")
+        if key not in keys:
+            keys.append(key)
+    return tuple(keys)
+
+class ClientSession:
+    """
+    Protocol state of one WebSocket connection: version, subscription and
+    the values last sent, which deltas are computed against.
+    """
+    def __init__(self, version: int = 1, min_interval: float = 5.0):
+        self.version = version
+        self.min_interval = min_interval
+        self.networks: Tuple[str, ...] = tuple(NETWORK_META)
+        self.interval = min_interval
+        self.meta_sent = False
+        self.sent: Optional[Dict[str, List[Optional[float]]]] = None
+        self.sent_stale: List[str] = []
+        self.sent_eta: Dict[str, List[float]] = {}
+        self.sent_seq = -1
+        self.last_sent_at = float("-inf")
+
+    def subscribe(self, networks: Optional[Iterable[str]] = None, interval: Optional[float] = None) -> None:
+        """
+        Switch to protocol version 2 with the given networks and update interval.
+        The next render sends a full snapshot.
+
+        Raises:
+            ValueError: For an unknown network or an invalid interval
+        """
+        self.version = PROTOCOL_VERSION
+        self.networks = parse_networks(networks)
+        self.interval = max(float(interval), self.min_interval) if interval is not None else self.min_interval
+        self.sent = None
+        self.sent_seq = -1
+        self.last_sent_at = float("-inf")
+
+    def render(self, frame: Frame, now: float, cache: Dict[Any, Optional[str]]) -> List[str]:
+        """
+        Produce the messages this client should get for a frame, if any.
+
+        Args:
+            frame: The current (seq, epoch, values, stale, eta) frame
+            now: Current loop time, for the update interval
+            cache: Encoded messages shared between clients within one broadcast
+
+        Returns:
+            List[str]: Encoded messages to send, possibly empty
+        """
+        seq, epoch, values, stale, eta = frame
+        messages = []
+        if not self.meta_sent:
+            messages.append(META_MESSAGE)
+            self.meta_sent = True
+
+        # Allow half a tick of slack so scheduling jitter doesn't skip a whole tick
+        if self.sent is not None and now - self.last_sent_at < self.interval - self.min_interval / 2:
+            return messages
+
+        stale = [network for network in stale if network in self.networks]
+        eta = {network: eta[network] for network in self.networks if network in eta}
+        if self.sent is None:
+            key = ("snapshot", seq, self.networks)
+            if key not in cache:
+                cache[key] = encode({
+                    "v": PROTOCOL_VERSION, "type": "snapshot", "seq": seq, "t": epoch,
+                    "d": {network: values[network] for network in self.networks},
+                    "stale": stale, "eta": eta,
+                })
+        else:
+            # Clients that last saw the same frame with the same subscription get the same delta
+            key = ("delta", seq, self.sent_seq, self.networks)
+            if key not in cache:
+                changed = {
+                    network: values[network]
+                    for network in self.networks
+                    if values[network] != self.sent.get(network)
+                }
+                message: Dict[str, Any] = {"v": PROTOCOL_VERSION, "type": "delta", "seq": seq, "t": epoch, "d": changed}
+                if stale != self.sent_stale:
+                    message["stale"] = stale
+                if eta != self.sent_eta:
+                    message["eta"] = eta
+                cache[key] = encode(message) if changed or "stale" in message or "eta" in message else None
+
+        self.sent = {network: values[network] for network in self.networks}
+        self.sent_stale = stale
+        self.sent_eta = eta
+        self.sent_seq = seq
+        if cache[key] is not None:
+            messages.append(cache[key])
+            self.last_sent_at = now
+        return messages
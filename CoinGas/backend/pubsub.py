@@ -0,0 +1,163 @@
+import os
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Optional, Dict, Any, AsyncIterator, List
+
+from pymongo import ASCENDING
+
+from .db import get_mongo_client, mongo_db
+
+logger = logging.getLogger("pubsub")
+
+# === Settings ===
+# "memory" keeps everything in this process (single worker, the default);
+# "mongo" distributes snapshots between workers and pods through a change stream
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "memory")
+mongo_event_collection = os.getenv("MONGO_EVENT_COLLECTION", "gas_events")
+
+EVENT_TTL = 3600  # seconds published snapshots are kept in the event collection
+SUBSCRIBER_QUEUE_SIZE = 16  # snapshots buffered per subscriber before the oldest is dropped
+
+def offer(queue: asyncio.Queue, message: Dict[str, Any]) -> None:
+    """
+    Queue a message for a subscriber, dropping its oldest message when it falls behind.
+    Only the newest snapshots matter to a subscriber, so a slow one never blocks publishing.
+    """
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+def decode_event(change: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Extract the published message from a change stream event.
+
+    Args:
+        change: An insert event from the event collection
+
+    Returns:
+        Optional[Dict[str, Any]]: The message, or None if the inserted document doesn't carry one
+    """
+    message = (change.get("fullDocument") or {}).get("message")
+    return message if isinstance(message, dict) else None
+
+class PubSub:
+    """
+    Distributes snapshots from the single collecting worker (see
+    scheduler/lease.py) to every worker that serves WebSocket clients.
+    """
+    async def publish(self, message: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def subscribe(self) -> AsyncIterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+class InProcessPubSub(PubSub):
+    """
+    Delivers published messages to subscribers in the same process.
+    Used for a single worker, and as a fake backend in tests.
+    """
+    def __init__(self):
+        self._queues: List[asyncio.Queue] = []
+
+    async def publish(self, message: Dict[str, Any]) -> None:
+        for queue in list(self._queues):
+            offer(queue, message)
+
+    def subscribe(self) -> AsyncIterator[Dict[str, Any]]:
+        # Register right away so nothing published after this call is missed
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._queues.append(queue)
+        return self._drain(queue)
+
+    async def _drain(self, queue: asyncio.Queue) -> AsyncIterator[Dict[str, Any]]:
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._queues.remove(queue)
+
+class MongoPubSub(PubSub):
+    """
+    Publishes snapshots as inserts into a MongoDB collection and delivers them
+    to every subscriber through a change stream. Change streams need a replica
+    set (a single-node one is enough).
+    """
+    def __init__(self, collection=None):
+        if collection is None:
+            collection = get_mongo_client()[mongo_db][mongo_event_collection]
+        self.collection = collection
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def ensure_indexes(self) -> None:
+        self.collection.create_index([("created_at", ASCENDING)], expireAfterSeconds=EVENT_TTL)
+
+    async def publish(self, message: Dict[str, Any]) -> None:
+        doc = {"message": dict(message), "created_at": datetime.utcnow()}
+        await asyncio.to_thread(self.collection.insert_one, doc)
+
+    def _watch(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue) -> None:
+        """
+        Follow the change stream on a dedicated thread and hand inserts to the event loop.
+        The stream is polled with a short server-side wait so shutdown is noticed promptly.
+        """
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        resume_token = None
+        while not self._stop.is_set():
+            try:
+                with self.collection.watch(pipeline, resume_after=resume_token, max_await_time_ms=1000) as stream:
+                    while not self._stop.is_set() and stream.alive:
+                        change = stream.try_next()
+                        resume_token = stream.resume_token
+                        if change is None:
+                            continue
+                        message = decode_event(change)
+                        if message is None:
+                            # Written by something other than publish(); skip it rather than restart the stream
+                            logger.warning(f"⚠️ Skipping event without a message: {change.get('documentKey')}")
+                            continue
+                        loop.call_soon_threadsafe(offer, queue, message)
+            except Exception as e:
+                logger.error(f"❌ Change stream error: {e}")
+                self._stop.wait(1)
+
+    def subscribe(self) -> AsyncIterator[Dict[str, Any]]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        thread = threading.Thread(
+            target=self._watch, args=(asyncio.get_running_loop(), queue), name="pubsub-watch", daemon=True
+        )
+        self._threads.append(thread)
+        thread.start()
+        return self._drain(queue)
+
+    async def _drain(self, queue: asyncio.Queue) -> AsyncIterator[Dict[str, Any]]:
+        while True:
+            yield await queue.get()
+
+    async def close(self) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            await asyncio.to_thread(thread.join, 2)
+        self._threads = []
+
+def create_pubsub(backend: Optional[str] = None) -> PubSub:
+    """
+    Create the configured pub/sub backend.
+
+    Args:
+        backend: "memory" or "mongo"; defaults to PUBSUB_BACKEND
+
+    Returns:
+        PubSub: The backend instance
+    """
+    backend = backend or PUBSUB_BACKEND
+    if backend == "mongo":
+        return MongoPubSub()
+    if backend == "memory":
+        return InProcessPubSub()
+    raise ValueError(f"Unknown pub/sub backend: {backend}")
@@ -0,0 +1,89 @@
+import time
+import logging
+from typing import Optional
+
+logger = logging.getLogger("breaker")
+
+class CircuitBreaker:
+    """
+    Circuit breaker for a single upstream source.
+
+    After `failure_threshold` consecutive failures the circuit opens and the
+    source is skipped until the backoff delay has passed. Then a single probe
+    call is let through while every other caller keeps failing fast; its
+    outcome closes the circuit or reopens it. The delay doubles on every
+    failed retry, up to `max_delay`.
+    """
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        base_delay: float = 5.0,
+        max_delay: float = 300.0
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.retry_at = 0.0
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        """
+        Returns:
+            str: "closed", "open" or "half_open"
+        """
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() >= self.retry_at:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """
+        Check whether the source may be called right now. In the half-open state
+        the first caller becomes the probe; the caller must then report its
+        outcome through record_success, record_failure or release.
+
+        Returns:
+            bool: False while the circuit is open or a probe is in flight
+        """
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open" or self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def release(self) -> None:
+        """
+        Give up a probe that ended without an outcome, e.g. when it was cancelled.
+        """
+        self.probing = False
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info(f"✅ Circuit for {self.name} closed")
+        self.failures = 0
+        self.opened_at = None
+        self.retry_at = 0.0
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.probing = False
+        self.failures += 1
+        if self.failures < self.failure_threshold:
+            return
+
+        # Exponential backoff counted from the failure that opened the circuit
+        exponent = min(self.failures - self.failure_threshold, 16)
+        delay = min(self.base_delay * (2 ** exponent), self.max_delay)
+        now = time.monotonic()
+        if self.opened_at is None:
+            self.opened_at = now
+        self.retry_at = now + delay
+        logger.warning(f"⚠️ Circuit for {self.name} open, retrying in {delay:.0f}s")
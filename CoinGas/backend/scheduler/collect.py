@@ -1,12 +1,17 @@
 import os
-import requests
+import time
+import asyncio
+import httpx
 from datetime import datetime
 from dotenv import load_dotenv
 import logging
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, List, Optional, Callable, Awaitable
 
-# Import the centralized MongoDB connection
-from ..db import get_gas_collection
+from ..networks import NETWORKS, Network
+from ..writer import snapshot_writer
+from ..metrics import debug_sampled, fetch_duration, fetch_errors
+from .breaker import CircuitBreaker
+from .estimate import FeeEstimate, estimate_from_queue, estimate_from_recent
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -15,68 +20,234 @@ logger = logging.getLogger("collector")
 # Load environment variables
 load_dotenv()
 
-# Etherscan API key
-ETHERSCAN_API_KEY = os.getenv("ETHERSCAN_API_KEY", "")
-logger.info(f"Loaded ETHERSCAN_API_KEY: {'[SET]' if ETHERSCAN_API_KEY else '[NOT SET]'}")
-
-# Solana RPC URL
-SOLANA_RPC_URL = os.getenv("SOLANA_RPC_URL", "https://api.mainnet-beta.solana.com")
-
-# Get MongoDB collection
-collection = get_gas_collection()
-
-def fetch_gas_fees() -> Dict[str, Any]:
-    timestamp = datetime.now().isoformat()
-
-    btc_high, btc_medium, btc_low = fetch_btc_fees()
-    eth_high, eth_medium, eth_low = fetch_eth_fees()
-    sol_high, sol_medium, sol_low = fetch_sol_fees()
-
-    entry = {
-        "timestamp": timestamp,
-        "btc_high": btc_high,
-        "btc_medium": btc_medium,
-        "btc_low": btc_low,
-        "eth_high": eth_high,
-        "eth_medium": eth_medium,
-        "eth_low": eth_low,
-        "sol_high": sol_high,
-        "sol_medium": sol_medium,
-        "sol_low": sol_low
-    }
+# Default fees in SOL, used when the RPC node gives us nothing usable
+SOL_DEFAULT_FEES = (0.000005, 0.00001, 0.000015)
+# Signature fee paid by every transaction, in lamports; prioritization fees come on top
+SOL_BASE_FEE_LAMPORTS = 5000
+# Seconds per slot when the node reports no performance samples
+SOL_SLOT_TIME = 0.4
+
+# The three Solana RPC calls are sent as a single JSON-RPC batch
+SOL_BATCH_PAYLOAD = [
+    {"jsonrpc": "2.0", "id": 1, "method": "getLatestBlockhash", "params": [{"commitment": "finalized"}]},
+    {"jsonrpc": "2.0", "id": 2, "method": "getRecentPrioritizationFees", "params": []},
+    {"jsonrpc": "2.0", "id": 3, "method": "getRecentPerformanceSamples", "params": [4]},  # Last 4 samples for a better average
+]
+
+# Upstream requests in flight at once, across all networks
+MAX_CONCURRENT_FETCHES = int(os.getenv("MAX_CONCURRENT_FETCHES", "8"))
+# A network's fees are marked stale once this many of its polls went by without a fetch
+STALE_AFTER_POLLS = 3
+
+# One circuit breaker per upstream source
+breakers: Dict[str, CircuitBreaker] = {key: CircuitBreaker(key) for key in NETWORKS}
+
+# Last successfully fetched fees per source, served (marked stale) when a source fails
+last_known_good: Dict[str, FeeEstimate] = {}
+
+# Latest fetch per network: (fees or None, stale, monotonic deadline after which it counts as stale)
+latest_fees: Dict[str, Tuple[Optional[FeeEstimate], bool, float]] = {}
+
+# Shared async HTTP client, keeps connections alive between ticks
+_http_client: Optional[httpx.AsyncClient] = None
+# Bounds concurrent upstream requests, created on the running loop
+_fetch_slots: Optional[asyncio.Semaphore] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get or create the pooled async HTTP client used by the collector.
+
+    Returns:
+        httpx.AsyncClient: A keep-alive client shared by all fetchers
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=10,
+            limits=httpx.Limits(max_connections=max(20, MAX_CONCURRENT_FETCHES), max_keepalive_connections=10, keepalive_expiry=60),
+            headers={"Content-Type": "application/json"}
+        )
+    return _http_client
+
+async def close_http_client() -> None:
+    """
+    Close the shared HTTP client and its pooled connections.
+    """
+    global _http_client, _fetch_slots
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    _fetch_slots = None
+
+def get_fetch_slots() -> asyncio.Semaphore:
+    global _fetch_slots
+    if _fetch_slots is None:
+        _fetch_slots = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+    return _fetch_slots
+
+def build_entry(
+    timestamp: str,
+    fees: Dict[str, Optional[FeeEstimate]],
+    stale: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Build a flat snapshot document. Sources without any data are left out.
+    Expected confirmation times, where a source has them, go under "eta"
+    as seconds per tier; like "stale", they are not stored.
+    """
+    entry: Dict[str, Any] = {"timestamp": timestamp}
+    eta: Dict[str, List[float]] = {}
+    for key, estimate in fees.items():
+        if estimate is None:
+            continue
+        entry[f"{key}_high"], entry[f"{key}_medium"], entry[f"{key}_low"] = estimate.fees
+        if estimate.eta is not None:
+            eta[key] = [round(seconds, 1) for seconds in estimate.eta]
+    if eta:
+        entry["eta"] = eta
+    if stale:
+        entry["stale"] = stale
+    return entry
+
+async def fetch_source(network: Network, client: httpx.AsyncClient) -> Tuple[Optional[FeeEstimate], bool]:
+    """
+    Fetch one source within its deadline, guarded by its circuit breaker.
 
-    logger.info(f"✅ Fetched gas fees @ {timestamp}")
-    collection.insert_one(entry)
-    logger.info(f"✅ Stored gas fees in MongoDB @ {timestamp}")
+    Args:
+        network: The network to fetch
+        client: Shared HTTP client
+
+    Returns:
+        Tuple: The fees (or the last known good value, or None) and whether they are stale
+    """
+    name = network.key
+    breaker = breakers[name]
+    if not breaker.allow():
+        fetch_errors.inc(name, "circuit_open")
+        return last_known_good.get(name), True
+
+    started = time.perf_counter()
+    try:
+        fees = await asyncio.wait_for(FETCHERS[network.source](client, network), timeout=network.timeout)
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    except Exception as e:
+        breaker.record_failure()
+        timed_out = isinstance(e, asyncio.TimeoutError)
+        fetch_errors.inc(name, "timeout" if timed_out else "error")
+        logger.error(f"❌ Fetching {name} fees failed: {'timed out' if timed_out else str(e)}")
+        return last_known_good.get(name), True
+    finally:
+        fetch_duration.observe(time.perf_counter() - started, name)
+
+    breaker.record_success()
+    last_known_good[name] = fees
+    return fees, False
+
+async def fetch_network(key: str, interval: float) -> None:
+    """
+    Fetch one network's fees and keep them for the next snapshot. Scheduled
+    per network on its own poll interval (see jobs.py); at most
+    MAX_CONCURRENT_FETCHES upstream requests run at once.
+
+    Args:
+        key: Storage key of the network
+        interval: Seconds between this network's polls
+    """
+    async with get_fetch_slots():
+        fees, stale = await fetch_source(NETWORKS[key], get_http_client())
+    latest_fees[key] = (fees, stale, time.monotonic() + interval * STALE_AFTER_POLLS)
+
+async def build_snapshot() -> Optional[Dict[str, Any]]:
+    """
+    Assemble a snapshot from every network's latest fetch and queue it for storage.
+    Fetching runs separately per network, so building a snapshot never waits
+    on an upstream and its cost doesn't grow with the number of networks.
+    Networks whose last fetch failed, or that missed several polls, are marked
+    stale. The API adds the snapshot to each worker's hot cache once it is published.
+
+    Returns:
+        Optional[Dict[str, Any]]: The snapshot, or None before any network was fetched
+    """
+    timestamp = datetime.utcnow().isoformat()
+    now = time.monotonic()
+
+    fees: Dict[str, Optional[FeeEstimate]] = {}
+    stale: List[str] = []
+    for key in NETWORKS:
+        if key not in latest_fees:
+            continue
+        values, is_stale, fresh_until = latest_fees[key]
+        fees[key] = values
+        if is_stale or now >= fresh_until:
+            stale.append(key)
+    if not fees:
+        return None
+    entry = build_entry(timestamp, fees, stale)
+
+    debug_sampled(logger, "snapshot", "Built gas fee snapshot @ %s", timestamp)
+    # Stored in batches by the write-behind buffer, the broadcast doesn't wait on Mongo
+    snapshot_writer.add(entry)
 
     return entry
 
-def fetch_btc_fees() -> Tuple[int, int, int]:
-    btc_url = "https://mempool.space/api/v1/fees/recommended"
-    response = requests.get(btc_url, timeout=10)
-    response.raise_for_status()
-    data = response.json()
+# === Bitcoin (mempool.space) ===
 
+# Confirmation targets of mempool.space's recommended fees, in seconds
+BTC_RECOMMENDED_ETA = (600.0, 1800.0, 3600.0)
+
+def parse_btc_fees(data: Dict[str, Any]) -> FeeEstimate:
     btc_high = data["fastestFee"]
     btc_medium = data["halfHourFee"]
     btc_low = data["hourFee"]
 
-    logger.info(f"BTC fees: high={btc_high}, medium={btc_medium}, low={btc_low}")
-    return btc_high, btc_medium, btc_low
-
-def fetch_eth_fees() -> Tuple[float, float, float]:
-    if not ETHERSCAN_API_KEY:
-        raise ValueError("ETHERSCAN_API_KEY not set")
+    debug_sampled(logger, "btc", "BTC fees: high=%s, medium=%s, low=%s", btc_high, btc_medium, btc_low)
+    return FeeEstimate((btc_high, btc_medium, btc_low), BTC_RECOMMENDED_ETA)
 
-    url = (
-        f"https://api.etherscan.io/api?module=gastracker&action=gasoracle"
-        f"&apikey={ETHERSCAN_API_KEY}"
+async def fetch_mempool_fees(client: httpx.AsyncClient, network: Network) -> FeeEstimate:
+    response = await client.get(network.url)
+    response.raise_for_status()
+    return parse_btc_fees(response.json())
+
+def parse_mempool_histogram(data: Dict[str, Any], network: Network) -> FeeEstimate:
+    """
+    Estimate fee tiers from the mempool's fee histogram, [[fee rate, vsize], ...].
+    Tiers are vsize-weighted percentiles of the fee rates that fit into the
+    next options["window"] blocks.
+    """
+    histogram = data.get("fee_histogram")
+    if histogram is None:
+        raise ValueError(f"Invalid mempool response: {data}")
+    options = network.options
+    estimate = estimate_from_queue(
+        [row[0] for row in histogram],
+        [row[1] for row in histogram],
+        capacity=options.get("block_vsize", 1_000_000),
+        interval=options.get("block_time", 600),
+        window=options.get("window", 6),
+        percentiles=options.get("percentiles"),
+        floor=options.get("min_fee", 1.0),
     )
-    logger.info(f"Fetching ETH fees from: {url}")
-    response = requests.get(url, timeout=10)
+    debug_sampled(logger, "btc", "BTC fees from %d histogram bins: %s, eta=%s", len(histogram), estimate.fees, estimate.eta)
+    return estimate
+
+async def fetch_mempool_histogram(client: httpx.AsyncClient, network: Network) -> FeeEstimate:
+    response = await client.get(network.url)
     response.raise_for_status()
-    data = response.json()
-    logger.info(f"Etherscan API response: {data}")
+    return parse_mempool_histogram(response.json(), network)
+
+# === Ethereum (Etherscan-style gas oracles) ===
+
+def gas_oracle_url(network: Network) -> str:
+    api_key_env = network.options.get("api_key_env", "ETHERSCAN_API_KEY")
+    api_key = os.getenv(api_key_env, "")
+    if not api_key:
+        raise ValueError(f"{api_key_env} not set")
+    return f"{network.url}&apikey={api_key}"
+
+def parse_eth_fees(data: Dict[str, Any]) -> FeeEstimate:
+    debug_sampled(logger, "etherscan", "Etherscan API response: %s", data)
 
     if data.get("status") != "1" or "result" not in data:
         raise ValueError(f"Invalid Etherscan response: {data}")
@@ -86,100 +257,117 @@ def fetch_eth_fees() -> Tuple[float, float, float]:
     eth_medium = float(result["ProposeGasPrice"])
     eth_low = float(result["SafeGasPrice"])
 
-    logger.info(f"ETH fees: high={eth_high:.2f}, medium={eth_medium:.2f}, low={eth_low:.2f}")
-    return eth_high, eth_medium, eth_low
+    debug_sampled(logger, "eth", "ETH fees: high=%.2f, medium=%.2f, low=%.2f", eth_high, eth_medium, eth_low)
+    # The gas oracle only returns the three tiers, no samples to estimate from
+    return FeeEstimate((eth_high, eth_medium, eth_low))
 
-def fetch_sol_fees() -> Tuple[float, float, float]:
-    headers = {"Content-Type": "application/json"}
-    
-    # Step 1: Get recent blocks to analyze actual transaction fees
-    blocks_payload = {
-        "jsonrpc": "2.0",
-        "id": 1,
-        "method": "getLatestBlockhash",
-        "params": [{"commitment": "finalized"}]
-    }
-
-    try:
-        response = requests.post(SOLANA_RPC_URL, headers=headers, json=blocks_payload, timeout=10)
-        response.raise_for_status()
-        block_data = response.json()
-
-        if "result" not in block_data or "value" not in block_data["result"]:
-            logger.warning("Could not get latest blockhash, using default fees")
-            return 0.000005, 0.00001, 0.000015  # Default fees in SOL
-    except Exception as e:
-        logger.warning(f"Error fetching blockhash: {str(e)}, using default fees")
-        return 0.000005, 0.00001, 0.000015  # Default fees in SOL
+async def fetch_etherscan_fees(client: httpx.AsyncClient, network: Network) -> FeeEstimate:
+    url = gas_oracle_url(network)
+    response = await client.get(url)
+    response.raise_for_status()
+    return parse_eth_fees(response.json())
+
+# === EVM chains (JSON-RPC eth_feeHistory) ===
+
+# Priority fee percentiles requested per block; together they sample each block's tip distribution
+EVM_REWARD_PERCENTILES = list(range(5, 100, 5))
+
+def parse_fee_history(result: Dict[str, Any], network: Network) -> FeeEstimate:
+    """
+    Compute fee tiers in gwei from an eth_feeHistory result: the next block's
+    base fee plus the tier percentiles of the priority fees paid in recent blocks.
+    """
+    base_fee = int(result["baseFeePerGas"][-1], 16) / 1e9
+    rewards = [int(tip, 16) / 1e9 for block in result.get("reward") or [] for tip in block]
+    estimate = estimate_from_recent(
+        rewards,
+        interval=network.options.get("block_time", 12),
+        percentiles=network.options.get("percentiles"),
+        floor=base_fee,
+    )
+    if estimate is None:
+        return FeeEstimate((base_fee, base_fee, base_fee))
+    return estimate
 
-    # Step 2: Get recent prioritization fees for accurate fee data
-    fees_payload = {
+async def fetch_evm_fees(client: httpx.AsyncClient, network: Network) -> FeeEstimate:
+    payload = {
         "jsonrpc": "2.0",
         "id": 1,
-        "method": "getRecentPrioritizationFees",
-        "params": []
+        "method": "eth_feeHistory",
+        "params": [hex(network.options.get("blocks", 20)), "latest", EVM_REWARD_PERCENTILES],
     }
+    response = await client.post(network.url, json=payload)
+    response.raise_for_status()
+    data = response.json()
+    if "result" not in data:
+        raise ValueError(f"Invalid eth_feeHistory response: {data.get('error', data)}")
+    return parse_fee_history(data["result"], network)
+
+# === Solana ===
+
+def parse_sol_batch(responses: List[Dict[str, Any]], network: Network) -> FeeEstimate:
+    """
+    Compute Solana fee tiers from the batched JSON-RPC response: the signature
+    fee plus the tier percentiles of the prioritization fees paid in recent
+    slots, with the slot time from the node's performance samples.
+
+    Args:
+        responses: JSON-RPC responses for SOL_BATCH_PAYLOAD, in any order
+        network: The network, for its tier percentiles
+
+    Returns:
+        FeeEstimate: high, medium and low fees in SOL
+    """
+    by_id = {item.get("id"): item for item in responses if isinstance(item, dict)}
+    block_data = by_id.get(1, {})
+    fees_data = by_id.get(2, {})
+    stats_data = by_id.get(3, {})
+
+    # Step 1: The latest blockhash tells us the node is healthy
+    if "result" not in block_data or "value" not in block_data["result"]:
+        logger.warning("Could not get latest blockhash, using default fees")
+        return FeeEstimate(SOL_DEFAULT_FEES)
+
+    # Step 2: Recent prioritization fees, one sample per slot
+    if "result" not in fees_data:
+        logger.warning("Could not get prioritization fees, using default fees")
+        return FeeEstimate(SOL_DEFAULT_FEES)
+    recent_fees = [fee.get("prioritizationFee", 0) / 1_000_000_000 for fee in fees_data["result"]]
+
+    # Step 3: Slot time from the node's performance samples
+    slot_time = SOL_SLOT_TIME
+    samples = stats_data.get("result") or []
+    total_slots = sum(sample.get("numSlots", 0) for sample in samples)
+    if total_slots:
+        slot_time = sum(sample.get("samplePeriodSecs", 0) for sample in samples) / total_slots
+
+    estimate = estimate_from_recent(
+        recent_fees,
+        interval=slot_time,
+        percentiles=network.options.get("percentiles"),
+        floor=SOL_BASE_FEE_LAMPORTS / 1_000_000_000,
+    )
+    if estimate is None:
+        return FeeEstimate(SOL_DEFAULT_FEES)
 
-    try:
-        fees_response = requests.post(SOLANA_RPC_URL, headers=headers, json=fees_payload, timeout=10)
-        fees_response.raise_for_status()
-        fees_data = fees_response.json()
-
-        if "result" not in fees_data:
-            logger.warning("Could not get prioritization fees, using default fees")
-            return 0.000005, 0.00001, 0.000015  # Default fees in SOL
-
-        # Calculate base fee from recent prioritization fees
-        recent_fees = fees_data["result"]
-        if recent_fees:
-            # Filter out zero fees and calculate average
-            valid_fees = [fee.get("prioritizationFee", 0) for fee in recent_fees if fee.get("prioritizationFee", 0) > 0]
-            if valid_fees:
-                base_fee = sum(valid_fees) / len(valid_fees)
-            else:
-                base_fee = 5000  # Default if no valid fees found
-        else:
-            base_fee = 5000  # Default base fee in lamports
-
-        # Convert to SOL
-        base_fee_sol = base_fee / 1_000_000_000
-
-        # Step 3: Get network performance metrics for accurate load calculation
-        stats_payload = {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": "getRecentPerformanceSamples",
-            "params": [4]  # Get last 4 samples for better average
-        }
-
-        response = requests.post(SOLANA_RPC_URL, headers=headers, json=stats_payload, timeout=10)
-        response.raise_for_status()
-        stats_data = response.json()
-
-        # Calculate load factor based on actual network metrics
-        load_factor = 1.0
-        if "result" in stats_data and stats_data["result"]:
-            total_tps = 0
-            total_slots = 0
-            for sample in stats_data["result"]:
-                total_tps += sample.get("numTransactions", 0)
-                total_slots += sample.get("numSlots", 1)
-            
-            avg_tps = total_tps / max(total_slots, 1)
-            # Calculate load factor based on actual TPS vs network capacity
-            load_factor = min(max(avg_tps / 1000, 0.1), 2.0)  # Cap between 0.1 and 2.0
-
-        # Calculate fees based on network load
-        sol_low = base_fee_sol
-        sol_medium = base_fee_sol * (1 + load_factor)
-        sol_high = base_fee_sol * (1 + load_factor * 2)
-
-        logger.info(f"SOL fees (in SOL): high={sol_high:.2e}, medium={sol_medium:.2e}, low={sol_low:.2e}")
-        logger.info(f"Network load factor: {load_factor:.2f}")
-        logger.info(f"Base fee (in lamports): {base_fee}")
-        logger.info(f"Average TPS: {avg_tps if 'avg_tps' in locals() else 'N/A'}")
-        return sol_high, sol_medium, sol_low
+    debug_sampled(
+        logger, "sol",
+        "SOL fees (in SOL) from %d slots: high=%.2e, medium=%.2e, low=%.2e, slot time=%.3fs",
+        len(recent_fees), *estimate.fees, slot_time
+    )
+    return estimate
 
-    except Exception as e:
-        logger.error(f"Error calculating Solana fees: {str(e)}")
-        return 0.000005, 0.00001, 0.000015  # Default fees in SOL
+async def fetch_solana_fees(client: httpx.AsyncClient, network: Network) -> FeeEstimate:
+    # Transport errors propagate so the circuit breaker can see them
+    response = await client.post(network.url, json=SOL_BATCH_PAYLOAD)
+    response.raise_for_status()
+    return parse_sol_batch(response.json(), network)
+
+# Fetcher per Network.source
+FETCHERS: Dict[str, Callable[[httpx.AsyncClient, Network], Awaitable[FeeEstimate]]] = {
+    "mempool": fetch_mempool_fees,
+    "mempool_histogram": fetch_mempool_histogram,
+    "etherscan": fetch_etherscan_fees,
+    "evm_rpc": fetch_evm_fees,
+    "solana_rpc": fetch_solana_fees,
+}
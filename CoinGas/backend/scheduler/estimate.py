@@ -0,0 +1,156 @@
+import os
+from typing import TYPE_CHECKING, Iterable, NamedTuple, Optional, Sequence, Tuple
+
+# NumPy is imported where it's used, so loading the app doesn't pay for it
+# before the first fetch (see startup.py)
+if TYPE_CHECKING:
+    import numpy as np
+
+# === Fee estimation ===
+#
+# Turns raw fee samples from an upstream into fee tiers and expected
+# confirmation times, in one vectorized pass per fetch:
+#
+#   - Queue model (Bitcoin mempool fee histogram): transactions confirm in
+#     fee order, a block's worth at a time. Tiers are percentiles of the fee
+#     rates in the next few blocks; the wait is the number of blocks ahead.
+#   - Recent inclusion model (Solana slots, EVM blocks): the share of recent
+#     slots or blocks a fee would have made it into is its chance per slot;
+#     the wait is the slot time divided by that chance.
+#
+# Tiers are percentiles of the sample distribution, for high, medium and low.
+
+# Percentiles of the fee distribution for the high, medium and low tiers;
+# a network overrides them with options["percentiles"]
+FEE_TIER_PERCENTILES = tuple(float(p) for p in os.getenv("FEE_TIER_PERCENTILES", "90,50,10").split(","))
+
+# high, medium, low
+Fees = Tuple[float, float, float]
+
+class FeeEstimate(NamedTuple):
+    fees: Fees
+    eta: Optional[Fees] = None  # expected seconds until confirmation per tier, if known
+
+def tier_percentiles(percentiles: Optional[Iterable[float]] = None) -> "np.ndarray":
+    """
+    Validate tier percentiles, highest tier first.
+
+    Raises:
+        ValueError: Unless there are three percentiles between 0 and 100
+    """
+    import numpy as np
+    values = np.asarray(tuple(percentiles) if percentiles is not None else FEE_TIER_PERCENTILES, dtype=np.float64)
+    if values.shape != (3,) or np.any((values < 0) | (values > 100)):
+        raise ValueError(f"Expected three tier percentiles between 0 and 100, got {values.tolist()}")
+    return values
+
+def _as_fees(values: "np.ndarray") -> Fees:
+    high, medium, low = values.tolist()
+    return high, medium, low
+
+def weighted_percentiles(sorted_values: "np.ndarray", cumulative: "np.ndarray", percentiles: "np.ndarray") -> "np.ndarray":
+    """
+    Percentiles of a weighted sample, all at once.
+
+    Args:
+        sorted_values: Sample values in ascending order, shape (n,)
+        cumulative: Cumulative weights in the same order, shape (n,)
+        percentiles: Percentiles to compute, shape (k,)
+
+    Returns:
+        np.ndarray: The smallest value whose cumulative weight reaches each percentile, shape (k,)
+    """
+    import numpy as np
+    targets = percentiles / 100 * cumulative[-1]
+    index = np.searchsorted(cumulative, targets, side="left")
+    return sorted_values[np.minimum(index, len(sorted_values) - 1)]
+
+def estimate_from_recent(
+    fees: Sequence[float],
+    interval: float,
+    percentiles: Optional[Iterable[float]] = None,
+    weights: Optional[Sequence[float]] = None,
+    floor: float = 0.0
+) -> Optional[FeeEstimate]:
+    """
+    Estimate tiers from the fees that recently made it into slots or blocks.
+
+    Args:
+        fees: Fee of each recent sample, e.g. the prioritization fee per slot
+        interval: Seconds per slot or block
+        percentiles: Tier percentiles, high first (default: FEE_TIER_PERCENTILES)
+        weights: Weight of each sample (default: equal)
+        floor: Added to every tier, e.g. a base fee
+
+    Returns:
+        Optional[FeeEstimate]: Tier fees and expected seconds to inclusion, or None without samples
+    """
+    import numpy as np
+    values = np.asarray(fees, dtype=np.float64)
+    if values.size == 0:
+        return None
+    percentiles = tier_percentiles(percentiles)
+
+    if weights is None:
+        # Equal weights need no sort: selection is linear in the number of samples
+        tiers = np.quantile(values, percentiles / 100, method="inverted_cdf")
+        # Share of recent samples each tier would have been included in
+        included = (values[:, None] <= tiers).mean(axis=0)
+    else:
+        order = np.argsort(values, kind="stable")
+        values = values[order]
+        cumulative = np.cumsum(np.asarray(weights, dtype=np.float64)[order])
+        if cumulative[-1] <= 0:
+            return None
+        tiers = weighted_percentiles(values, cumulative, percentiles)
+        included = cumulative[np.searchsorted(values, tiers, side="right") - 1] / cumulative[-1]
+
+    eta = interval / np.maximum(included, 1e-9)
+    return FeeEstimate(_as_fees(tiers + floor), _as_fees(eta))
+
+def estimate_from_queue(
+    fees: Sequence[float],
+    sizes: Sequence[float],
+    capacity: float,
+    interval: float,
+    window: int,
+    percentiles: Optional[Iterable[float]] = None,
+    floor: float = 0.0
+) -> FeeEstimate:
+    """
+    Estimate tiers from a queue that is drained in fee order, `capacity` per
+    block, such as a mempool fee histogram.
+
+    Args:
+        fees: Fee rate of each histogram bin
+        sizes: Size waiting at each fee rate
+        capacity: Size confirmed per block
+        interval: Seconds per block
+        window: Blocks ahead the tiers are taken from
+        percentiles: Tier percentiles, high first (default: FEE_TIER_PERCENTILES)
+        floor: Lowest fee rate ever returned, e.g. the minimum relay fee
+
+    Returns:
+        FeeEstimate: Tier fees and expected seconds to confirmation
+    """
+    import numpy as np
+    values = np.asarray(fees, dtype=np.float64)
+    weights = np.asarray(sizes, dtype=np.float64)
+    percentiles = tier_percentiles(percentiles)
+    if values.size == 0 or weights.sum() <= 0:
+        # Nothing is waiting, the next block takes anything
+        return FeeEstimate(_as_fees(np.full(3, floor)), _as_fees(np.full(3, float(interval))))
+
+    # Highest fee first, the order the queue is drained in (mempool.space already sends it that way)
+    if np.any(values[1:] > values[:-1]):
+        order = np.argsort(-values, kind="stable")
+        values, weights = values[order], weights[order]
+    depth = np.cumsum(weights)
+
+    # A tier at percentile p sits (100 - p)% deep into the window
+    span = min(depth[-1], capacity * window)
+    index = np.searchsorted(depth, (1 - percentiles / 100) * span, side="left")
+    index = np.minimum(index, len(values) - 1)
+    tiers = np.maximum(values[index], floor)
+    eta = np.maximum(np.ceil(depth[index] / capacity), 1) * interval
+    return FeeEstimate(_as_fees(tiers), _as_fees(eta))
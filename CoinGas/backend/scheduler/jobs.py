@@ -0,0 +1,189 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+from functools import partial
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.events import EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES, JobEvent
+
+from ..db import gas_repository, bucket_start
+from ..forecast import precompute_forecasts
+from ..networks import NETWORKS
+from ..writer import snapshot_writer
+from .lease import LeaderLease
+from .collect import fetch_network
+
+logger = logging.getLogger("scheduler")
+
+# === Settings ===
+COLLECT_INTERVAL = int(os.getenv("COLLECT_INTERVAL", "5"))  # seconds between snapshots
+LEASE_TTL = COLLECT_INTERVAL * 3  # a dead leader is replaced within three ticks
+MISFIRE_GRACE = 30  # seconds a late hourly job may still start
+CHECKPOINT_INTERVAL = int(os.getenv("MEMORY_SNAPSHOT_INTERVAL", "600"))  # seconds between in-memory store saves
+
+# Per-job run statistics, keyed by job id
+job_stats: Dict[str, Dict[str, Any]] = {}
+
+scheduler: Optional[AsyncIOScheduler] = None
+lease: Optional[LeaderLease] = None
+
+def stats_for(job_id: str) -> Dict[str, Any]:
+    if job_id not in job_stats:
+        job_stats[job_id] = {
+            "runs": 0,
+            "failures": 0,
+            "missed": 0,
+            "skipped": 0,
+            "last_run": None,
+            "last_duration": None,
+            "max_duration": 0.0,
+            "total_duration": 0.0,
+        }
+    return job_stats[job_id]
+
+def is_leader() -> bool:
+    """
+    Whether this process should run the singleton jobs. Without a lease
+    (single process deployment) it always does.
+    """
+    return lease is None or lease.held
+
+def timed_job(job_id: str, func: Callable[[], Awaitable[Any]], leader_only: bool = True) -> Callable[[], Awaitable[None]]:
+    """
+    Wrap a job so it only runs on the leader and its duration and failures are recorded.
+
+    Args:
+        job_id: Scheduler job id, also the key in job_stats
+        func: The job coroutine function
+        leader_only: Skip the run on processes that don't hold the lease
+
+    Returns:
+        Callable: The coroutine function to schedule
+    """
+    async def run() -> None:
+        stats = stats_for(job_id)
+        if leader_only and not is_leader():
+            return
+
+        started = time.perf_counter()
+        try:
+            await func()
+        except Exception as e:
+            stats["failures"] += 1
+            logger.error(f"❌ Job {job_id} failed: {str(e)}")
+        finally:
+            duration = time.perf_counter() - started
+            stats["runs"] += 1
+            stats["last_run"] = datetime.now(timezone.utc).isoformat()
+            stats["last_duration"] = duration
+            stats["max_duration"] = max(stats["max_duration"], duration)
+            stats["total_duration"] += duration
+    return run
+
+def on_job_skipped(event: JobEvent) -> None:
+    """
+    Count runs that were missed (the loop was blocked past the grace time) or
+    skipped (the previous run was still going).
+    """
+    stats = stats_for(event.job_id)
+    if event.code == EVENT_JOB_MISSED:
+        stats["missed"] += 1
+        logger.warning(f"⚠️ Job {event.job_id} missed its run at {event.scheduled_run_time}")
+    else:
+        stats["skipped"] += 1
+        logger.warning(f"⚠️ Job {event.job_id} skipped, previous run still in progress")
+
+# === Jobs ===
+
+async def renew_lease() -> None:
+    await asyncio.to_thread(lease.acquire)
+
+async def seal_previous_hour() -> None:
+    # Pack the buckets of every completed hour into their columnar layout,
+    # after the buffered tail of that hour has been written
+    await snapshot_writer.flush()
+    now = int(datetime.now(timezone.utc).timestamp())
+    sealed = await asyncio.to_thread(gas_repository.seal_buckets, bucket_start(now))
+    logger.info(f"📦 Sealed {sealed} bucket(s)")
+
+async def run_retention() -> None:
+    deleted = await asyncio.to_thread(gas_repository.apply_retention)
+    logger.info(f"🧹 Retention removed {deleted}")
+
+async def refresh_forecasts() -> None:
+    await precompute_forecasts()
+
+async def checkpoint_storage() -> None:
+    await asyncio.to_thread(gas_repository.checkpoint)
+
+async def start_scheduler(collect: Callable[[], Awaitable[Any]], use_lease: bool) -> AsyncIOScheduler:
+    """
+    Start the fixed-interval jobs on the running event loop.
+
+    Each registered network is fetched on its own poll interval and a
+    snapshot of their latest fees is collected every COLLECT_INTERVAL seconds;
+    sealing the previous hour's buckets, retention and the forecast refresh
+    run hourly. Fetching, collection, sealing and retention only run on the
+    process holding the leader lease; forecasts are a per-process cache and
+    refresh everywhere.
+
+    Args:
+        collect: Coroutine function that builds, stores and publishes one snapshot
+        use_lease: Elect a leader through MongoDB (several processes share the database)
+
+    Returns:
+        AsyncIOScheduler: The running scheduler
+    """
+    global scheduler, lease
+
+    lease = LeaderLease(ttl=LEASE_TTL) if use_lease else None
+    # Workers share the spill path; only the leader writes spilled snapshots back
+    snapshot_writer.may_replay = is_leader
+    scheduler = AsyncIOScheduler(
+        timezone=timezone.utc,
+        job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": MISFIRE_GRACE}
+    )
+    scheduler.add_listener(on_job_skipped, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+
+    now = datetime.now(timezone.utc)
+    if lease is not None:
+        # The first acquire runs here rather than before startup, so an unreachable
+        # MongoDB only delays leadership and never the worker's boot. Renew at
+        # every tick so the lease outlives a couple of slow renewals
+        scheduler.add_job(timed_job("lease", renew_lease, leader_only=False), "interval",
+                          seconds=COLLECT_INTERVAL, id="lease", next_run_time=now)
+    # Every network is polled on its own cadence; the collect tick assembles
+    # their latest fees into one snapshot without waiting on any upstream
+    for network in NETWORKS.values():
+        interval = network.poll_interval or COLLECT_INTERVAL
+        job_id = f"fetch:{network.key}"
+        scheduler.add_job(timed_job(job_id, partial(fetch_network, network.key, interval)), "interval",
+                          seconds=interval, id=job_id, next_run_time=now)
+    scheduler.add_job(timed_job("collect", collect), "interval",
+                      seconds=COLLECT_INTERVAL, id="collect", next_run_time=now)
+    # Hourly maintenance runs shortly after the hour so the last tick of the previous hour has landed
+    scheduler.add_job(timed_job("seal", seal_previous_hour), "cron", minute=0, second=30, id="seal")
+    scheduler.add_job(timed_job("retention", run_retention), "cron", minute=5, id="retention")
+    scheduler.add_job(timed_job("forecast", refresh_forecasts, leader_only=False), "cron",
+                      minute=1, id="forecast", next_run_time=now)
+    if getattr(gas_repository, "snapshot_path", None):
+        # Periodically save the in-memory store so a restart loses little data
+        scheduler.add_job(timed_job("checkpoint", checkpoint_storage, leader_only=False), "interval",
+                          seconds=CHECKPOINT_INTERVAL, id="checkpoint")
+    scheduler.start()
+    logger.info(f"⏰ Scheduler started ({'leader election' if lease else 'single process'})")
+    return scheduler
+
+async def stop_scheduler() -> None:
+    """
+    Stop the scheduler and hand the lease to another process right away.
+    """
+    global scheduler
+    if scheduler is not None:
+        scheduler.shutdown(wait=False)
+        scheduler = None
+    if lease is not None:
+        await asyncio.to_thread(lease.release)
@@ -0,0 +1,80 @@
+import os
+import time
+import socket
+import logging
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from ..db import get_mongo_client, mongo_db
+
+logger = logging.getLogger("scheduler")
+
+mongo_lease_collection = os.getenv("MONGO_LEASE_COLLECTION", "gas_leases")
+
+# Identifies this process as a lease owner
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class LeaderLease:
+    """
+    Elects the one process in the fleet that runs the singleton jobs, using a
+    lease document in MongoDB. The holder renews the lease well before it
+    expires; when the holder dies, another process takes over once it does.
+    """
+    def __init__(self, name: str = "scheduler", ttl: float = 15.0, collection=None):
+        if collection is None:
+            collection = get_mongo_client()[mongo_db][mongo_lease_collection]
+        self.collection = collection
+        self.name = name
+        self.ttl = ttl
+        self._held_until = 0.0  # Local monotonic deadline of the current lease
+
+    @property
+    def held(self) -> bool:
+        """
+        Whether this process holds the lease. Checked against a local deadline,
+        so a process that can't reach Mongo to renew stops acting as leader on its own.
+        """
+        return time.monotonic() < self._held_until
+
+    def acquire(self) -> bool:
+        """
+        Take or renew the lease. When MongoDB can't be reached the lease is
+        treated as not held, so the process keeps serving as a follower.
+
+        Returns:
+            bool: True if this process holds the lease until the next renewal
+        """
+        was_held = self.held
+        started = time.monotonic()
+        now = datetime.utcnow()
+        try:
+            doc = self.collection.find_one_and_update(
+                {"_id": self.name, "$or": [{"owner": WORKER_ID}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": WORKER_ID, "expires_at": now + timedelta(seconds=self.ttl)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            held = doc is not None and doc.get("owner") == WORKER_ID
+        except DuplicateKeyError:
+            # Another process holds a lease that has not expired
+            held = False
+        except PyMongoError as e:
+            logger.warning(f"⚠️ Could not acquire {self.name} lease: {e}")
+            held = False
+
+        self._held_until = started + self.ttl if held else 0.0
+        if held != was_held:
+            logger.info(f"👑 {'Acquired' if held else 'Lost'} {self.name} lease ({WORKER_ID})")
+        return held
+
+    def release(self) -> None:
+        if self.held:
+            self._held_until = 0.0
+            try:
+                self.collection.delete_one({"_id": self.name, "owner": WORKER_ID})
+            except PyMongoError as e:
+                # It expires on its own after the TTL
+                logger.warning(f"⚠️ Could not release {self.name} lease: {e}")
@@ -0,0 +1,21 @@
+from typing import Any
+
+import orjson
+
+# numpy scalars and arrays show up in forecasts and predictions
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serialize to compact JSON bytes with orjson, the encoder used for every
+    response and WebSocket message.
+    """
+    return orjson.dumps(obj, option=ORJSON_OPTIONS)
+
+def dumps_text(obj: Any) -> str:
+    """
+    Serialize to a JSON string, for WebSocket text frames.
+    """
+    return orjson.dumps(obj, option=ORJSON_OPTIONS).decode()
+
+loads = orjson.loads
@@ -0,0 +1,68 @@
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger("startup")
+
+# === Startup report ===
+#
+# Where a worker's boot time goes: importing the app, each lifespan step until
+# the worker accepts requests, and the storage warm-up that continues in the
+# background afterwards. Logged once ready and served on /startup.
+# For a per-module import breakdown run `python -X importtime -c "import CoinGas.backend.main"`.
+
+# main.py imports this module first, so this is close to when the app started importing
+IMPORT_STARTED = time.perf_counter()
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+class StartupReport:
+    """
+    Durations of named boot phases, in the order they ran.
+    """
+    def __init__(self, started: float = IMPORT_STARTED):
+        self.started = started
+        self.phases: Dict[str, float] = {}
+        self.ready_at: Optional[float] = None
+        self.warm_at: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Context manager recording the duration of its block under `name`.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def record(self, name: str, since: float) -> None:
+        self.phases[name] = time.perf_counter() - since
+
+    def mark_ready(self) -> None:
+        """
+        The worker accepts requests from here on.
+        """
+        self.ready_at = time.perf_counter()
+        breakdown = ", ".join(f"{name} {_ms(duration):.0f} ms" for name, duration in self.phases.items())
+        logger.info(f"🚀 Ready in {_ms(self.ready_at - self.started):.0f} ms ({breakdown})")
+
+    def mark_warm(self) -> None:
+        """
+        Storage is prepared and the hot cache is seeded.
+        """
+        self.warm_at = time.perf_counter()
+        logger.info(f"🔥 Storage warm {_ms(self.warm_at - self.started):.0f} ms after start")
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "ready_ms": _ms(self.ready_at - self.started) if self.ready_at is not None else None,
+            "warm_ms": _ms(self.warm_at - self.started) if self.warm_at is not None else None,
+            "phases_ms": {name: _ms(duration) for name, duration in self.phases.items()},
+        }
+
+# Report of this worker's boot
+startup_report = StartupReport()
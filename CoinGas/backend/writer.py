@@ -0,0 +1,250 @@
+import os
+import glob
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from itertools import islice
+from typing import Optional, Dict, Any, List, Deque, Tuple, Callable
+
+from .db import gas_repository
+
+logger = logging.getLogger("writer")
+
+# === Settings ===
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "12"))  # snapshots per bulk write (one minute of ticks)
+WRITE_MAX_AGE = float(os.getenv("WRITE_MAX_AGE", "30"))  # seconds a snapshot may wait for its batch to fill
+WRITE_MAX_PENDING = int(os.getenv("WRITE_MAX_PENDING", "720"))  # snapshots held in memory (one hour)
+WRITE_SPILL_PATH = os.getenv("WRITE_SPILL_PATH", "gas_spill.ndjson")
+WRITE_RETRY_DELAY = 5.0  # seconds between attempts while the database is unreachable
+REPLAY_BATCH_SIZE = 500  # spilled snapshots written back per bulk write
+
+class WriteBehindBuffer:
+    """
+    Buffers collected snapshots and writes them to storage in batches off the
+    hot path, so live broadcasts never wait on storage.
+
+    A batch is flushed once it holds `batch_size` snapshots or its oldest
+    snapshot is `max_age` seconds old. When a write fails the batch is spilled
+    to an NDJSON file, which the leader writes back once the database is
+    reachable again. Memory stays bounded by `max_pending`; beyond that the
+    oldest snapshots are dropped and counted.
+    """
+    def __init__(
+        self,
+        store: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+        batch_size: int = WRITE_BATCH_SIZE,
+        max_age: float = WRITE_MAX_AGE,
+        max_pending: int = WRITE_MAX_PENDING,
+        spill_path: str = WRITE_SPILL_PATH,
+        may_replay: Optional[Callable[[], bool]] = None
+    ):
+        # Defaults to the configured storage backend
+        self.store = store or gas_repository.store_snapshots
+        # Whether this process replays spill files; the scheduler limits it to the leader
+        self.may_replay = may_replay or (lambda: True)
+        self.batch_size = max(1, batch_size)
+        self.max_age = max_age
+        self.max_pending = max(self.batch_size, max_pending)
+        self.spill_path = spill_path
+        self._pending: Deque[Tuple[float, Dict[str, Any]]] = deque()
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, Any] = {
+            "written": 0,
+            "batches": 0,
+            "failures": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "dropped": 0,
+            "max_pending_seen": 0,
+            "last_flush_duration": None,
+            "last_error": None,
+        }
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        """
+        Queue a snapshot for writing. Never blocks.
+
+        Args:
+            entry: The flat snapshot to store
+        """
+        self._pending.append((time.monotonic(), entry))
+        while len(self._pending) > self.max_pending:
+            self._pending.popleft()
+            self.stats["dropped"] += 1
+        self.stats["max_pending_seen"] = max(self.stats["max_pending_seen"], len(self._pending))
+        # Wake the flush loop to start the age timer, or to write a full batch
+        if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Current backlog and counters, for monitoring write pressure.
+        """
+        oldest = self._pending[0][0] if self._pending else None
+        return {
+            **self.stats,
+            "pending": len(self._pending),
+            "oldest_pending_age": time.monotonic() - oldest if oldest is not None else 0.0,
+            "spill_pending": self._spill_waiting(),
+        }
+
+    # === Spill file ===
+
+    def _spill(self, entries: List[Dict[str, Any]]) -> None:
+        if not entries:
+            return
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+
+    def _claims(self) -> List[str]:
+        return sorted(glob.glob(f"{glob.escape(self.spill_path)}.*.replay"))
+
+    def _spill_waiting(self) -> bool:
+        return os.path.exists(self.spill_path) or bool(self._claims())
+
+    def _replay_spill(self) -> int:
+        """
+        Write spilled snapshots back to storage. The spill file is first claimed
+        by renaming it, so workers sharing the path never replay the same file
+        twice, and it is streamed in batches rather than loaded whole. On failure
+        the claimed file stays on disk and is replayed again later; writes are
+        idempotent, so the batches already written are not counted twice.
+
+        Returns:
+            int: The number of snapshots written back
+        """
+        try:
+            os.rename(self.spill_path, f"{self.spill_path}.{uuid.uuid4().hex}.replay")
+        except FileNotFoundError:
+            pass
+
+        replayed = 0
+        for claim in self._claims():
+            try:
+                f = open(claim, encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            with f:
+                batch = []
+                for line in f:
+                    if line.strip():
+                        batch.append(json.loads(line))
+                    if len(batch) >= REPLAY_BATCH_SIZE:
+                        self.store(batch)
+                        replayed += len(batch)
+                        batch = []
+                if batch:
+                    self.store(batch)
+                    replayed += len(batch)
+            os.remove(claim)
+        return replayed
+
+    # === Flushing ===
+
+    async def flush(self) -> bool:
+        """
+        Write everything pending, after replaying any spilled snapshots.
+
+        Returns:
+            bool: False if the database was unreachable and snapshots were spilled to disk
+        """
+        async with self._lock:
+            try:
+                if self.may_replay():
+                    replayed = await asyncio.to_thread(self._replay_spill)
+                    if replayed:
+                        self.stats["replayed"] += replayed
+                        logger.info(f"💾 Replayed {replayed} spilled snapshot(s)")
+
+                while self._pending:
+                    batch = [entry for _, entry in islice(self._pending, self.batch_size)]
+                    started = time.perf_counter()
+                    await asyncio.to_thread(self.store, batch)
+                    for _ in batch:
+                        self._pending.popleft()
+                    self.stats["written"] += len(batch)
+                    self.stats["batches"] += 1
+                    self.stats["last_flush_duration"] = time.perf_counter() - started
+                return True
+            except Exception as e:
+                self.stats["failures"] += 1
+                self.stats["last_error"] = str(e)
+                logger.error(f"❌ Snapshot write failed, spilling to {self.spill_path}: {str(e)}")
+
+            # Move the backlog to disk so it survives restarts and doesn't grow in memory
+            entries = [entry for _, entry in self._pending]
+            try:
+                await asyncio.to_thread(self._spill, entries)
+                self._pending.clear()
+                self.stats["spilled"] += len(entries)
+            except Exception as e:
+                logger.error(f"❌ Could not spill snapshots: {str(e)}")
+            return False
+
+    async def spill_buffer(self) -> None:
+        """
+        Move everything pending to the spill file without touching storage.
+        It is written back by the next flush once storage is available.
+        """
+        async with self._lock:
+            entries = [entry for _, entry in self._pending]
+            if entries:
+                await asyncio.to_thread(self._spill, entries)
+                self._pending.clear()
+                self.stats["spilled"] += len(entries)
+
+    async def run(self) -> None:
+        """
+        Flush whenever a batch fills up, its oldest snapshot reaches max_age,
+        or spilled snapshots are waiting to be written back.
+        """
+        while True:
+            self._wake.clear()
+            age = time.monotonic() - self._pending[0][0] if self._pending else 0.0
+            full = len(self._pending) >= self.batch_size
+            spilled = self._spill_waiting()
+            if (self._pending and (full or age >= self.max_age)) or (spilled and self.may_replay()):
+                if not await self.flush():
+                    await asyncio.sleep(WRITE_RETRY_DELAY)
+                continue
+
+            if self._pending:
+                timeout = self.max_age - age
+            else:
+                # Check back for leadership while a spill file waits for the leader to replay it
+                timeout = WRITE_RETRY_DELAY if spilled else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """
+        Start the flush loop on the running event loop.
+        """
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._task = asyncio.create_task(self.run())
+
+    async def close(self) -> None:
+        """
+        Stop the flush loop and write (or spill) whatever is still pending.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+# Global writer used by the collector
+snapshot_writer = WriteBehindBuffer()
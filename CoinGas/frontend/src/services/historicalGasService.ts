@@ -2,9 +2,21 @@ import { HistoricalGasData } from '@/types/gas';
 
 const API_BASE_URL = 'http://localhost:8000';
 
-export const fetchHistoricalGasData = async (network: string): Promise<HistoricalGasData[]> => {
+export interface HistoryRange {
+  start?: string;       // ISO 8601, defaults to 24h before end
+  end?: string;         // ISO 8601, defaults to now
+  resolution?: string;  // e.g. "15m", "1h", "1d"
+}
+
+export const fetchHistoricalGasData = async (network: string, range?: HistoryRange): Promise<HistoricalGasData[]> => {
   try {
-    const response = await fetch(`${API_BASE_URL}/history/${network}`);
+    const params = new URLSearchParams();
+    if (range?.start) params.set('start', range.start);
+    if (range?.end) params.set('end', range.end);
+    if (range?.resolution) params.set('resolution', range.resolution);
+    const query = params.toString();
+
+    const response = await fetch(`${API_BASE_URL}/history/${network}${query ? `?${query}` : ''}`);
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
@@ -17,12 +29,13 @@ export const fetchHistoricalGasData = async (network: string): Promise<Historica
 };
 
 // Function to send a prediction request via WebSocket and return the prediction data
-export const predictTomorrowGas = async (network: string): Promise<HistoricalGasData[]> => {
+// `backend` picks "gemini" or "local" forecasting; the server default is used when omitted
+export const predictTomorrowGas = async (network: string, backend?: 'gemini' | 'local'): Promise<HistoricalGasData[]> => {
   return new Promise((resolve, reject) => {
     const socket = new WebSocket('ws://localhost:8000/ws/gas');
 
     socket.onopen = () => {
-      socket.send(JSON.stringify({ action: 'predict', network }));
+      socket.send(JSON.stringify({ action: 'predict', network, ...(backend ? { backend } : {}) }));
     };
 
     socket.onmessage = (event) => {
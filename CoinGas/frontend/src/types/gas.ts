@@ -12,6 +12,7 @@ export interface GasFee {
   symbol: string;
   speeds: NetworkSpeed[];
   lastUpdated: string;
+  stale?: boolean;
 }
 
 export interface HistoricalGasData {
@@ -0,0 +1,503 @@
+# === Load and latency benchmark ===
+#
+# Starts the upstream stubs (benchmarks/stubs.py) and the backend on local
+# ports, with the in-memory storage backend standing in for MongoDB, then
+# drives WebSocket clients on /ws/gas and REST pollers against the read
+# endpoints. Results are written as JSON:
+#
+#   python -m benchmarks.harness --ws-clients 2000 --pollers 50 --duration 60 \
+#       --output bench_results.json
+#
+# Reported per run: WebSocket connect time and snapshot delivery lag, REST
+# latency and throughput per endpoint, server CPU and RSS over the run, the
+# backend's startup report and /metrics histograms, and the stubs' request counts.
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import signal
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+import websockets
+
+# Ranges a freshly seeded store is filled with, per tier (high, medium, low)
+SEED_RANGES = {
+    "btc": ((10, 40), (5, 10), (1, 5)),
+    "eth": ((15, 40), (10, 15), (5, 10)),
+    "sol": ((1e-5, 5e-5), (5e-6, 1e-5), (1e-6, 5e-6)),
+}
+
+# === Statistics ===
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """
+    Nearest-rank percentile of `values`, or None when empty.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def summarize(values: List[float], scale: float = 1000.0) -> Dict[str, Any]:
+    """
+    Count and p50/p90/p99/max of durations in seconds, reported in milliseconds.
+    """
+    def ms(value: Optional[float]) -> Optional[float]:
+        return round(value * scale, 3) if value is not None else None
+
+    return {
+        "count": len(values),
+        "p50_ms": ms(percentile(values, 50)),
+        "p90_ms": ms(percentile(values, 90)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(max(values) if values else None),
+    }
+
+# === Fixtures ===
+
+def seed_store(path: str, hours: float, interval: int, networks: List[str]) -> int:
+    """
+    Write a memory store snapshot holding `hours` of history for the built-in networks.
+
+    History older than the raw retention window is kept the way a long-running
+    deployment keeps it: samples are stored an hour at a time, bypassing the
+    cutoff of store_snapshots, and retention then leaves only their rollups.
+
+    Returns:
+        int: Number of snapshots seeded
+    """
+    from CoinGas.backend.db import BUCKET_SECONDS, Sample
+    from CoinGas.backend.memstore import MemoryRepository
+
+    repository = MemoryRepository(snapshot_path="")
+    repository.prepare()
+    now = int(time.time())
+    count = int(hours * 3600 / interval)
+    # Whole hourly buckets per batch, so the rollups of an hour are built from all of its samples
+    by_network: Dict[str, List[Sample]] = {}
+    for i in range(count):
+        epoch = now - (count - i) * interval
+        for key in networks:
+            fees = [random.uniform(low, high) for low, high in SEED_RANGES.get(key, SEED_RANGES["eth"])]
+            by_network.setdefault(key, []).append((epoch, *fees))
+        next_epoch = epoch + interval
+        if i == count - 1 or next_epoch // BUCKET_SECONDS != epoch // BUCKET_SECONDS:
+            repository.store_samples(by_network)
+            repository.apply_retention(now)
+            by_network = {}
+    repository.save(path)
+    return count
+
+def write_networks_config(path: str, stub_url: str, extra_evm_chains: int) -> List[str]:
+    """
+    Point the built-in networks at the stubs, optionally adding EVM chains.
+
+    Returns:
+        List[str]: Full names of the extra chains
+    """
+    entries: List[Dict[str, Any]] = [
+        {"key": "btc", "url": f"{stub_url}/api/mempool"},
+        {"key": "eth", "url": f"{stub_url}/evm"},
+        {"key": "sol", "url": f"{stub_url}/solana"},
+    ]
+    names = []
+    for i in range(extra_evm_chains):
+        name = f"evmbench{i}"
+        names.append(name)
+        entries.append({
+            "key": f"evm{i}", "name": name, "symbol": f"EVM{i}", "unit": "gwei",
+            "source": "evm_rpc", "url": f"{stub_url}/evm",
+            "estimated_time": {"high": "<1 sec", "medium": "~1 sec", "low": "~2 sec"},
+            "price_format": ".4f",
+        })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(entries, f)
+    return names
+
+# === Processes ===
+
+def spawn(args: List[str], env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w", encoding="utf-8")
+    return subprocess.Popen(args, env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+
+def stop(process: subprocess.Popen) -> None:
+    if process.poll() is not None:
+        return
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+async def wait_ready(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode}")
+            try:
+                response = await client.get(url, timeout=1.0)
+                if response.status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+class ProcessSampler:
+    """
+    Samples a process's CPU time and resident memory from /proc while the load runs.
+    """
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.rss: List[int] = []
+        self.cpu: List[float] = []
+
+    def read(self) -> Optional[tuple]:
+        try:
+            with open(f"/proc/{self.pid}/stat", encoding="utf-8") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        # utime and stime are fields 14 and 15, rss is field 24 (1-based, pid and comm removed)
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / self.ticks
+        return cpu_seconds, int(fields[21]) * self.page_size
+
+    async def run(self) -> None:
+        previous = self.read()
+        last = time.monotonic()
+        while previous is not None:
+            await asyncio.sleep(self.interval)
+            current = self.read()
+            now = time.monotonic()
+            if current is None:
+                return
+            self.cpu.append(100.0 * (current[0] - previous[0]) / (now - last))
+            self.rss.append(current[1])
+            previous, last = current, now
+
+    def summary(self) -> Dict[str, Any]:
+        mb = 1024 * 1024
+        return {
+            "cpu_percent_mean": round(sum(self.cpu) / len(self.cpu), 2) if self.cpu else None,
+            "cpu_percent_p99": round(percentile(self.cpu, 99), 2) if self.cpu else None,
+            "rss_mb_start": round(self.rss[0] / mb, 2) if self.rss else None,
+            "rss_mb_max": round(max(self.rss) / mb, 2) if self.rss else None,
+            "rss_mb_end": round(self.rss[-1] / mb, 2) if self.rss else None,
+            "samples": len(self.rss),
+        }
+
+# === Load ===
+
+class WsStats:
+    def __init__(self):
+        self.connect: List[float] = []
+        self.delivery: List[float] = []
+        self.messages = 0
+        self.bytes = 0
+        self.errors: Dict[str, int] = {}
+        self.predictions: List[float] = []
+
+    def error(self, reason: str) -> None:
+        self.errors[reason] = self.errors.get(reason, 0) + 1
+
+def delivery_lag(message: Any, received: float) -> Optional[float]:
+    """
+    Seconds between a snapshot's timestamp and its arrival at the client.
+    """
+    if isinstance(message, list) and message and isinstance(message[0], dict):
+        updated = message[0].get("lastUpdated")
+        if updated:
+            return received - datetime.fromisoformat(updated).replace(tzinfo=timezone.utc).timestamp()
+        return None
+    if isinstance(message, dict) and message.get("type") in ("snapshot", "delta") and "t" in message:
+        return received - message["t"]
+    return None
+
+async def ws_client(url: str, v2: bool, predict_network: Optional[str], stop_at: float, stats: WsStats) -> None:
+    started = time.perf_counter()
+    try:
+        async with websockets.connect(url + ("?v=2" if v2 else ""), open_timeout=30, max_size=None) as ws:
+            stats.connect.append(time.perf_counter() - started)
+            predicted_at: Optional[float] = None
+            caught_up = False
+            if predict_network is not None:
+                predicted_at = time.perf_counter()
+                await ws.send(json.dumps({"action": "predict", "network": predict_network}))
+            while True:
+                remaining = stop_at - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    return
+                received = time.time()
+                stats.messages += 1
+                stats.bytes += len(raw)
+                if raw == "pong":
+                    continue
+                message = json.loads(raw)
+                if isinstance(message, dict) and message.get("action") == "prediction" and predicted_at is not None:
+                    stats.predictions.append(time.perf_counter() - predicted_at)
+                    predicted_at = None
+                    continue
+                lag = delivery_lag(message, received)
+                if lag is None:
+                    continue
+                # The first snapshot is the current one replayed on connect, not a live broadcast
+                if caught_up:
+                    stats.delivery.append(max(0.0, lag))
+                caught_up = True
+    except websockets.ConnectionClosed as e:
+        stats.error(f"closed_{e.code}" if e.code is not None else "closed")
+    except (OSError, asyncio.TimeoutError, websockets.InvalidHandshake) as e:
+        stats.error(type(e).__name__)
+
+async def run_ws_clients(url: str, args: argparse.Namespace, networks: List[str], stop_at: float, stats: WsStats) -> None:
+    tasks = []
+    for i in range(args.ws_clients):
+        v2 = random.random() < args.v2_ratio
+        predict = random.choice(networks) if random.random() < args.predict_ratio else None
+        tasks.append(asyncio.create_task(ws_client(url, v2, predict, stop_at, stats)))
+        # Ramp up in batches instead of opening every socket at once
+        if (i + 1) % args.ramp_batch == 0:
+            await asyncio.sleep(args.ramp_delay)
+    await asyncio.gather(*tasks)
+
+class RestStats:
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = {}
+        self.status: Dict[str, Dict[str, int]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, name: str, status: str, elapsed: float) -> None:
+        self.latency.setdefault(name, []).append(elapsed)
+        counts = self.status.setdefault(name, {})
+        counts[status] = counts.get(status, 0) + 1
+
+def rest_targets(hours: float) -> Dict[str, str]:
+    start = (datetime.utcnow() - timedelta(hours=min(hours, 24))).strftime("%Y-%m-%dT%H:%M:%S")
+    return {
+        "latest": "/latest",
+        "history": "/history/?limit=100",
+        "history_bitcoin": "/history/bitcoin?limit=100",
+        "history_ethereum_1h": f"/history/ethereum?start={start}&resolution=1h",
+    }
+
+async def rest_poller(base_url: str, conditional: bool, interval: float, stop_at: float, stats: RestStats, hours: float) -> None:
+    targets = rest_targets(hours)
+    etags: Dict[str, str] = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+        # Spread the pollers over the interval
+        await asyncio.sleep(random.uniform(0, interval))
+        while time.monotonic() < stop_at:
+            for name, path in targets.items():
+                headers = {"If-None-Match": etags[name]} if conditional and name in etags else {}
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path, headers=headers)
+                except httpx.HTTPError as e:
+                    stats.errors[type(e).__name__] = stats.errors.get(type(e).__name__, 0) + 1
+                    continue
+                stats.record(name, str(response.status_code), time.perf_counter() - started)
+                if "etag" in response.headers:
+                    etags[name] = response.headers["etag"]
+            await asyncio.sleep(interval)
+
+async def scrape(url: str) -> Dict[str, Any]:
+    """
+    Collect the _sum and _count series of every histogram on /metrics.
+    """
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        try:
+            text = (await client.get(url)).text
+        except httpx.HTTPError:
+            return {}
+    series: Dict[str, Dict[str, float]] = {}
+    for line in text.splitlines():
+        if line.startswith("#") or " " not in line:
+            continue
+        name, value = line.rsplit(" ", 1)
+        metric = name.split("{", 1)[0]
+        for suffix in ("_sum", "_count"):
+            if metric.endswith(suffix):
+                labels = name[len(metric):]
+                entry = series.setdefault(metric[:-len(suffix)] + labels, {})
+                entry[suffix[1:]] = float(value)
+    for entry in series.values():
+        if entry.get("count"):
+            entry["mean_ms"] = round(1000 * entry["sum"] / entry["count"], 3)
+    return series
+
+# === Main ===
+
+async def run(args: argparse.Namespace, workdir: str) -> Dict[str, Any]:
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    app_url = f"http://127.0.0.1:{args.port}"
+    env = dict(os.environ)
+
+    stubs = spawn([
+        sys.executable, "-m", "benchmarks.stubs",
+        "--port", str(args.stub_port),
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--failure-rate", str(args.failure_rate),
+        "--hang-rate", str(args.hang_rate),
+        "--seed", str(args.seed),
+    ], env, os.path.join(workdir, "stubs.log"))
+
+    store_path = os.path.join(workdir, "store.json")
+    networks_path = os.path.join(workdir, "networks.json")
+    seeded = seed_store(store_path, args.seed_hours, args.collect_interval, list(SEED_RANGES))
+    extra = write_networks_config(networks_path, stub_url, args.extra_evm_chains)
+
+    env.update({
+        "STORAGE_BACKEND": "memory",
+        "MEMORY_SNAPSHOT_PATH": store_path,
+        "NETWORKS_CONFIG": networks_path,
+        "COLLECT_INTERVAL": str(args.collect_interval),
+        "GEMINI_API_KEY": "bench",
+        "GEMINI_API_ENDPOINT": f"127.0.0.1:{args.stub_port}",
+        "WRITE_SPILL_PATH": os.path.join(workdir, "spill.ndjson"),
+    })
+    server = spawn([
+        sys.executable, "-m", "uvicorn", "CoinGas.backend.main:app",
+        "--host", "127.0.0.1", "--port", str(args.port),
+        "--log-level", "warning",
+    ], env, os.path.join(workdir, "server.log"))
+
+    try:
+        await wait_ready(f"{stub_url}/stats", stubs)
+        await wait_ready(f"{app_url}/", server)
+        # Let every network be fetched at least once
+        await asyncio.sleep(args.collect_interval * 2)
+
+        sampler = ProcessSampler(server.pid)
+        sampler_task = asyncio.create_task(sampler.run())
+        ws_stats, rest_stats = WsStats(), RestStats()
+        started = time.monotonic()
+        stop_at = started + args.duration
+        networks = ["bitcoin", "ethereum", "solana", *extra]
+
+        await asyncio.gather(
+            run_ws_clients(f"ws://127.0.0.1:{args.port}/ws/gas", args, networks, stop_at, ws_stats),
+            *[
+                rest_poller(app_url, i < args.pollers * args.conditional_ratio, args.poll_interval, stop_at, rest_stats, args.seed_hours)
+                for i in range(args.pollers)
+            ],
+        )
+        elapsed = time.monotonic() - started
+        sampler_task.cancel()
+
+        server_metrics = await scrape(f"{app_url}/metrics")
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            startup = (await client.get(f"{app_url}/startup")).json()
+            stub_stats = (await client.get(f"{stub_url}/stats")).json()
+    finally:
+        stop(server)
+        stop(stubs)
+
+    rest = {
+        name: {
+            **summarize(latencies),
+            "rps": round(len(latencies) / elapsed, 2),
+            "status": rest_stats.status.get(name, {}),
+        }
+        for name, latencies in rest_stats.latency.items()
+    }
+    total_requests = sum(len(latencies) for latencies in rest_stats.latency.values())
+    return {
+        "started_at": datetime.utcnow().isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "seeded_snapshots": seeded,
+        "duration_s": round(elapsed, 2),
+        "websocket": {
+            "clients": args.ws_clients,
+            "connected": len(ws_stats.connect),
+            "connect": summarize(ws_stats.connect),
+            "delivery_lag": summarize(ws_stats.delivery),
+            "messages": ws_stats.messages,
+            "messages_per_s": round(ws_stats.messages / elapsed, 2),
+            "bytes_per_s": round(ws_stats.bytes / elapsed, 2),
+            "predictions": summarize(ws_stats.predictions),
+            "errors": ws_stats.errors,
+        },
+        "rest": {
+            "requests": total_requests,
+            "rps": round(total_requests / elapsed, 2),
+            "errors": rest_stats.errors,
+            "endpoints": rest,
+        },
+        "server": sampler.summary(),
+        "startup": startup,
+        "server_metrics": server_metrics,
+        "stubs": stub_stats,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load and latency benchmark for the CoinGas backend")
+    parser.add_argument("--ws-clients", type=int, default=1000, help="simulated /ws/gas clients")
+    parser.add_argument("--v2-ratio", type=float, default=0.5, help="share of clients using protocol version 2")
+    parser.add_argument("--predict-ratio", type=float, default=0.0, help="share of clients requesting a prediction")
+    parser.add_argument("--ramp-batch", type=int, default=100, help="clients connected per ramp step")
+    parser.add_argument("--ramp-delay", type=float, default=0.1, help="seconds between ramp steps")
+    parser.add_argument("--pollers", type=int, default=20, help="simulated REST pollers")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds between a poller's rounds")
+    parser.add_argument("--conditional-ratio", type=float, default=0.5, help="share of pollers sending If-None-Match")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--collect-interval", type=int, default=5, help="COLLECT_INTERVAL of the backend")
+    parser.add_argument("--seed-hours", type=float, default=24, help="hours of history seeded into the store")
+    parser.add_argument("--extra-evm-chains", type=int, default=0, help="additional evm_rpc networks to collect")
+    parser.add_argument("--latency-ms", type=float, default=50, help="upstream stub latency")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="upstream stub jitter")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of upstream calls failing")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of upstream calls hanging")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory(prefix="coingas-bench-") as workdir:
+        try:
+            results = asyncio.run(run(args, workdir))
+        except Exception:
+            for name in ("server.log", "stubs.log"):
+                path = os.path.join(workdir, name)
+                if os.path.exists(path):
+                    with open(path, encoding="utf-8") as f:
+                        sys.stderr.write(f"--- {name} ---\n{f.read()[-4000:]}\n")
+            raise
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps({
+        "ws_connected": results["websocket"]["connected"],
+        "ws_delivery_p99_ms": results["websocket"]["delivery_lag"]["p99_ms"],
+        "rest_rps": results["rest"]["rps"],
+        "server_cpu_percent_mean": results["server"]["cpu_percent_mean"],
+        "server_rss_mb_max": results["server"]["rss_mb_max"],
+    }, indent=2))
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# === Upstream stubs for benchmarks ===
+#
+# Imitates the upstream APIs the collector and predictor call, on one local port:
+#
+#   GET  /api/v1/fees/recommended                    mempool.space
+#   GET  /api/mempool                                mempool.space (fee histogram)
+#   GET  /api?module=gastracker&action=gasoracle     Etherscan gas oracle
+#   POST /solana                                     Solana JSON-RPC (batched)
+#   POST /evm                                        EVM JSON-RPC eth_feeHistory
+#   POST /v1beta/models/<model>:generateContent      Gemini
+#
+# Every response is delayed by --latency-ms (plus up to --jitter-ms), and a
+# share of requests fails with a 503 (--failure-rate) or hangs past the
+# collector's deadline (--hang-rate).
+#
+#   python -m benchmarks.stubs --port 9100 --latency-ms 80 --failure-rate 0.02
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+logger = logging.getLogger("stubs")
+
+HANG_SECONDS = 30
+
+class StubSettings:
+    def __init__(self, latency_ms: float = 50, jitter_ms: float = 20, failure_rate: float = 0.0, hang_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.hang_rate = hang_rate
+        self.requests: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+
+settings = StubSettings()
+
+async def upstream(name: str) -> Optional[Response]:
+    """
+    Apply the configured latency and failure injection for one request.
+
+    Returns:
+        Optional[Response]: A failure response to return instead, or None
+    """
+    settings.requests[name] = settings.requests.get(name, 0) + 1
+    await asyncio.sleep((settings.latency_ms + random.uniform(0, settings.jitter_ms)) / 1000)
+    roll = random.random()
+    if roll < settings.hang_rate:
+        settings.failures[name] = settings.failures.get(name, 0) + 1
+        await asyncio.sleep(HANG_SECONDS)
+    elif roll < settings.hang_rate + settings.failure_rate:
+        settings.failures[name] = settings.failures.get(name, 0) + 1
+        return JSONResponse({"error": "injected failure"}, status_code=503)
+    return None
+
+# === Handlers ===
+
+async def mempool_fees(request: Request) -> Response:
+    failure = await upstream("mempool")
+    if failure:
+        return failure
+    low = random.randint(2, 10)
+    return JSONResponse({
+        "fastestFee": low + random.randint(5, 30),
+        "halfHourFee": low + random.randint(2, 5),
+        "hourFee": low + 1,
+        "economyFee": low,
+        "minimumFee": 1,
+    })
+
+async def mempool_histogram(request: Request) -> Response:
+    failure = await upstream("mempool")
+    if failure:
+        return failure
+    # Descending fee rates, a few hundred bins totalling tens of MvB like a busy mempool
+    rate = random.uniform(80, 300)
+    histogram = []
+    while rate > 1:
+        histogram.append([round(rate, 3), random.randint(20_000, 250_000)])
+        rate *= random.uniform(0.9, 0.99)
+    return JSONResponse({
+        "count": len(histogram) * 400,
+        "vsize": sum(vsize for _, vsize in histogram),
+        "total_fee": sum(int(rate * vsize) for rate, vsize in histogram),
+        "fee_histogram": histogram,
+    })
+
+async def etherscan(request: Request) -> Response:
+    failure = await upstream("etherscan")
+    if failure:
+        return failure
+    if request.query_params.get("action") != "gasoracle" or not request.query_params.get("apikey"):
+        return JSONResponse({"status": "0", "message": "NOTOK", "result": "Missing/Invalid API Key"})
+    safe = random.uniform(5, 30)
+    return JSONResponse({
+        "status": "1",
+        "message": "OK",
+        "result": {
+            "LastBlock": str(random.randint(19_000_000, 20_000_000)),
+            "SafeGasPrice": f"{safe:.3f}",
+            "ProposeGasPrice": f"{safe * 1.1:.3f}",
+            "FastGasPrice": f"{safe * 1.3:.3f}",
+            "suggestBaseFee": f"{safe * 0.95:.3f}",
+            "gasUsedRatio": "0.45,0.52,0.61,0.38,0.49",
+        },
+    })
+
+def solana_result(method: str) -> Any:
+    slot = random.randint(250_000_000, 260_000_000)
+    if method == "getLatestBlockhash":
+        return {"context": {"slot": slot}, "value": {"blockhash": "StubB1ockhash1111111111111111111111111111111", "lastValidBlockHeight": slot + 150}}
+    if method == "getRecentPrioritizationFees":
+        return [{"slot": slot - i, "prioritizationFee": random.choice([0, 0, 1000, 5000, 25000])} for i in range(150)]
+    if method == "getRecentPerformanceSamples":
+        return [{"slot": slot - i * 150, "numSlots": 150, "numTransactions": random.randint(150_000, 450_000), "samplePeriodSecs": 60} for i in range(4)]
+    return None
+
+async def solana_rpc(request: Request) -> Response:
+    failure = await upstream("solana")
+    if failure:
+        return failure
+    body = await request.json()
+    calls = body if isinstance(body, list) else [body]
+    results = [{"jsonrpc": "2.0", "id": call.get("id"), "result": solana_result(call.get("method"))} for call in calls]
+    return JSONResponse(results if isinstance(body, list) else results[0])
+
+async def evm_rpc(request: Request) -> Response:
+    failure = await upstream("evm")
+    if failure:
+        return failure
+    body = await request.json()
+    blocks = int(body["params"][0], 16)
+    percentiles = body["params"][2]
+    base_fee = random.randint(10_000_000, 2_000_000_000)
+    return JSONResponse({
+        "jsonrpc": "2.0",
+        "id": body.get("id"),
+        "result": {
+            "oldestBlock": hex(20_000_000 - blocks),
+            "baseFeePerGas": [hex(base_fee + i) for i in range(blocks + 1)],
+            "gasUsedRatio": [random.random() for _ in range(blocks)],
+            "reward": [[hex(tip) for tip in sorted(random.randint(1, 10**9) for _ in percentiles)] for _ in range(blocks)],
+        },
+    })
+
+def gemini_prediction() -> List[Dict[str, Any]]:
+    return [
+        {"timestamp": f"{hour:02d}:00", "high": round(random.uniform(20, 40), 2), "medium": round(random.uniform(10, 20), 2), "low": round(random.uniform(1, 10), 2)}
+        for hour in range(24)
+    ]
+
+async def gemini(request: Request) -> Response:
+    failure = await upstream("gemini")
+    if failure:
+        return failure
+    text = "```json\n" + json.dumps(gemini_prediction()) + "\n```"
+    return JSONResponse({
+        "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {"promptTokenCount": 1200, "candidatesTokenCount": 900, "totalTokenCount": 2100},
+    })
+
+async def stats(request: Request) -> Response:
+    return JSONResponse({"requests": settings.requests, "failures": settings.failures})
+
+app = Starlette(routes=[
+    Route("/api/v1/fees/recommended", mempool_fees),
+    Route("/api/mempool", mempool_histogram),
+    Route("/api", etherscan),
+    Route("/solana", solana_rpc, methods=["POST"]),
+    Route("/evm", evm_rpc, methods=["POST"]),
+    Route("/v1beta/models/{model:path}", gemini, methods=["POST"]),
+    Route("/stats", stats),
+])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local stand-ins for the CoinGas upstream APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=50, help="base delay of every response")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="random extra delay, up to this much")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests answered with a 503")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of requests that never answer in time")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible runs")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    settings.latency_ms = args.latency_ms
+    settings.jitter_ms = args.jitter_ms
+    settings.failure_rate = args.failure_rate
+    settings.hang_rate = args.hang_rate
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
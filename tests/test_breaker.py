@@ -0,0 +1,79 @@
+import pytest
+
+from CoinGas.backend.scheduler import breaker as breaker_module
+from CoinGas.backend.scheduler.breaker import CircuitBreaker
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(breaker_module.time, "monotonic", clock)
+    return clock
+
+def open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=2, base_delay=5.0, max_delay=20.0)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+def test_opens_after_threshold(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = open_breaker()
+    clock.now += 5
+
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert not breaker.allow()
+
+def test_successful_probe_closes(clock):
+    breaker = open_breaker()
+    clock.now += 5
+    assert breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+    assert breaker.allow()
+
+def test_failed_probe_backs_off_longer(clock):
+    breaker = open_breaker()
+    clock.now += 5
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now += 5
+    assert not breaker.allow()
+    clock.now += 5
+    assert breaker.allow()
+
+def test_backoff_is_capped(clock):
+    breaker = open_breaker()
+    for _ in range(10):
+        breaker.record_failure()
+    assert breaker.retry_at - clock.now == 20.0
+
+def test_released_probe_allows_another(clock):
+    breaker = open_breaker()
+    clock.now += 5
+    assert breaker.allow()
+
+    breaker.release()
+    assert breaker.allow()
+    assert not breaker.allow()
@@ -0,0 +1,62 @@
+from CoinGas.backend.cache import SnapshotRing
+
+def snapshot(i: int) -> dict:
+    return {"timestamp": f"2026-01-01T00:{i:02d}:00", "btc_high": float(i)}
+
+def test_empty_ring():
+    ring = SnapshotRing(3)
+    assert ring.latest() is None
+    assert ring.window(0) == []
+    assert ring.window(1) is None
+
+def test_window_is_newest_first_and_wraps():
+    ring = SnapshotRing(3)
+    for i in range(5):
+        ring.append(snapshot(i))
+
+    assert len(ring) == 3
+    assert ring.latest() == snapshot(4)
+    assert [item["btc_high"] for item in ring.window(3)] == [4.0, 3.0, 2.0]
+    assert [item["btc_high"] for item in ring.window(2)] == [4.0, 3.0]
+
+def test_window_past_capacity_falls_back():
+    ring = SnapshotRing(3)
+    for i in range(5):
+        ring.append(snapshot(i))
+    assert ring.window(4) is None
+
+def test_window_stops_at_since():
+    ring = SnapshotRing(3)
+    for i in range(5):
+        ring.append(snapshot(i))
+    window = ring.window(10, since=snapshot(3)["timestamp"])
+    assert [item["btc_high"] for item in window] == [4.0, 3.0]
+
+def test_seeded_ring_holding_everything_answers_any_limit():
+    ring = SnapshotRing(5)
+    ring.seed([snapshot(i) for i in (2, 1, 0)])
+    assert [item["btc_high"] for item in ring.window(100)] == [2.0, 1.0, 0.0]
+
+    # Once the ring overflows it no longer holds every snapshot
+    for i in range(3, 6):
+        ring.append(snapshot(i))
+    assert ring.window(100) is None
+
+def test_seeding_a_full_ring_is_incomplete():
+    ring = SnapshotRing(2)
+    ring.seed([snapshot(i) for i in (2, 1)])
+    assert ring.window(3) is None
+
+def test_returns_copies_and_tracks_version():
+    ring = SnapshotRing(2)
+    ring.append({"_id": 7, **snapshot(0)})
+    version = ring.version
+
+    latest = ring.latest()
+    latest["btc_high"] = -1.0
+    assert ring.latest()["btc_high"] == 0.0
+    assert ring.latest()["_id"] == "7"
+
+    ring.append(snapshot(1))
+    assert ring.version == version + 1
+    assert ring.updated_at is not None
@@ -0,0 +1,33 @@
+from CoinGas.backend.db import RAW_RETENTION, ROLLUP_LEVELS, aggregate_plan, retention_cutoff, select_level
+
+# Half past an hour, so the raw cutoff falls mid-bucket
+NOW = 1_800_000_000 - 1_800_000_000 % 3600 + 1800
+DAY = 86400
+
+def test_retention_cutoffs():
+    assert retention_cutoff("raw", NOW) == NOW - RAW_RETENTION - 1800
+    assert retention_cutoff("1m", NOW) == NOW - 7 * DAY - 60
+    assert retention_cutoff("1h", NOW) == NOW - 400 * DAY - 3600
+    assert retention_cutoff("1d", NOW) is None
+
+def test_select_level_uses_what_retention_keeps():
+    assert select_level(NOW - RAW_RETENTION, now=NOW) == "raw"
+    assert select_level(NOW - RAW_RETENTION - 1, now=NOW) == "raw"
+    assert select_level(NOW - RAW_RETENTION - 1801, now=NOW) == "1m"
+    assert select_level(NOW - 7 * DAY - 60, now=NOW) == "1m"
+    assert select_level(NOW - 7 * DAY - 61, now=NOW) == "1h"
+    assert select_level(NOW - 1000 * DAY, now=NOW) == "1d"
+
+def test_select_level_picks_coarsest_fitting_resolution():
+    assert select_level(NOW - 3600, resolution=60, now=NOW) == "1m"
+    assert select_level(NOW - 3600, resolution=30, now=NOW) == "raw"
+    assert select_level(NOW - 3 * DAY, resolution=7200, now=NOW) == "1h"
+
+def test_last_week_at_fifteen_minutes_reads_minutes():
+    # A range starting a second before "7 days ago" is still within the 1m tier
+    assert aggregate_plan(NOW - 7 * DAY - 1, NOW, 900, now=NOW) == (1210, "1m")
+    assert select_level(NOW - DAY - 1, resolution=5, now=NOW) == "raw"
+
+def test_levels_are_ordered_finest_first():
+    periods = [period for period, _ in ROLLUP_LEVELS.values()]
+    assert periods == sorted(periods)
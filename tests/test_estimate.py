@@ -0,0 +1,66 @@
+import pytest
+
+from CoinGas.backend.scheduler.estimate import estimate_from_queue, estimate_from_recent, tier_percentiles
+
+FEES = [float(fee) for fee in range(1, 11)]
+
+def test_tier_percentiles_are_validated():
+    assert tier_percentiles([100, 50, 0]).tolist() == [100.0, 50.0, 0.0]
+    with pytest.raises(ValueError):
+        tier_percentiles([101, 50, 10])
+    with pytest.raises(ValueError):
+        tier_percentiles([90, 10])
+
+# === Recent inclusion model ===
+
+def test_recent_without_samples():
+    assert estimate_from_recent([], interval=0.4) is None
+    assert estimate_from_recent([1.0, 2.0], interval=0.4, weights=[0.0, 0.0]) is None
+
+def test_recent_percentile_edges():
+    estimate = estimate_from_recent(FEES, interval=2.0, percentiles=[100, 50, 0])
+    assert estimate.fees == (10.0, 5.0, 1.0)
+    # Included in every, half of and one in ten of the recent slots
+    assert estimate.eta == pytest.approx((2.0, 4.0, 20.0))
+
+def test_recent_single_sample():
+    estimate = estimate_from_recent([3.0], interval=12.0)
+    assert estimate.fees == (3.0, 3.0, 3.0)
+    assert estimate.eta == (12.0, 12.0, 12.0)
+
+def test_recent_adds_floor():
+    estimate = estimate_from_recent(FEES, interval=1.0, percentiles=[100, 50, 0], floor=0.5)
+    assert estimate.fees == (10.5, 5.5, 1.5)
+
+def test_recent_equal_weights_match_unweighted():
+    unweighted = estimate_from_recent(FEES, interval=1.0)
+    weighted = estimate_from_recent(list(reversed(FEES)), interval=1.0, weights=[1.0] * len(FEES))
+    assert weighted.fees == unweighted.fees
+    assert weighted.eta == pytest.approx(unweighted.eta)
+
+def test_recent_weighted():
+    estimate = estimate_from_recent([4.0, 1.0, 3.0, 2.0], interval=1.0, weights=[7.0, 1.0, 1.0, 1.0])
+    assert estimate.fees == (4.0, 4.0, 1.0)
+    assert estimate.eta == pytest.approx((1.0, 1.0, 10.0))
+
+# === Queue model ===
+
+def test_queue_without_backlog():
+    estimate = estimate_from_queue([], [], capacity=100, interval=600, window=3, floor=1.0)
+    assert estimate == ((1.0, 1.0, 1.0), (600.0, 600.0, 600.0))
+    assert estimate_from_queue([5.0], [0.0], capacity=100, interval=600, window=3).eta == (600.0, 600.0, 600.0)
+
+def test_queue_percentile_edges():
+    estimate = estimate_from_queue([10.0, 5.0, 1.0], [100, 100, 100], capacity=100, interval=600, window=3, percentiles=[100, 50, 0])
+    assert estimate.fees == (10.0, 5.0, 1.0)
+    assert estimate.eta == (600.0, 1200.0, 1800.0)
+
+def test_queue_sorts_ascending_input_and_applies_floor():
+    estimate = estimate_from_queue([1.0, 10.0, 5.0], [100, 100, 100], capacity=100, interval=600, window=3, percentiles=[100, 50, 0], floor=2.0)
+    assert estimate.fees == (10.0, 5.0, 2.0)
+    assert estimate.eta == (600.0, 1200.0, 1800.0)
+
+def test_queue_only_looks_at_the_window():
+    estimate = estimate_from_queue([10.0, 5.0, 1.0], [100, 100, 100], capacity=100, interval=600, window=1, percentiles=[100, 50, 0])
+    assert estimate.fees == (10.0, 10.0, 10.0)
+    assert estimate.eta == (600.0, 600.0, 600.0)
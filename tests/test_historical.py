@@ -0,0 +1,91 @@
+import base64
+import json
+import time
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from CoinGas.backend.db import BUCKET_SECONDS, get_repository, to_iso
+from CoinGas.backend.historical import decode_cursor, encode_cursor, router
+from CoinGas.backend.memstore import MemoryRepository
+
+STATE = {"n": ["btc", "eth"], "l": "raw", "s": 1_700_000_000, "e": 1_700_003_600}
+
+def raw_token(state) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode().rstrip("=")
+
+@pytest.fixture
+def boundary() -> int:
+    # Start of the last completed hour, so the samples straddle two buckets
+    now = int(time.time())
+    return now - now % BUCKET_SECONDS - BUCKET_SECONDS
+
+@pytest.fixture
+def client(boundary) -> TestClient:
+    repository = MemoryRepository("")
+    repository.store_snapshots([
+        {"timestamp": to_iso(t), "btc_high": 3.0, "btc_medium": 2.0, "btc_low": 1.0, "eth_high": 0.3, "eth_medium": 0.2, "eth_low": 0.1}
+        for t in range(boundary - 60, boundary + 60, 5)
+    ])
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_repository] = lambda: repository
+    return TestClient(app)
+
+def read_pages(client, params):
+    pages = []
+    response = client.get("/history/export", params=params)
+    while True:
+        assert response.status_code == 200
+        pages.append([json.loads(line) for line in response.text.splitlines()])
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            return pages
+        response = client.get("/history/export", params={"cursor": cursor, "page_size": params["page_size"]})
+
+# === Cursor encoding ===
+
+def test_cursor_round_trip():
+    token = encode_cursor(STATE)
+    assert "=" not in token
+    assert decode_cursor(token) == STATE
+
+def test_cursor_networks_are_normalized():
+    assert decode_cursor(raw_token({**STATE, "n": ["Bitcoin", "ETH"]}))["n"] == ["btc", "eth"]
+
+@pytest.mark.parametrize("token", [
+    "not a cursor",
+    raw_token({**STATE, "n": ["dogecoin"]}),
+    raw_token({**STATE, "n": []}),
+    raw_token({**STATE, "l": "5m"}),
+    raw_token({**STATE, "s": "yesterday"}),
+    raw_token({"n": ["btc"], "l": "raw"}),
+    raw_token(["btc", "raw", 0, 1]),
+])
+def test_tampered_cursor_is_rejected(token):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(token)
+    assert error.value.status_code == 400
+
+def test_export_rejects_tampered_cursor(client):
+    response = client.get("/history/export", params={"cursor": raw_token({**STATE, "l": "$where"})})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+# === Keyset paging ===
+
+def test_pages_continue_across_buckets(client, boundary):
+    params = {"start": to_iso(boundary - 60), "page_size": 5}
+    whole = read_pages(client, {**params, "page_size": 1000})
+    assert len(whole) == 1 and len(whole[0]) == 48
+
+    pages = read_pages(client, params)
+    rows = [row for page in pages for row in page]
+    assert rows == whole[0]
+    assert len(pages) == 8
+
+    # Pages end on timestamp boundaries, so both networks of a timestamp stay together
+    for earlier, later in zip(pages, pages[1:]):
+        assert earlier[-1]["timestamp"] < later[0]["timestamp"]
+        assert len(earlier) == 6
@@ -0,0 +1,92 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from CoinGas.backend import httpcache
+from CoinGas.backend.cache import SnapshotRing
+from CoinGas.backend.httpcache import ResponseCache
+from CoinGas.backend.models import SNAPSHOT_LIST_ADAPTER
+
+@pytest.fixture
+def ring(monkeypatch) -> SnapshotRing:
+    ring = SnapshotRing(10)
+    monkeypatch.setattr(httpcache, "snapshot_cache", ring)
+    ring.append({"timestamp": "2026-01-01T00:00:00", "btc_high": 1.0})
+    return ring
+
+@pytest.fixture
+def app(ring):
+    cache = ResponseCache(max_entries=2)
+    calls = []
+
+    async def history():
+        calls.append(1)
+        return ring.window(len(ring))
+
+    app = FastAPI()
+
+    @app.get("/history")
+    async def get_history(request: Request):
+        return await cache.respond(request, history, SNAPSHOT_LIST_ADAPTER)
+
+    app.state.cache = cache
+    app.state.calls = calls
+    return app
+
+def test_serves_from_cache_until_next_snapshot(app, ring):
+    client = TestClient(app)
+    first = client.get("/history")
+    second = client.get("/history")
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == [{"timestamp": "2026-01-01T00:00:00", "btc_high": 1.0}]
+    assert first.headers["etag"] == second.headers["etag"]
+    assert "last-modified" in first.headers
+    assert first.headers["cache-control"].startswith("public, max-age=")
+    assert len(app.state.calls) == 1
+
+    ring.append({"timestamp": "2026-01-01T00:00:05", "btc_high": 2.0})
+    third = client.get("/history")
+    assert len(third.json()) == 2
+    assert third.headers["etag"] != first.headers["etag"]
+    assert len(app.state.calls) == 2
+
+def test_if_none_match(app):
+    client = TestClient(app)
+    etag = client.get("/history").headers["etag"]
+
+    not_modified = client.get("/history", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+
+    assert client.get("/history", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get("/history", headers={"If-None-Match": "*"}).status_code == 304
+    assert client.get("/history", headers={"If-None-Match": '"other"'}).status_code == 200
+    assert app.state.cache.stats()["not_modified"] == 3
+
+def test_if_modified_since(app):
+    client = TestClient(app)
+    last_modified = client.get("/history").headers["last-modified"]
+
+    assert client.get("/history", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/history", headers={"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"}).status_code == 200
+    assert client.get("/history", headers={"If-Modified-Since": "not a date"}).status_code == 200
+
+def test_etag_takes_precedence_over_if_modified_since(app):
+    client = TestClient(app)
+    last_modified = client.get("/history").headers["last-modified"]
+
+    response = client.get("/history", headers={"If-None-Match": '"other"', "If-Modified-Since": last_modified})
+    assert response.status_code == 200
+
+def test_entries_are_keyed_by_query_and_bounded(app):
+    client = TestClient(app)
+    for limit in (1, 2, 3):
+        client.get("/history", params={"limit": limit})
+    client.get("/history", params={"limit": 3})
+
+    stats = app.state.cache.stats()
+    assert stats["entries"] == 2
+    assert stats["misses"] == 3
+    assert stats["hits"] == 1
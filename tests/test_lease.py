@@ -0,0 +1,134 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError
+
+from CoinGas.backend.scheduler import jobs, lease as lease_module
+from CoinGas.backend.scheduler.lease import LeaderLease
+
+class UnreachableCollection:
+    def find_one_and_update(self, *args, **kwargs):
+        raise ServerSelectionTimeoutError("no servers")
+
+    def delete_one(self, *args, **kwargs):
+        raise ServerSelectionTimeoutError("no servers")
+
+class LeaseCollection:
+    """
+    Holds lease documents and answers the lease's conditional upsert like
+    MongoDB: a filter that misses an existing _id fails the upsert with a
+    duplicate key error.
+    """
+    def __init__(self):
+        self.docs = {}
+
+    def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        doc = self.docs.get(query["_id"])
+        owner, = query["$or"][0].values()
+        expired_before = query["$or"][1]["expires_at"]["$lt"]
+        if doc is not None and doc["owner"] != owner and doc["expires_at"] >= expired_before:
+            raise DuplicateKeyError("lease is held")
+        doc = {"_id": query["_id"], **update["$set"]}
+        self.docs[doc["_id"]] = doc
+        return dict(doc)
+
+    def delete_one(self, query):
+        doc = self.docs.get(query["_id"])
+        if doc is not None and doc["owner"] == query["owner"]:
+            del self.docs[query["_id"]]
+
+    def expire(self, name: str = "scheduler"):
+        self.docs[name]["expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(lease_module, "time", clock)
+    return clock
+
+def acquire(monkeypatch, lease: LeaderLease, worker: str) -> bool:
+    # Every lease in a test shares the process, so switch the owner id per call
+    monkeypatch.setattr(lease_module, "WORKER_ID", worker)
+    return lease.acquire()
+
+def test_unreachable_mongo_means_not_held():
+    lease = LeaderLease(ttl=15.0, collection=UnreachableCollection())
+    assert lease.acquire() is False
+    assert not lease.held
+    lease.release()
+
+def test_follower_takes_over_an_expired_lease(monkeypatch, clock):
+    collection = LeaseCollection()
+    leader, follower = LeaderLease(ttl=15.0, collection=collection), LeaderLease(ttl=15.0, collection=collection)
+
+    assert acquire(monkeypatch, leader, "a") is True
+    assert acquire(monkeypatch, follower, "b") is False
+    assert acquire(monkeypatch, leader, "a") is True
+    assert collection.docs["scheduler"]["owner"] == "a"
+
+    # The leader stopped renewing
+    collection.expire()
+    assert acquire(monkeypatch, follower, "b") is True
+    assert follower.held
+    assert acquire(monkeypatch, leader, "a") is False
+    assert not leader.held
+
+def test_lease_lapses_locally_without_renewal(monkeypatch, clock):
+    lease = LeaderLease(ttl=15.0, collection=LeaseCollection())
+    assert acquire(monkeypatch, lease, "a") is True
+
+    clock.now += 14.0
+    assert lease.held
+    clock.now += 1.0
+    assert not lease.held
+
+def test_release_hands_over_right_away(monkeypatch, clock):
+    collection = LeaseCollection()
+    leader, follower = LeaderLease(ttl=15.0, collection=collection), LeaderLease(ttl=15.0, collection=collection)
+    acquire(monkeypatch, leader, "a")
+
+    monkeypatch.setattr(lease_module, "WORKER_ID", "a")
+    leader.release()
+    assert not leader.held
+    assert acquire(monkeypatch, follower, "b") is True
+
+# === Leader-only jobs ===
+
+def run_job(job_id: str, leader_only: bool = True) -> list:
+    calls = []
+
+    async def job():
+        calls.append(job_id)
+
+    asyncio.run(jobs.timed_job(job_id, job, leader_only)())
+    return calls
+
+def test_followers_skip_leader_only_jobs(monkeypatch, clock):
+    collection = LeaseCollection()
+    collection.docs["scheduler"] = {"_id": "scheduler", "owner": "other", "expires_at": datetime.utcnow() + timedelta(seconds=15)}
+    follower = LeaderLease(ttl=15.0, collection=collection)
+    monkeypatch.setattr(jobs, "lease", follower)
+    monkeypatch.setattr(jobs, "job_stats", {})
+
+    assert acquire(monkeypatch, follower, "b") is False
+    assert run_job("retention") == []
+    assert jobs.job_stats["retention"]["runs"] == 0
+    assert run_job("checkpoint", leader_only=False) == ["checkpoint"]
+
+    collection.expire()
+    assert acquire(monkeypatch, follower, "b") is True
+    assert run_job("retention") == ["retention"]
+    assert jobs.job_stats["retention"]["runs"] == 1
+
+def test_without_a_lease_every_job_runs(monkeypatch):
+    monkeypatch.setattr(jobs, "lease", None)
+    monkeypatch.setattr(jobs, "job_stats", {})
+    assert run_job("retention") == ["retention"]
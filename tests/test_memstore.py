@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+from CoinGas.backend import memstore
+from CoinGas.backend.db import to_iso
+from CoinGas.backend.memstore import MemoryRepository, SortedSeries
+
+def recent_minute() -> int:
+    now = int(time.time())
+    return now - now % 60 - 3600
+
+def snapshot(t: int, **fees: float) -> dict:
+    entry = {"timestamp": to_iso(t)}
+    for key, value in fees.items():
+        entry[f"{key}_high"], entry[f"{key}_medium"], entry[f"{key}_low"] = value, value / 2, value / 4
+    return entry
+
+def export(repository: MemoryRepository, networks, level: str, start: int, end: int) -> list:
+    async def collect():
+        return [row async for row in repository.iter_export_rows(networks, level, start, end)]
+    return asyncio.run(collect())
+
+def test_sorted_series_replaces_existing_time():
+    series = SortedSeries()
+    for t in (30, 10, 20):
+        series.insert(t, t)
+    series.insert(20, "replaced")
+
+    assert series.times == [10, 20, 30]
+    assert series.rows == [10, "replaced", 30]
+    assert series.span(15, 30) == (1, 2)
+
+def test_store_is_idempotent():
+    start = recent_minute()
+    entries = [snapshot(start + i * 15, btc=float(i)) for i in range(8)]
+    repository = MemoryRepository("")
+    repository.store_snapshots(entries)
+    repository.store_snapshots(entries[2:])
+
+    samples = asyncio.run(repository.read_series("btc"))
+    assert len(samples) == 8
+    minutes = asyncio.run(repository.read_rollups("btc", "1m"))
+    assert [point["high"]["max"] for point in minutes] == [7.0, 3.0]
+    assert minutes[1]["high"]["mean"] == 1.5
+
+def test_raw_export_is_ordered_across_networks_and_pages(monkeypatch):
+    monkeypatch.setattr(memstore, "EXPORT_PAGE_SIZE", 3)
+    start = recent_minute()
+    repository = MemoryRepository("")
+    repository.store_snapshots([snapshot(start + i * 5, btc=1.0, eth=2.0) for i in range(10)])
+    repository.store_snapshots([snapshot(start + i * 5 + 1, sol=3.0) for i in range(10)])
+
+    rows = export(repository, ["sol", "eth", "btc"], "raw", start, start + 40)
+
+    assert len(rows) == 24
+    assert [(row["timestamp"], row["network"]) for row in rows] == sorted((row["timestamp"], row["network"]) for row in rows)
+    assert rows[0] == {"timestamp": to_iso(start), "network": "btc", "high": 1.0, "medium": 0.5, "low": 0.25}
+
+def test_rollup_export_matches_level():
+    start = recent_minute()
+    repository = MemoryRepository("")
+    repository.store_snapshots([snapshot(start + i * 30, btc=float(i)) for i in range(6)])
+
+    rows = export(repository, ["btc"], "1m", start, start + 180)
+
+    assert [row["timestamp"] for row in rows] == [to_iso(start + i * 60) for i in range(3)]
+    assert rows[-1]["high_max"] == 5.0
+
+def test_export_pages_end_on_timestamp_boundaries():
+    start = recent_minute()
+    repository = MemoryRepository("")
+    repository.store_snapshots([snapshot(start + i * 5, btc=1.0, eth=2.0, sol=3.0) for i in range(10)])
+    plan = lambda page_size: asyncio.run(repository.plan_export_page(["btc", "eth", "sol"], "raw", start, start + 50, page_size))
+
+    # Four rows end in the middle of the second timestamp, so its last network comes along
+    assert plan(4) == start + 10
+    assert plan(6) == start + 10
+    assert plan(29) is None
+    assert plan(30) is None
+
+def test_retention_matches_mongodb_cutoffs():
+    now = recent_minute() + 3600
+    repository = MemoryRepository("")
+    week = memstore.ROLLUP_LEVELS["1m"][1]
+    for t in (now - week - 120, now - week - 60, now - week):
+        repository._rollups[("btc", "1m")].insert(t, {"network": "btc", "level": "1m", "t": t})
+
+    deleted = repository.apply_retention(now)
+
+    # A minute is kept until all of it has left the window, like delete_many on t < cutoff
+    assert deleted["1m"] == 1
+    assert repository._rollups[("btc", "1m")].times == [now - week - 60, now - week]
+
+def test_history_older_than_the_raw_window_is_kept_as_rollups():
+    now = recent_minute() + 3600
+    old = now - 3 * 86400 - now % 3600
+    repository = MemoryRepository("")
+    repository.store_snapshots([snapshot(old, btc=1.0)])
+    assert asyncio.run(repository.read_rollups("btc", "1h")) == []
+
+    repository.store_samples({"btc": [(old + i * 60, 4.0, 2.0, 1.0) for i in range(60)]})
+    repository.apply_retention(now)
+
+    assert asyncio.run(repository.read_series("btc")) == []
+    [hour] = asyncio.run(repository.read_rollups("btc", "1h"))
+    assert hour["high"]["mean"] == 4.0
+    assert len(asyncio.run(repository.read_rollups("btc", "1m"))) == 60
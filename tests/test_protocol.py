@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from CoinGas.backend.protocol import META_MESSAGE, ClientSession, parse_networks
+
+VALUES = {"btc": [5.0, 3.0, 1.0], "eth": [2.0, 1.5, 1.0], "sol": [1e-5, 5e-6, 1e-6]}
+
+def frame(seq, values=VALUES, stale=(), eta=None):
+    return (seq, 1_700_000_000 + seq, {key: list(tiers) for key, tiers in values.items()}, list(stale), eta or {})
+
+def decode(messages):
+    return [json.loads(message) for message in messages]
+
+def subscribed(networks=("bitcoin", "ethereum"), interval=None) -> ClientSession:
+    session = ClientSession(min_interval=5.0)
+    session.subscribe(list(networks), interval)
+    return session
+
+def test_parse_networks():
+    assert parse_networks(None) == ("btc", "eth", "sol")
+    assert parse_networks(["solana", "btc", "solana"]) == ("sol", "btc")
+    with pytest.raises(ValueError):
+        parse_networks(["dogecoin"])
+
+def test_first_render_sends_meta_and_snapshot():
+    session = subscribed()
+    messages = session.render(frame(1, eta={"btc": [600.0, 1800.0, 3600.0], "sol": [1.0, 2.0, 3.0]}), 0.0, {})
+
+    assert messages[0] == META_MESSAGE
+    snapshot = json.loads(messages[1])
+    assert snapshot["type"] == "snapshot"
+    assert snapshot["d"] == {"btc": VALUES["btc"], "eth": VALUES["eth"]}
+    assert snapshot["eta"] == {"btc": [600.0, 1800.0, 3600.0]}
+
+def test_delta_only_carries_changes():
+    session = subscribed()
+    session.render(frame(1), 0.0, {})
+
+    assert session.render(frame(2), 5.0, {}) == []
+
+    changed = dict(VALUES, eth=[2.5, 1.5, 1.0], sol=[1.0, 1.0, 1.0])
+    [delta] = decode(session.render(frame(3, changed), 10.0, {}))
+    assert delta["type"] == "delta"
+    assert delta["seq"] == 3
+    assert delta["d"] == {"eth": [2.5, 1.5, 1.0]}
+    assert "stale" not in delta and "eta" not in delta
+
+def test_delta_reports_stale_and_eta_changes():
+    session = subscribed()
+    session.render(frame(1), 0.0, {})
+
+    [delta] = decode(session.render(frame(2, stale=["eth", "sol"]), 5.0, {}))
+    assert delta["d"] == {}
+    assert delta["stale"] == ["eth"]
+
+    [delta] = decode(session.render(frame(3, stale=["eth"], eta={"btc": [60.0, 120.0, 300.0]}), 10.0, {}))
+    assert delta["eta"] == {"btc": [60.0, 120.0, 300.0]}
+    assert "stale" not in delta
+
+def test_interval_throttles_deltas():
+    session = subscribed(interval=20)
+    session.render(frame(1), 0.0, {})
+
+    changed = dict(VALUES, btc=[6.0, 3.0, 1.0])
+    assert session.render(frame(2, changed), 5.0, {}) == []
+    [delta] = decode(session.render(frame(3, changed), 20.0, {}))
+    assert delta["d"] == {"btc": [6.0, 3.0, 1.0]}
+
+def test_resubscribe_sends_a_new_snapshot():
+    session = subscribed()
+    session.render(frame(1), 0.0, {})
+    session.subscribe(["solana"])
+
+    [snapshot] = decode(session.render(frame(2), 1.0, {}))
+    assert snapshot["type"] == "snapshot"
+    assert snapshot["d"] == {"sol": VALUES["sol"]}
+
+def test_clients_in_the_same_state_share_encoded_messages():
+    first, second = subscribed(), subscribed()
+    cache = {}
+    first.render(frame(1), 0.0, cache)
+    second.render(frame(1), 0.0, cache)
+
+    cache = {}
+    changed = dict(VALUES, btc=[7.0, 3.0, 1.0])
+    [a] = first.render(frame(2, changed), 5.0, cache)
+    [b] = second.render(frame(2, changed), 5.0, cache)
+    assert a is b
@@ -0,0 +1,120 @@
+import asyncio
+import queue
+import threading
+
+import pytest
+
+from CoinGas.backend import pubsub
+from CoinGas.backend.pubsub import InProcessPubSub, MongoPubSub, create_pubsub, decode_event
+
+class FakeStream:
+    def __init__(self, events: queue.Queue):
+        self.events = events
+        self.alive = True
+        self.resume_token = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.alive = False
+
+    def try_next(self):
+        try:
+            change = self.events.get(timeout=0.05)
+        except queue.Empty:
+            return None
+        self.resume_token = change["_id"]
+        return change
+
+class FakeEventCollection:
+    """
+    Insert-only collection whose change stream delivers every insert to every watcher.
+    """
+    def __init__(self):
+        self.docs = []
+        self.watchers = []
+        self.watching = threading.Event()
+
+    def insert_one(self, doc):
+        self.docs.append(doc)
+        change = {"_id": {"_data": str(len(self.docs))}, "operationType": "insert", "documentKey": {"_id": len(self.docs)}, "fullDocument": doc}
+        for events in self.watchers:
+            events.put(change)
+
+    def watch(self, pipeline, resume_after=None, max_await_time_ms=None):
+        events = queue.Queue()
+        self.watchers.append(events)
+        self.watching.set()
+        return FakeStream(events)
+
+async def receive(messages, count: int):
+    return [await asyncio.wait_for(messages.__anext__(), timeout=2) for _ in range(count)]
+
+def test_create_pubsub():
+    assert isinstance(create_pubsub("memory"), InProcessPubSub)
+    with pytest.raises(ValueError):
+        create_pubsub("redis")
+
+def test_decode_event():
+    assert decode_event({"fullDocument": {"message": {"seq": 1}}}) == {"seq": 1}
+    assert decode_event({"fullDocument": {"created_at": None}}) is None
+    assert decode_event({"fullDocument": {"message": "text"}}) is None
+    assert decode_event({"operationType": "insert"}) is None
+
+# === In-process backend ===
+
+def test_in_process_fans_out_in_order():
+    async def scenario():
+        bus = InProcessPubSub()
+        first, second = bus.subscribe(), bus.subscribe()
+        for seq in (1, 2):
+            await bus.publish({"seq": seq})
+        return await receive(first, 2), await receive(second, 2)
+
+    first, second = asyncio.run(scenario())
+    assert first == second == [{"seq": 1}, {"seq": 2}]
+
+def test_slow_subscriber_keeps_the_newest(monkeypatch):
+    monkeypatch.setattr(pubsub, "SUBSCRIBER_QUEUE_SIZE", 2)
+
+    async def scenario():
+        bus = InProcessPubSub()
+        messages = bus.subscribe()
+        for seq in (1, 2, 3):
+            await bus.publish({"seq": seq})
+        return await receive(messages, 2)
+
+    assert asyncio.run(scenario()) == [{"seq": 2}, {"seq": 3}]
+
+def test_closed_subscriber_is_removed():
+    async def scenario():
+        bus = InProcessPubSub()
+        messages = bus.subscribe()
+        await bus.publish({"seq": 1})
+        await receive(messages, 1)
+        await messages.aclose()
+        await bus.publish({"seq": 2})
+        return bus._queues
+
+    assert asyncio.run(scenario()) == []
+
+# === MongoDB backend ===
+
+def test_mongo_round_trip_skips_foreign_documents():
+    collection = FakeEventCollection()
+
+    async def scenario():
+        bus = MongoPubSub(collection=collection)
+        messages = bus.subscribe()
+        assert await asyncio.to_thread(collection.watching.wait, 2)
+        try:
+            await bus.publish({"seq": 1, "values": {"btc": [3.0, 2.0, 1.0]}})
+            collection.insert_one({"created_at": None})
+            await bus.publish({"seq": 2})
+            return await receive(messages, 2)
+        finally:
+            await bus.close()
+
+    assert asyncio.run(scenario()) == [{"seq": 1, "values": {"btc": [3.0, 2.0, 1.0]}}, {"seq": 2}]
+    assert all("created_at" in doc for doc in collection.docs)
@@ -0,0 +1,92 @@
+import asyncio
+import os
+
+import pytest
+
+from CoinGas.backend import writer
+from CoinGas.backend.writer import WriteBehindBuffer
+
+class FakeStore:
+    """
+    Stores snapshots by timestamp, like the real upserts, and keeps every
+    write so replays that repeat a snapshot show up.
+    """
+    def __init__(self):
+        self.rows = {}
+        self.writes = []
+        self.fail_after = None  # batches to accept before the store goes down
+
+    def __call__(self, batch):
+        if self.fail_after is not None:
+            if self.fail_after <= 0:
+                raise ConnectionError("database unreachable")
+            self.fail_after -= 1
+        for entry in batch:
+            self.rows[entry["timestamp"]] = entry
+            self.writes.append(entry["timestamp"])
+
+def snapshot(i: int) -> dict:
+    return {"timestamp": f"2026-01-01T00:00:{i:02d}", "btc_high": float(i)}
+
+@pytest.fixture
+def spill_path(tmp_path) -> str:
+    return str(tmp_path / "spill.ndjson")
+
+def buffer(store, spill_path, **kwargs) -> WriteBehindBuffer:
+    return WriteBehindBuffer(store, batch_size=2, max_age=60, spill_path=spill_path, **kwargs)
+
+def test_failed_write_is_spilled_and_replayed_once(spill_path):
+    store = FakeStore()
+    store.fail_after = 0
+    writes = buffer(store, spill_path)
+    for i in range(3):
+        writes.add(snapshot(i))
+
+    assert asyncio.run(writes.flush()) is False
+    assert os.path.exists(spill_path)
+    assert writes.metrics()["pending"] == 0
+    assert writes.stats["spilled"] == 3
+
+    store.fail_after = None
+    writes.add(snapshot(3))
+    assert asyncio.run(writes.flush()) is True
+    assert sorted(store.writes) == [snapshot(i)["timestamp"] for i in range(4)]
+    assert writes.stats["replayed"] == 3
+    assert not writes.metrics()["spill_pending"]
+
+def test_replay_failing_midway_resumes_from_the_claim(spill_path, monkeypatch):
+    monkeypatch.setattr(writer, "REPLAY_BATCH_SIZE", 2)
+    store = FakeStore()
+    writes = buffer(store, spill_path)
+    writes._spill([snapshot(i) for i in range(5)])
+
+    store.fail_after = 1
+    assert asyncio.run(writes.flush()) is False
+    assert not os.path.exists(spill_path)
+    assert len(writes._claims()) == 1
+
+    store.fail_after = None
+    assert asyncio.run(writes.flush()) is True
+    assert len(store.rows) == 5
+    assert writes._claims() == []
+
+def test_orphaned_claim_is_picked_up(spill_path):
+    # Left behind by a worker that died while replaying
+    writes = buffer(FakeStore(), spill_path)
+    writes._spill([snapshot(0), snapshot(1)])
+    os.rename(spill_path, f"{spill_path}.0123abcd.replay")
+    assert writes.metrics()["spill_pending"]
+
+    assert asyncio.run(writes.flush()) is True
+    assert sorted(writes.store.rows) == [snapshot(0)["timestamp"], snapshot(1)["timestamp"]]
+    assert not writes.metrics()["spill_pending"]
+
+def test_only_the_leader_replays(spill_path):
+    store = FakeStore()
+    writes = buffer(store, spill_path, may_replay=lambda: False)
+    writes._spill([snapshot(0)])
+    writes.add(snapshot(1))
+
+    assert asyncio.run(writes.flush()) is True
+    assert store.writes == [snapshot(1)["timestamp"]]
+    assert os.path.exists(spill_path)